@@ -1,76 +1,270 @@
 #!/usr/bin/env python3
 # scripts/agent_service.py
 
+import time
+_IMPORT_START = time.perf_counter()     # import-to-ready is measured from here
+
 import os
+import sys
+import argparse
+import threading
+from contextlib import contextmanager
+from queue import Queue
+from threading import Thread
+from typing import Dict, Iterator
 from dotenv import load_dotenv
 
 # 1. Load .env
 load_dotenv()
 
-# 2. New import for ChatOpenAI
-from langchain_openai import ChatOpenAI
+# 2. Callback base for streaming; the LLM, agent and tool imports are deferred to build_agent()
+from langchain.callbacks.base import BaseCallbackHandler
+
+# ——— CONFIG ———
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+FINAL_ANSWER   = "Final Answer:"     # the ReAct template's marker before the answer proper
+EMBED_MODEL    = "all-mpnet-base-v2"
 
-# 3. Pull in the default ReAct prompt template from LangChain Hub
-from langchain import hub
+# The ReAct prompt, vendored from LangChain Hub (hwchase17/react) so startup
+# needs no network; it is the template create_react_agent expects.
+REACT_TEMPLATE = """Answer the following questions as best you can. You have access to the following tools:
 
-# 4. Agent & execution imports
-from langchain.agents.react.agent import create_react_agent
-from langchain.agents import AgentExecutor
+{tools}
 
-# 5. Your tools
-from agent_tools import DocRetriever, LogSearcher, ConfigValidator, Summarizer
+Use the following format:
+
+Question: the input question you must answer
+Thought: you should always think about what to do
+Action: the action to take, should be one of [{tool_names}]
+Action Input: the input to the action
+Observation: the result of the action
+... (this Thought/Action/Action Input/Observation can repeat N times)
+Thought: I now know the final answer
+Final Answer: the final answer to the original input question
+
+Begin!
+
+Question: {input}
+Thought:{agent_scratchpad}"""
+
+STARTUP: Dict[str, float] = {"import": time.perf_counter() - _IMPORT_START}   # component -> seconds
+_agent = None
+_agent_lock = threading.Lock()
+
+
+@contextmanager
+def _timed(component: str):
+    start = time.perf_counter()
+    yield
+    STARTUP[component] = time.perf_counter() - start
+
+
+def build_agent():
+    """Construct the LLM, prompt, tools and executor; each step is timed into STARTUP."""
+    if not OPENAI_API_KEY:
+        raise RuntimeError("Set OPENAI_API_KEY in your .env")
+
+    with _timed("langchain imports"):
+        from langchain_openai import ChatOpenAI
+        from langchain.prompts import PromptTemplate
+        from langchain.agents.react.agent import create_react_agent
+        from langchain.agents import AgentExecutor
+        from agent_tools import DocRetriever, LogSearcher, ConfigValidator, Summarizer
+
+    with _timed("llm"):
+        llm = ChatOpenAI(
+            model="gpt-4",
+            temperature=0.0,
+            streaming=True,     # tokens reach callbacks as they are generated; invoke() still returns the whole text
+            openai_api_key=OPENAI_API_KEY
+        )
+
+    with _timed("prompt"):
+        prompt = PromptTemplate.from_template(REACT_TEMPLATE)
+
+    # Tools are cheap to construct: DocRetriever opens its store and model on first use (or DocRetriever.warm)
+    with _timed("tools"):
+        tools = [
+            DocRetriever(persist_dir="vector_store", collection_name="solr_support", embed_model=EMBED_MODEL),
+            #LogSearcher(log_dir="/var/log/solr"),
+            LogSearcher(log_dir="/Users/rahulgoswami/Desktop/Lab/log/solr"),
+            ConfigValidator(),
+            Summarizer(llm)
+        ]
+
+    with _timed("agent"):
+        react_agent = create_react_agent(
+            llm=llm,
+            tools=tools,
+            prompt=prompt
+        )
+        executor = AgentExecutor(
+            agent=react_agent,
+            tools=tools,
+            verbose=True,
+            handle_parsing_errors=True,
+            max_iterations=5
+        )
+    return executor
+
+
+def get_agent():
+    """The process-wide agent, built on first use; every query after that reuses it."""
+    global _agent
+    with _agent_lock:
+        if _agent is None:
+            _agent = build_agent()
+        return _agent
+
+
+def warm_agent() -> Thread:
+    """
+    Build the agent and open DocRetriever's store and embedding model in a
+    background thread, so the first question finds them ready. STARTUP
+    gets "ready" (seconds from import) when it finishes.
+    """
+    def run():
+        agent = get_agent()
+        for tool in agent.tools:
+            if hasattr(tool, "warm"):
+                with _timed(f"warm {tool.name}"):
+                    tool.warm()
+        STARTUP["ready"] = time.perf_counter() - _IMPORT_START
+
+    t = Thread(target=run, name="agent-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def startup_report() -> str:
+    """Import-to-ready time broken down by component, including the model and Chroma loads."""
+    from model_registry import loaded
+    lines = [f"{'component':<40}{'seconds':>8}"]
+    lines += [f"{name:<40}{secs:>8.2f}" for name, secs in STARTUP.items() if name != "ready"]
+    lines += [f"  {name:<38}{secs:>8.2f}" for name, secs in loaded().items()]
+    if "ready" in STARTUP:
+        lines.append(f"{'import to ready':<40}{STARTUP['ready']:>8.2f}")
+    return "\n".join(lines)
 
-# ——— CONFIG ———
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise RuntimeError("Set OPENAI_API_KEY in your .env")
-
-# 6. Instantiate the LLM (no more deprecation warning)
-llm = ChatOpenAI(
-    model="gpt-4",
-    temperature=0.0,
-    openai_api_key=OPENAI_API_KEY
-)
-
-# 7. Load the default ReAct prompt so prompt is never None
-#    This is the same template used by create_react_agent if you omit a prompt.
-prompt = hub.pull("hwchase17/react")  # LangChain Hub ID for the ReAct template
-
-# 8. Initialize tools (you already fixed Pydantic issues in agent_tools.py)
-tools = [
-    DocRetriever(persist_dir="vector_store", collection_name="solr_support", embed_model="all-mpnet-base-v2"),
-    #LogSearcher(log_dir="/var/log/solr"),
-    LogSearcher(log_dir="/Users/rahulgoswami/Desktop/Lab/log/solr"),
-    ConfigValidator(),
-    Summarizer(llm)
-]
-
-# 9. Create the ReAct agent with a real prompt object
-react_agent = create_react_agent(
-    llm=llm,
-    tools=tools,
-    prompt=prompt
-)
-
-# 10. Wrap in an executor
-agent_executor = AgentExecutor(
-    agent=react_agent,
-    tools=tools,
-    verbose=True,
-    handle_parsing_errors=True,
-    max_iterations=5
-)
 
 def run_agent(query: str) -> str:
     # Pass your query under the 'input' key (AgentExecutor.input_keys == ['input'])
-    response = agent_executor.invoke({"input": query})
+    response = get_agent().invoke({"input": query})
     answer   = response["output"]
     # If you need the reasoning steps, you can also do:
     # steps = response["intermediate_steps"]
     return answer
 
 
-if __name__ == "__main__":
-    q = input("Enter your Solr question: ")
-    print(run_agent(q))
+class AgentStreamer(BaseCallbackHandler):
+    """
+    Callback that turns an agent run into events on a queue: each tool call
+    as it is made, then the final answer token by token. Reasoning tokens
+    are held back until the LLM writes FINAL_ANSWER, since the ReAct text
+    before it is thought and tool input, not answer.
+    """
+
+    def __init__(self, queue: Queue):
+        self.queue = queue
+        self._buffer = ""
+        self._answering = False
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        self._buffer, self._answering = "", False
+
+    def on_chat_model_start(self, serialized, messages, **kwargs):
+        self._buffer, self._answering = "", False
+
+    def on_llm_new_token(self, token: str, **kwargs):
+        if self._answering:
+            self.queue.put({"type": "token", "text": token})
+            return
+        self._buffer += token
+        i = self._buffer.find(FINAL_ANSWER)
+        if i != -1:
+            self._answering = True
+            rest = self._buffer[i + len(FINAL_ANSWER):].lstrip()
+            if rest:
+                self.queue.put({"type": "token", "text": rest})
+
+    def on_agent_action(self, action, **kwargs):
+        self.queue.put({"type": "action", "tool": action.tool, "input": action.tool_input})
 
+
+def stream_agent(query: str) -> Iterator[Dict]:
+    """
+    Run the agent and yield events as they happen: {"type": "action",
+    "tool", "input"} per tool call, {"type": "token", "text"} pieces of the
+    final answer, then {"type": "done", "answer", "ttft_s", "total_s"},
+    where ttft_s is the time to the first answer token.
+    """
+    queue: Queue = Queue()
+    result: Dict = {}
+
+    def run():
+        try:
+            result["output"] = get_agent().invoke(
+                {"input": query}, config={"callbacks": [AgentStreamer(queue)]}
+            )["output"]
+        except Exception as e:
+            result["error"] = e
+        queue.put(None)
+
+    start, ttft = time.perf_counter(), None
+    Thread(target=run, daemon=True).start()
+    while (event := queue.get()) is not None:
+        if event["type"] == "token" and ttft is None:
+            ttft = time.perf_counter() - start
+        yield event
+    if "error" in result:
+        raise result["error"]
+    if ttft is None:
+        # No "Final Answer:" was streamed (e.g. the iteration limit was hit); send the output whole
+        ttft = time.perf_counter() - start
+        yield {"type": "token", "text": result["output"]}
+    yield {"type": "done", "answer": result["output"], "ttft_s": ttft, "total_s": time.perf_counter() - start}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Solr support agent: answers questions in a loop with one long-lived agent"
+    )
+    parser.add_argument(
+        "--startup-report", action="store_true",
+        help="Wait for warm-up, print import-to-ready time by component, and exit"
+    )
+    args = parser.parse_args()
+    if not OPENAI_API_KEY:
+        print("Error: Set OPENAI_API_KEY in your .env", file=sys.stderr)
+        sys.exit(1)
+
+    # The agent and its retriever come up in the background while the first question is typed
+    warmup = warm_agent()
+    if args.startup_report:
+        warmup.join()
+        print(startup_report())
+        return
+
+    while True:
+        try:
+            q = input("\nEnter your Solr question: ").strip()
+        except EOFError:
+            break
+        if not q:
+            break
+        for event in stream_agent(q):
+            if event["type"] == "action":
+                print(f"[{event['tool']}] {event['input']}", flush=True)
+            elif event["type"] == "token":
+                print(event["text"], end="", flush=True)
+            else:
+                print()
+                print(f"(first answer token {event['ttft_s']:.2f}s, total {event['total_s']:.2f}s)")
+
+
+"""
+python agent_service.py
+python agent_service.py --startup-report
+"""
+if __name__ == "__main__":
+    main()
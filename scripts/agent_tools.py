@@ -1,51 +1,53 @@
 # scripts/agent_tools.py
 
 from typing import ClassVar, List, Dict
-import re
-import os
 import xml.etree.ElementTree as ET
 
 from pydantic import PrivateAttr
-from chromadb import PersistentClient
-from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
 from langchain.tools import BaseTool
-from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
+
+import metrics
+from log_index import search_logs, LIMIT as LOG_LIMIT
+from model_registry import get_model
+from summarize import MapReduceSummarizer, SUMMARY_CONCURRENCY, SUMMARY_MODEL
+from vector_store import get_store, where_clause
 
 
 class DocRetriever(BaseTool):
     name:        ClassVar[str] = "doc_retriever"
     description: ClassVar[str] = "Retrieve top-k relevant Solr docs/issues given a query"
 
-    _client:     PersistentClient  = PrivateAttr()
-    _collection: any               = PrivateAttr()
+    _args:       tuple             = PrivateAttr()
 
-    def __init__(self, persist_dir: str, collection_name: str, embed_model: str):
+    def __init__(self, persist_dir: str, collection_name: str, embed_model: str,
+                 backend: str = None, store: str = None):
         super().__init__()
-        self._client = PersistentClient(
-            path=persist_dir,
-            settings=Settings(),
-            tenant=DEFAULT_TENANT,
-            database=DEFAULT_DATABASE
-        )
-        emb_fn = SentenceTransformerEmbeddingFunction(model_name=embed_model)
-        self._collection = self._client.get_collection(
-            name=collection_name,
-            embedding_function=emb_fn
-        )
-
-    def _run(self, query: str, top_k: int = 5) -> List[Dict]:
-        q_emb = self._collection._embedding_function([query])[0]
-        res = self._collection.query(query_embeddings=[q_emb], n_results=top_k)
-        docs = res["documents"][0]
-        metas = res["metadatas"][0]
-        return [{"text": d, "metadata": m} for d, m in zip(docs, metas)]
+        # The store is opened on first use (or by warm()); it and the model
+        # are the same ones RAGRetriever uses when both run in one process
+        self._args = (persist_dir, collection_name, embed_model, store, backend)
+
+    def _get_store(self):
+        # Looked up per query: get_store reopens the store after a re-export
+        persist_dir, collection_name, embed_model, store, backend = self._args
+        return get_store(persist_dir, collection_name, embed_model, kind=store, backend=backend)
+
+    def warm(self):
+        """Open the store and load the embedding model now rather than on the first query."""
+        self._get_store()
+        get_model(self._args[2], backend=self._args[4])
+
+    @metrics.timed("tool.doc_retriever")
+    def _run(self, query: str, top_k: int = 5, filters: Dict = None) -> List[Dict]:
+        q_emb = get_model(self._args[2], backend=self._args[4]).encode([query])
+        return self._get_store().query(q_emb, top_k, where=where_clause(filters))[0]
 
 
 class LogSearcher(BaseTool):
     name:        ClassVar[str] = "log_searcher"
-    description: ClassVar[str] = "Search Solr log files for a regex pattern"
+    description: ClassVar[str] = (
+        "Search Solr log files (including rotated and .gz ones) for a regex pattern. "
+        "time_window is an optional {'start': ISO time, 'end': ISO time}; at most limit matching lines are returned"
+    )
 
     log_dir: str
 
@@ -53,22 +55,18 @@ class LogSearcher(BaseTool):
         super().__init__(log_dir=log_dir)
         self.log_dir = log_dir
 
-    def _run(self, pattern: str, time_window: Dict[str, str] = None) -> List[Dict]:
-        regex = re.compile(pattern)
-        results = []
-        for fname in os.listdir(self.log_dir):
-            path = os.path.join(self.log_dir, fname)
-            with open(path) as f:
-                for line in f:
-                    if regex.search(line):
-                        results.append({"line": line.strip()})
-        return results
+    @metrics.timed("tool.log_searcher")
+    def _run(self, pattern: str, time_window: Dict[str, str] = None, limit: int = LOG_LIMIT) -> List[Dict]:
+        # log_index.py seeks to the window by timestamp index and scans only those bytes
+        window = time_window or {}
+        return list(search_logs(self.log_dir, pattern, window.get("start"), window.get("end"), limit=limit))
 
 
 class ConfigValidator(BaseTool):
     name:        ClassVar[str] = "config_validator"
     description: ClassVar[str] = "Validate Solr XML config and report errors/warnings"
 
+    @metrics.timed("tool.config_validator")
     def _run(self, config_path: str) -> Dict:
         errors, warnings = [], []
         try:
@@ -83,18 +81,20 @@ class ConfigValidator(BaseTool):
 
 class Summarizer(BaseTool):
     name:        ClassVar[str] = "summarizer"
-    description: ClassVar[str] = "Summarize long text into a brief summary"
+    description: ClassVar[str] = "Summarize long text (issue threads, log search output) into a brief summary"
 
-    _chain: LLMChain = PrivateAttr()
+    _summarizer: MapReduceSummarizer = PrivateAttr()
 
-    def __init__(self, llm):
+    def __init__(self, llm, concurrency: int = SUMMARY_CONCURRENCY):
         super().__init__()
-        template = PromptTemplate(
-            input_variables=["text"],
-            template="Summarize the following for a Solr engineer:\n\n{text}\n\nSummary:"
-        )
-        self._chain = LLMChain(llm=llm, prompt=template)
+        # Long text is split by tokens, summarised in parallel and reduced; partial summaries are cached
+        def complete(prompt: str) -> str:
+            result = llm.invoke(prompt)
+            return getattr(result, "content", result)
 
-    def _run(self, text: str) -> str:
-        return self._chain.run(text=text)
+        model = getattr(llm, "model_name", None) or SUMMARY_MODEL
+        self._summarizer = MapReduceSummarizer(complete, model=model, concurrency=concurrency)
 
+    @metrics.timed("tool.summarizer")
+    def _run(self, text: str) -> str:
+        return self._summarizer.summarize(text)
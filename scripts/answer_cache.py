@@ -0,0 +1,185 @@
+# scripts/answer_cache.py
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lexical_index import lexical_root, MANIFEST
+from vector_store import mmap_root, STORE_FILE
+
+# ——— CONFIGURATION ———
+CACHE_SIZE       = int(os.getenv("ANSWER_CACHE_SIZE", "1024"))          # answers kept, least recently used evicted first
+CACHE_TTL        = float(os.getenv("ANSWER_CACHE_TTL", "86400"))        # seconds an answer stays valid
+CACHE_THRESHOLD  = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95"))   # min cosine to reuse a reworded question's answer
+INDEX_STATE      = ".index_state.json"                                  # rewritten by every index_chunks.py run
+
+
+def normalize_query(query: str) -> str:
+    """Case, whitespace and trailing punctuation don't change the question."""
+    return re.sub(r"\s+", " ", query.lower()).strip(" ?!.")
+
+
+def index_version(persist_dir: str, collection_name: str) -> Tuple:
+    """Modification times of the files the indexer and exporter rewrite; any change means new content."""
+    paths = [
+        os.path.join(persist_dir, INDEX_STATE),
+        os.path.join(lexical_root(persist_dir, collection_name), MANIFEST),
+        os.path.join(mmap_root(persist_dir, collection_name), STORE_FILE),
+    ]
+    return tuple(os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in paths)
+
+
+class CachedAnswer:
+    """A cached answer with the chunk ids it was grounded on, in retrieval order."""
+    __slots__ = ("answer", "vector", "chunk_ids", "created", "llm_seconds")
+
+    def __init__(self, answer, vector, chunk_ids, llm_seconds):
+        self.answer = answer
+        self.vector = vector
+        self.chunk_ids = chunk_ids
+        self.created = time.monotonic()
+        self.llm_seconds = llm_seconds
+
+
+class AnswerCache:
+    """
+    Two-level cache of generated answers, scoped by whatever else shapes an
+    answer (top_k, retrieval mode, filters).
+
+    Level 1 is an exact LRU on the normalised question, checked before the
+    query is embedded or retrieved. Level 2 runs after retrieval: a reworded
+    question reuses a cached answer when its embedding is within the cosine
+    threshold of the cached question's and it retrieved the same chunk ids in
+    the same order, so the cited passages are the ones the answer was
+    grounded on. Only the LLM call is saved there, but that is most of the
+    latency.
+
+    Entries expire after ttl seconds, the least recently used go once there
+    are more than size, and everything is dropped when index_chunks.py or an
+    mmap export changes the index.
+    """
+
+    def __init__(self, persist_dir: str, collection_name: str, size: int = CACHE_SIZE,
+                 ttl: float = CACHE_TTL, threshold: float = CACHE_THRESHOLD):
+        self.persist_dir = persist_dir
+        self.collection_name = collection_name
+        self.size = size
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, CachedAnswer]" = OrderedDict()    # (scope, question) -> entry
+        self._by_context: Dict[Tuple, set] = {}                         # (scope, chunk ids) -> entry keys
+        self._version = index_version(persist_dir, collection_name)
+        self.counts = dict.fromkeys(
+            ("exact_hits", "semantic_hits", "misses", "evictions", "expirations", "invalidations"), 0
+        )
+        self.llm_seconds = self.saved_seconds = 0.0
+
+    def _drop(self, key: Tuple):
+        entry = self._entries.pop(key)
+        keys = self._by_context.get((key[0], entry.chunk_ids))
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[(key[0], entry.chunk_ids)]
+
+    def _check_version(self):
+        version = index_version(self.persist_dir, self.collection_name)
+        if version != self._version:
+            self._version = version
+            if self._entries:
+                self.counts["invalidations"] += 1
+            self._entries.clear()
+            self._by_context.clear()
+
+    def _fresh(self, key: Tuple) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.created > self.ttl:
+            self._drop(key)
+            self.counts["expirations"] += 1
+            return None
+        return entry
+
+    def _hit(self, kind: str, key: Tuple, entry: CachedAnswer) -> CachedAnswer:
+        self._entries.move_to_end(key)
+        self.counts[kind] += 1
+        self.saved_seconds += entry.llm_seconds
+        return entry
+
+    def lookup(self, query: str, scope: Tuple) -> Optional[CachedAnswer]:
+        """Level 1: the cached answer to this exact (normalised) question, or None."""
+        key = (scope, normalize_query(query))
+        with self._lock:
+            self._check_version()
+            entry = self._fresh(key)
+            return self._hit("exact_hits", key, entry) if entry is not None else None
+
+    def lookup_similar(self, query: str, scope: Tuple, vector, chunk_ids: List[str]) -> Optional[CachedAnswer]:
+        """
+        Level 2: the answer to a cached question close to this one that was
+        grounded on the same chunk_ids, or None (counted as a miss). A hit is
+        also stored under this wording so repeating it is an exact hit.
+        """
+        context = tuple(chunk_ids)
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            best, best_sim = None, self.threshold
+            for key in list(self._by_context.get((scope, context), ())):
+                entry = self._fresh(key)
+                if entry is None:
+                    continue
+                sim = float(vector @ entry.vector)
+                if sim >= best_sim:
+                    best, best_sim = key, sim
+            if best is None:
+                self.counts["misses"] += 1
+                return None
+            entry = self._hit("semantic_hits", best, self._entries[best])
+            alias = CachedAnswer(entry.answer, vector, context, entry.llm_seconds)
+            alias.created = entry.created       # expires with the answer it copies
+            self._put(scope, normalize_query(query), alias)
+            return entry
+
+    def put(self, query: str, scope: Tuple, vector, chunk_ids: List[str], answer: str, llm_seconds: float):
+        """Store a freshly generated answer with the time the LLM took to write it."""
+        vector = np.asarray(vector, dtype=np.float32)
+        vector = vector / max(float(np.linalg.norm(vector)), 1e-12)
+        with self._lock:
+            self.llm_seconds += llm_seconds
+            self._put(scope, normalize_query(query), CachedAnswer(answer, vector, tuple(chunk_ids), llm_seconds))
+
+    def _put(self, scope: Tuple, question: str, entry: CachedAnswer):
+        key = (scope, question)
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        self._by_context.setdefault((scope, entry.chunk_ids), set()).add(key)
+        while len(self._entries) > self.size:
+            self._drop(next(iter(self._entries)))
+            self.counts["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats(self) -> Dict:
+        """Hit counts and rates, and LLM seconds spent vs saved by hits."""
+        with self._lock:
+            c = dict(self.counts)
+            lookups = c["exact_hits"] + c["semantic_hits"] + c["misses"]
+            c.update(
+                entries=len(self._entries),
+                hit_rate=(c["exact_hits"] + c["semantic_hits"]) / lookups if lookups else 0.0,
+                exact_hit_rate=c["exact_hits"] / lookups if lookups else 0.0,
+                semantic_hit_rate=c["semantic_hits"] / lookups if lookups else 0.0,
+                llm_seconds=round(self.llm_seconds, 3),
+                saved_llm_seconds=round(self.saved_seconds, 3),
+            )
+            return c
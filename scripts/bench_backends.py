@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# scripts/bench_backends.py
+
+import time
+import random
+import argparse
+from itertools import islice
+
+import numpy as np
+
+from chunk_corpus import find_corpus, iter_chunks
+from length_batching import encode_by_length
+from model_registry import get_model, BACKENDS
+
+EMBED_MODEL = "all-mpnet-base-v2"
+QUERY_WORDS = 16        # queries are the opening words of sampled chunks, about question-sized
+
+
+def normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def top_k(queries, docs, k):
+    return np.argsort(-(queries @ docs.T), axis=1)[:, :k]
+
+
+def recall_at_k(found, truth):
+    """Mean fraction of the fp32 top-k that a backend's top-k also contains."""
+    return float(np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare embedding backends on the chunk corpus: throughput, query latency and recall@k vs fp32"
+    )
+    parser.add_argument("--data-dir", "-d", default="../data/chunks", help="Chunk corpus directory")
+    parser.add_argument("--limit", "-n", type=int, default=2000, help="Chunks to encode (default: 2000)")
+    parser.add_argument("--queries", "-q", type=int, default=200, help="Sampled queries (default: 200)")
+    parser.add_argument("--top-k", "-k", type=int, default=10, help="k for recall@k (default: 10)")
+    parser.add_argument("--backends", "-b", nargs="+", choices=BACKENDS, default=list(BACKENDS),
+                        help="Backends to measure; torch is always run as the baseline")
+    args = parser.parse_args()
+
+    texts = [c["text"] for c in islice(iter_chunks(find_corpus(args.data_dir)), args.limit)]
+    queries = [" ".join(t.split()[:QUERY_WORDS]) for t in random.Random(0).sample(texts, min(args.queries, len(texts)))]
+    print(f"{len(texts)} chunks, {len(queries)} queries, recall@{args.top_k} against torch fp32\n")
+
+    results, truth, base_docs = {}, None, None
+    for backend in ["torch"] + [b for b in args.backends if b != "torch"]:
+        start = time.perf_counter()
+        model = get_model(EMBED_MODEL, backend=backend)
+        load = time.perf_counter() - start
+        model.encode(texts[:32], show_progress_bar=False)    # warm-up
+
+        start = time.perf_counter()
+        docs = normalize(encode_by_length(model, texts))
+        rate = len(texts) / (time.perf_counter() - start)
+
+        latencies, query_vecs = [], []
+        for q in queries:
+            start = time.perf_counter()
+            query_vecs.append(model.encode([q], show_progress_bar=False)[0])
+            latencies.append(time.perf_counter() - start)
+        query_vecs = normalize(query_vecs)
+
+        found = top_k(query_vecs, docs, args.top_k)
+        if truth is None:
+            truth, base_docs = found, docs
+        results[backend] = {
+            "load":   load,
+            "rate":   rate,
+            "p50":    1000 * np.percentile(latencies, 50),
+            "p95":    1000 * np.percentile(latencies, 95),
+            "recall": recall_at_k(found, truth),
+            # Queries on this backend against an index built with torch fp32
+            "mixed":  recall_at_k(top_k(query_vecs, base_docs, args.top_k), truth),
+        }
+
+    base = results["torch"]["rate"]
+    print(f"{'backend':<11}{'load s':>8}{'chunks/s':>10}{'speedup':>9}{'q p50 ms':>10}{'q p95 ms':>10}"
+          f"{'recall':>8}{'mixed':>8}")
+    for backend, r in results.items():
+        print(f"{backend:<11}{r['load']:>8.1f}{r['rate']:>10.1f}{r['rate'] / base:>9.2f}{r['p50']:>10.1f}"
+              f"{r['p95']:>10.1f}{r['recall']:>8.3f}{r['mixed']:>8.3f}")
+    print("\nrecall: backend for index and queries; mixed: backend queries against a torch-built index")
+
+
+"""
+python bench_backends.py --data-dir ../data/chunks --limit 2000 --queries 200 --top-k 10
+"""
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# scripts/bench_batching.py
+
+import time
+import argparse
+from itertools import islice
+
+import numpy as np
+from sentence_transformers import SentenceTransformer
+
+from chunk_corpus import find_corpus, iter_chunks
+from length_batching import token_lengths, plan_batches, padding_waste, encode_by_length, TOKEN_BUDGET
+
+EMBED_MODEL = "all-mpnet-base-v2"
+BATCH_SIZE  = 64        # the fixed batch size index_chunks.py used to encode with
+
+
+def fixed_batches(n, batch_size):
+    return [np.arange(i, min(i + batch_size, n)) for i in range(0, n, batch_size)]
+
+
+def run_fixed(model, texts, batch_size):
+    for start in range(0, len(texts), batch_size):
+        model.encode(texts[start:start + batch_size], batch_size=batch_size,
+                     show_progress_bar=False, device="cpu")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark length-bucketed, token-budgeted batching against fixed 64-chunk batches"
+    )
+    parser.add_argument("--data-dir", "-d", default="../data/chunks", help="Chunk corpus directory")
+    parser.add_argument("--limit", "-n", type=int, default=2048, help="Chunks to encode (default: 2048)")
+    parser.add_argument(
+        "--budgets", "-b", type=int, nargs="+", default=[TOKEN_BUDGET // 2, TOKEN_BUDGET, TOKEN_BUDGET * 2],
+        help="Token budgets to try"
+    )
+    args = parser.parse_args()
+
+    # Corpus order is what index_chunks.py batched in before, so it is the baseline
+    texts = [c["text"] for c in islice(iter_chunks(find_corpus(args.data_dir)), args.limit)]
+    model = SentenceTransformer(EMBED_MODEL)
+    lengths = token_lengths(model, texts)
+    p50, p90, p99 = np.percentile(lengths, [50, 90, 99])
+    print(f"{len(texts)} chunks; tokens p50={p50:.0f} p90={p90:.0f} p99={p99:.0f} max={lengths.max()}\n")
+
+    model.encode(texts[:BATCH_SIZE], batch_size=BATCH_SIZE, show_progress_bar=False)   # warm-up
+
+    print(f"{'batching':<22}{'padding %':>10}{'chunks/s':>10}{'speedup':>9}")
+    start = time.perf_counter()
+    run_fixed(model, texts, BATCH_SIZE)
+    base = len(texts) / (time.perf_counter() - start)
+    waste = padding_waste(lengths, fixed_batches(len(texts), BATCH_SIZE))
+    print(f"{f'fixed {BATCH_SIZE}':<22}{100 * waste:>10.1f}{base:>10.1f}{1.0:>9.2f}")
+
+    for budget in args.budgets:
+        start = time.perf_counter()
+        encode_by_length(model, texts, budget)
+        rate = len(texts) / (time.perf_counter() - start)
+        waste = padding_waste(lengths, plan_batches(lengths, budget))
+        print(f"{f'bucketed {budget} tok':<22}{100 * waste:>10.1f}{rate:>10.1f}{rate / base:>9.2f}")
+
+
+"""
+python bench_batching.py --data-dir ../data/chunks --limit 2048
+"""
+if __name__ == "__main__":
+    main()
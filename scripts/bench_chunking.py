@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# scripts/bench_chunking.py
+
+import time
+import argparse
+import tracemalloc
+from itertools import islice
+
+from chunk_issues import chunk_text, chunk_spans, detokenize, get_tokenizer, iter_issues
+
+# all-mpnet-base-v2 truncates its input past this many tokens (incl. <s> and </s>)
+MAX_SEQ_LENGTH = 384
+
+
+def load_texts(input_dir, limit):
+    """Title+body and every comment body, the same texts chunk_issue() splits."""
+    texts = []
+    for _, issue in islice(iter_issues(input_dir), limit):
+        texts.append(f"{issue.get('title','')} {issue.get('body','')}".strip())
+        texts.extend(c.get("body", "") for c in issue.get("comments", []))
+    return texts
+
+
+def run_nltk(texts, chunk_size, overlap):
+    return [detokenize(tokens) for t in texts for tokens in chunk_text(t, chunk_size, overlap)]
+
+
+def run_offsets(texts, chunk_size, overlap):
+    # Materialising the slices keeps the comparison honest: both produce chunk strings
+    return [t[s:e] for t in texts for s, e in chunk_spans(t, chunk_size, overlap)]
+
+
+def measure(fn, texts, chunk_size, overlap):
+    start = time.perf_counter()
+    chunks = fn(texts, chunk_size, overlap)
+    elapsed = time.perf_counter() - start
+
+    # Separate pass: tracemalloc slows everything down, so it doesn't share the timing
+    tracemalloc.start()
+    fn(texts, chunk_size, overlap)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return chunks, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the offset chunker against the legacy NLTK chunk_text"
+    )
+    parser.add_argument(
+        "--input-dir", "-i", default="../data/github_issues",
+        help="Issue store directory, or a directory of per-issue JSON files"
+    )
+    parser.add_argument("--limit", "-n", type=int, default=2000, help="Issues to load (default: 2000)")
+    parser.add_argument("--chunk-size", "-c", type=int, default=300)
+    parser.add_argument("--overlap", "-l", type=int, default=60)
+    args = parser.parse_args()
+
+    texts = load_texts(args.input_dir, args.limit)
+    mb = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    tokenizer = get_tokenizer()
+    print(f"Loaded {len(texts)} texts ({mb:.1f} MB) from {args.input_dir}\n")
+
+    print(f"{'chunker':<10}{'chunks':>9}{'chunks/s':>11}{'MB/s':>8}{'peak MB':>9}{'truncated':>11}")
+    for name, fn in (("nltk", run_nltk), ("offsets", run_offsets)):
+        chunks, elapsed, peak = measure(fn, texts, args.chunk_size, args.overlap)
+        # Chunks the model would silently cut off: their embedding compute is wasted
+        lengths = tokenizer(chunks, add_special_tokens=True, return_length=True,
+                            return_attention_mask=False, verbose=False)["length"]
+        truncated = sum(1 for n in lengths if n > MAX_SEQ_LENGTH)
+        print(f"{name:<10}{len(chunks):>9}{len(chunks) / elapsed:>11.0f}"
+              f"{mb / elapsed:>8.2f}{peak / 1e6:>9.1f}{truncated:>11}")
+
+
+"""
+python bench_chunking.py --input-dir ../data/github_issues --limit 2000
+"""
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# scripts/bench_context.py
+
+import os
+import re
+import time
+import random
+import argparse
+from itertools import islice
+
+import numpy as np
+
+from chunk_corpus import find_corpus, iter_chunks
+from context_packing import count_tokens, CONTEXT_TOKENS
+from rag_pipeline import (RAGRetriever, RAGGenerator, client_llm, VECTOR_STORE_DIR, COLLECTION_NAME,
+                          EMBED_MODEL, OPENAI_MODEL, RETRIEVAL_MODES, RETRIEVAL_MODE)
+
+QUERY_WORDS = 16        # queries are the opening words of sampled chunks, about question-sized
+
+
+def timed_call(prompt: str, model: str) -> float:
+    start = time.perf_counter()
+    client_llm.chat.completions.create(
+        model=model, messages=[{"role": "system", "content": prompt}], temperature=0.0, max_tokens=512
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Prompt tokens (and optionally LLM latency) with verbatim vs merged and packed context"
+    )
+    parser.add_argument("--data-dir", "-d", default="../data/chunks", help="Chunk corpus to sample questions from")
+    parser.add_argument("--queries", "-q", type=int, default=200, help="Sampled questions (default: 200)")
+    parser.add_argument("--top-k", "-k", type=int, default=5, help="Chunks retrieved per question (default: 5)")
+    parser.add_argument("--budget", type=int, default=CONTEXT_TOKENS,
+                        help=f"Context token budget when packing (default: {CONTEXT_TOKENS})")
+    parser.add_argument("--mode", choices=RETRIEVAL_MODES, default=RETRIEVAL_MODE,
+                        help=f"Retrieval mode (default: {RETRIEVAL_MODE})")
+    parser.add_argument("--llm-calls", type=int, default=0,
+                        help="Also time this many real LLM calls per prompt style (default: 0; needs OPENAI_API_KEY)")
+    args = parser.parse_args()
+
+    texts = [c["text"] for c in islice(iter_chunks(find_corpus(args.data_dir)), 20000)]
+    queries = [" ".join(t.split()[:QUERY_WORDS]) for t in random.Random(0).sample(texts, min(args.queries, len(texts)))]
+    retriever = RAGRetriever(VECTOR_STORE_DIR, COLLECTION_NAME, EMBED_MODEL, mode=args.mode)
+    hits = retriever.retrieve_many(queries, args.top_k)
+
+    styles = {
+        "verbatim": RAGGenerator(OPENAI_MODEL, os.getenv("OPENAI_API_KEY"), context_tokens=None),
+        "packed":   RAGGenerator(OPENAI_MODEL, os.getenv("OPENAI_API_KEY"), context_tokens=args.budget),
+    }
+    results = {}
+    for name, generator in styles.items():
+        start = time.perf_counter()
+        prompts = [generator.build_prompt(q, h) for q, h in zip(queries, hits)]
+        build_ms = 1000 * (time.perf_counter() - start) / len(prompts)
+        tokens = np.array([count_tokens(p, OPENAI_MODEL) for p in prompts])
+        latencies = [timed_call(p, OPENAI_MODEL) for p in prompts[:args.llm_calls]]
+        results[name] = {
+            "mean":   tokens.mean(),
+            "p95":    np.percentile(tokens, 95),
+            "build":  build_ms,
+            "llm":    1000 * np.median(latencies) if latencies else float("nan"),
+            "blocks": np.mean([len(re.findall(r"^\[\d+\] \(", p, re.M)) for p in prompts]),
+        }
+
+    print(f"{len(queries)} questions, top {args.top_k} chunks, {args.mode} retrieval, "
+          f"budget {args.budget} tokens ({OPENAI_MODEL} tokenizer)\n")
+    print(f"{'context':<10}{'tokens':>9}{'p95':>8}{'passages':>10}{'build ms':>10}{'llm p50 ms':>12}")
+    for name, r in results.items():
+        print(f"{name:<10}{r['mean']:>9.0f}{r['p95']:>8.0f}{r['blocks']:>10.2f}{r['build']:>10.2f}{r['llm']:>12.0f}")
+    saved = 1 - results["packed"]["mean"] / results["verbatim"]["mean"]
+    print(f"\nPacked prompts are {100 * saved:.1f}% smaller on average")
+
+
+"""
+python bench_context.py --data-dir ../data/chunks --queries 200 --top-k 5 --llm-calls 20
+"""
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# scripts/bench_e2e.py
+
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import tempfile
+import argparse
+import threading
+from http.server import ThreadingHTTPServer
+from typing import Dict
+
+import numpy as np
+
+import metrics
+from stub_llm import StubHandler
+from synth_issues import write_store, synth_questions
+
+# ——— CONFIGURATION ———
+EMBED_MODEL     = "all-mpnet-base-v2"
+COLLECTION_NAME = "bench"
+STUB_PORT       = 8002
+TOLERANCE       = 10.0      # % worse than the baseline that counts as a regression
+
+# Headline numbers compared against a baseline: (report key, higher is better)
+TRACKED = [
+    ("chunking.chunks_per_s", True),
+    ("indexing.embeddings_per_s", True),
+    ("indexing.chunks_per_s", True),
+    ("query.p50_ms", False),
+    ("query.p95_ms", False),
+    ("query.p99_ms", False),
+    ("peak_rss_mb.self", False),
+]
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is KiB on Linux; children are the chunking worker processes
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def start_stub(port: int, ttft: float, token_delay: float) -> ThreadingHTTPServer:
+    StubHandler.ttft, StubHandler.token_delay = ttft, token_delay
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, name="stub-llm", daemon=True).start()
+    return server
+
+
+def run(args) -> Dict:
+    """Generate, chunk, index and query a synthetic corpus end to end; returns the report."""
+    work = args.work_dir or tempfile.mkdtemp(prefix="bench_e2e_")
+    issues_dir, chunk_dir, store_dir = (os.path.join(work, d) for d in ("issues", "chunks", "vector_store"))
+    for d in (issues_dir, chunk_dir, store_dir):
+        # Every run starts cold: no manifest, embedding cache or index from a previous run
+        shutil.rmtree(d, ignore_errors=True)
+    os.makedirs(chunk_dir)
+    metrics.reset()
+
+    # 1. Corpus
+    with metrics.span("bench.generate"):
+        write_store(issues_dir, args.issues, args.seed)
+
+    # 2. Chunking
+    from chunk_issues import chunk_all
+    from chunk_corpus import find_corpus, count_chunks
+    start = time.perf_counter()
+    chunk_all(issues_dir, chunk_dir, args.chunk_size, args.overlap, workers=args.workers)
+    chunk_s = time.perf_counter() - start
+    n_chunks = count_chunks(find_corpus(chunk_dir))
+
+    # 3. Indexing, into a store of its own
+    import index_chunks
+    index_chunks.DATA_DIR, index_chunks.PERSIST_DIR = chunk_dir, store_dir
+    index_chunks.MAIL_DATA_DIR = None
+    index_chunks.COLLECTION_NAME, index_chunks.EMBED_MODEL = COLLECTION_NAME, args.embed_model
+    start = time.perf_counter()
+    index_chunks.index_corpus()
+    index_s = time.perf_counter() - start
+    snap = metrics.snapshot()
+    encoded = snap["counters"].get("index_chunks.embeddings_encoded", 0)
+    encode_s = snap["spans"].get("index_chunks.encode", {}).get("total_s", 0.0)
+
+    # 4. Queries against the stub LLM; rag_pipeline builds its OpenAI client on import, so point it there first
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "stub")
+    server = start_stub(args.stub_port, args.ttft, args.token_delay)
+    try:
+        import rag_pipeline
+        pipeline = rag_pipeline.RAGPipeline(store_dir, COLLECTION_NAME, args.embed_model, rag_pipeline.OPENAI_MODEL,
+                                            os.environ["OPENAI_API_KEY"], top_k=args.top_k, mode=args.mode, cache=False)
+        questions = synth_questions(args.queries, args.seed)
+        pipeline.answer(questions[0])     # model load and first search are not query latency
+        latencies = []
+        for question in questions:
+            start = time.perf_counter()
+            pipeline.answer(question)
+            latencies.append(time.perf_counter() - start)
+    finally:
+        server.shutdown()
+    p50, p95, p99 = 1000 * np.percentile(latencies, [50, 95, 99])
+
+    if not args.work_dir:
+        shutil.rmtree(work, ignore_errors=True)
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline", "work_dir")},
+        "chunking": {"issues": args.issues, "chunks": n_chunks, "seconds": round(chunk_s, 3),
+                     "chunks_per_s": round(n_chunks / chunk_s, 1)},
+        "indexing": {"chunks": n_chunks, "embeddings": encoded, "seconds": round(index_s, 3),
+                     "encode_seconds": round(encode_s, 3), "chunks_per_s": round(n_chunks / index_s, 1),
+                     "embeddings_per_s": round(encoded / max(encode_s, 1e-9), 1)},
+        "query": {"queries": len(latencies), "mean_ms": round(1000 * float(np.mean(latencies)), 2),
+                  "p50_ms": round(p50, 2), "p95_ms": round(p95, 2), "p99_ms": round(p99, 2)},
+        "peak_rss_mb": peak_rss_mb(),
+        "metrics": metrics.snapshot(),
+    }
+
+
+def _get(report: Dict, key: str):
+    for part in key.split("."):
+        report = report.get(part, {}) if isinstance(report, dict) else {}
+    return report if isinstance(report, (int, float)) else None
+
+
+def compare(report: Dict, baseline: Dict, tolerance: float) -> int:
+    """Print each tracked number against the baseline; returns how many got worse by more than tolerance %."""
+    regressions = 0
+    print(f"\n{'vs baseline':<28}{'baseline':>12}{'now':>12}{'change':>9}")
+    for key, higher_is_better in TRACKED:
+        old, new = _get(baseline, key), _get(report, key)
+        if old is None or new is None or old == 0:
+            continue
+        change = 100 * (new - old) / old
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        regressions += bool(flag)
+        print(f"{key:<28}{old:>12.1f}{new:>12.1f}{change:>+8.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmark: synthetic issues -> chunking -> indexing -> RAG queries "
+                    "against a stub LLM, with per-stage timings"
+    )
+    parser.add_argument("--issues", "-n", type=int, default=1000, help="Synthetic issues to generate (default: 1000)")
+    parser.add_argument("--queries", "-q", type=int, default=200, help="Questions answered (default: 200)")
+    parser.add_argument("--seed", type=int, default=0, help="Corpus and question seed (default: 0)")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count(),
+                        help="Chunking worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=300, help="Tokens per chunk (default: 300)")
+    parser.add_argument("--overlap", type=int, default=60, help="Overlap tokens between chunks (default: 60)")
+    parser.add_argument("--embed-model", default=EMBED_MODEL, help=f"Embedding model (default: {EMBED_MODEL})")
+    parser.add_argument("--top-k", "-k", type=int, default=5, help="Chunks retrieved per question (default: 5)")
+    parser.add_argument("--mode", choices=("vector", "hybrid"), default="vector", help="Retrieval mode (default: vector)")
+    parser.add_argument("--stub-port", type=int, default=STUB_PORT, help=f"Port for the stub LLM (default: {STUB_PORT})")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Stub LLM seconds before the first token (default: 0.05)")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Stub LLM seconds between tokens (default: 0)")
+    parser.add_argument("--work-dir", help="Keep the corpus, chunks and index here (default: a temp dir, removed after)")
+    parser.add_argument("--output", "-o", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="Earlier JSON report to compare against; exits 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help=f"%% worse than the baseline that counts as a regression (default: {TOLERANCE:g})")
+    args = parser.parse_args()
+
+    report = run(args)
+    c, i, q, rss = report["chunking"], report["indexing"], report["query"], report["peak_rss_mb"]
+    print(f"\n{args.issues} issues -> {c['chunks']} chunks, {q['queries']} questions (seed {args.seed})\n")
+    print(f"chunking      {c['chunks_per_s']:>10.1f} chunks/s     ({c['seconds']:.1f}s)")
+    print(f"indexing      {i['chunks_per_s']:>10.1f} chunks/s     ({i['seconds']:.1f}s)")
+    print(f"embedding     {i['embeddings_per_s']:>10.1f} embeddings/s ({i['encode_seconds']:.1f}s encoding)")
+    print(f"query         p50 {q['p50_ms']:.1f} ms, p95 {q['p95_ms']:.1f} ms, p99 {q['p99_ms']:.1f} ms")
+    print(f"peak RSS      {rss['self']:.0f} MB (chunking workers {rss['children']:.0f} MB)\n")
+    print(f"{'span':<32}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}")
+    for name, s in report["metrics"]["spans"].items():
+        print(f"{name:<32}{s['count']:>8}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['total_s']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        if regressions:
+            sys.exit(1)
+
+
+"""
+python bench_e2e.py --issues 2000 --queries 300 --output bench.json
+python bench_e2e.py --issues 2000 --queries 300 --baseline bench.json
+"""
+if __name__ == "__main__":
+    main()
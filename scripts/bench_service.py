@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# scripts/bench_service.py
+
+import json
+import time
+import random
+import asyncio
+import argparse
+from itertools import islice
+from typing import Dict, List
+
+import numpy as np
+
+from chunk_corpus import find_corpus, iter_chunks
+
+QUERY_WORDS = 16        # questions are the opening words of sampled chunks, about question-sized
+
+
+async def request(host: str, port: int, path: str, body: Dict = None) -> Dict:
+    """One HTTP request on a fresh connection: {"status", "body"}; server-sent events are parsed into a list."""
+    reader, writer = await asyncio.open_connection(host, port)
+    data = json.dumps(body).encode("utf-8") if body is not None else b""
+    method = "POST" if body is not None else "GET"
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    head, _, payload = raw.partition(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    if b"text/event-stream" in head:
+        return {"status": status, "body": [json.loads(line[6:]) for line in payload.split(b"\n\n") if line.startswith(b"data: ")]}
+    return {"status": status, "body": json.loads(payload or b"null")}
+
+
+async def stream_timed(host: str, port: int, question: str) -> Dict:
+    """POST /answer/stream, timing the first answer token as the client sees it."""
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    data = json.dumps({"question": question}).encode("utf-8")
+    writer.write(f"POST /answer/stream HTTP/1.1\r\nHost: {host}\r\nContent-Length: {len(data)}\r\n"
+                 f"Connection: close\r\n\r\n".encode("latin-1") + data)
+    await writer.drain()
+    ttft, done = None, None
+    while line := await reader.readline():
+        if not line.startswith(b"data: "):
+            continue
+        event = json.loads(line[6:])
+        if event["type"] == "token" and ttft is None:
+            ttft = time.perf_counter() - start
+        elif event["type"] in ("done", "error"):
+            done = event
+    writer.close()
+    return {"ok": done is not None and done["type"] == "done", "ttft": ttft, "total": time.perf_counter() - start}
+
+
+async def run(host: str, port: int, questions: List[str], concurrency: int, stream: bool) -> List[Dict]:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(question: str) -> Dict:
+        async with slots:
+            if stream:
+                return await stream_timed(host, port, question)
+            start = time.perf_counter()
+            try:
+                response = await request(host, port, "/answer", {"question": question})
+            except (ConnectionError, OSError):
+                return {"ok": False, "total": time.perf_counter() - start}
+            return {"ok": response["status"] == 200, "total": time.perf_counter() - start,
+                    "cached": (response["body"] or {}).get("cached")}
+
+    return await asyncio.gather(*(one(q) for q in questions))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load-test rag_service.py: latency percentiles and throughput under concurrent requests"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Service host (default: 127.0.0.1)")
+    parser.add_argument("--port", "-p", type=int, default=8000, help="Service port (default: 8000)")
+    parser.add_argument("--data-dir", "-d", default="../data/chunks", help="Chunk corpus to sample questions from")
+    parser.add_argument("--questions", help="Text file with one question per line, instead of sampling the corpus")
+    parser.add_argument("--requests", "-n", type=int, default=500, help="Requests sent (default: 500)")
+    parser.add_argument("--concurrency", "-c", type=int, default=200, help="Requests in flight (default: 200)")
+    parser.add_argument("--distinct", type=int, default=100,
+                        help="Distinct questions the requests are drawn from; repeats exercise merging and the cache (default: 100)")
+    parser.add_argument("--stream", action="store_true", help="Use /answer/stream and report time to first token too")
+    args = parser.parse_args()
+
+    if args.questions:
+        with open(args.questions) as f:
+            pool = [line.strip() for line in f if line.strip()][:args.distinct]
+    else:
+        texts = [c["text"] for c in islice(iter_chunks(find_corpus(args.data_dir)), 20000)]
+        pool = [" ".join(t.split()[:QUERY_WORDS]) for t in random.Random(0).sample(texts, min(args.distinct, len(texts)))]
+    rng = random.Random(1)
+    questions = [rng.choice(pool) for _ in range(args.requests)]
+
+    before = asyncio.run(request(args.host, args.port, "/stats"))["body"]
+    start = time.perf_counter()
+    results = asyncio.run(run(args.host, args.port, questions, args.concurrency, args.stream))
+    wall = time.perf_counter() - start
+    after = asyncio.run(request(args.host, args.port, "/stats"))["body"]
+
+    ok = [r for r in results if r["ok"]]
+    print(f"{len(results)} requests ({len(pool)} distinct), {args.concurrency} concurrent: "
+          f"{len(ok)} ok in {wall:.2f}s, {len(ok) / wall:.1f} req/s\n")
+    print(f"{'':<14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    series = {"latency": [r["total"] for r in ok]}
+    if args.stream:
+        series["first token"] = [r["ttft"] for r in ok if r["ttft"] is not None]
+    for name, values in series.items():
+        if values:
+            p50, p95, p99 = 1000 * np.percentile(values, [50, 95, 99])
+            print(f"{name:<14}{p50:>9.0f}{p95:>9.0f}{p99:>9.0f}")
+
+    batches = after["batches"]["batches"] - before["batches"]["batches"]
+    batched = after["batches"]["questions"] - before["batches"]["questions"]
+    print(f"\nretrieval batches {batches} (mean {batched / max(batches, 1):.1f} questions, "
+          f"largest {after['batches']['largest']}), merged requests {after['merged'] - before['merged']}, "
+          f"LLM calls {after['llm_calls'] - before['llm_calls']}, errors {after['errors'] - before['errors']}")
+
+
+"""
+python stub_llm.py --port 8001 --ttft 0.5 &
+OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python rag_service.py --port 8000 &
+python bench_service.py --requests 1000 --concurrency 300 --distinct 200 --stream
+"""
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# scripts/bench_startup.py
+
+import time
+import resource
+import argparse
+
+from sentence_transformers import SentenceTransformer
+
+import model_registry
+from model_registry import loaded
+
+VECTOR_STORE_DIR = "../vector_store"
+COLLECTION_NAME  = "solr_support"
+EMBED_MODEL      = "all-mpnet-base-v2"
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time and peak memory of bringing up the RAG retriever and the agent's DocRetriever in one process"
+    )
+    parser.add_argument(
+        "--separate", action="store_true",
+        help="Give each component its own model, as before the shared registry"
+    )
+    parser.add_argument("--query", default="How do I tune the filterCache?", help="Query each retriever runs once")
+    args = parser.parse_args()
+
+    import rag_pipeline
+    import agent_tools
+    from rag_pipeline import RAGRetriever
+    from agent_tools import DocRetriever
+
+    if args.separate:
+        # Bypass the registry's cache so every get_model call loads a fresh copy
+        fresh = lambda name, device="cpu", backend=None: SentenceTransformer(name, device=device)
+        for module in (model_registry, rag_pipeline, agent_tools):
+            module.get_model = fresh
+
+    rss0, start = peak_rss_mb(), time.perf_counter()
+    rag = RAGRetriever(VECTOR_STORE_DIR, COLLECTION_NAME, EMBED_MODEL)
+    doc = DocRetriever(persist_dir=VECTOR_STORE_DIR, collection_name=COLLECTION_NAME, embed_model=EMBED_MODEL)
+    built = time.perf_counter() - start
+
+    first = time.perf_counter()
+    rag.retrieve(args.query, 5)
+    doc._run(args.query, 5)
+    queried = time.perf_counter() - first
+
+    print(f"mode:              {'separate models' if args.separate else 'shared registry'}")
+    print(f"construct:         {built:.2f}s")
+    print(f"first queries:     {queried:.2f}s (includes model loads)")
+    print(f"peak RSS:          {peak_rss_mb():.0f} MB (+{peak_rss_mb() - rss0:.0f} MB)")
+    if not args.separate:
+        for what, secs in loaded().items():
+            print(f"loaded once:       {what} in {secs:.2f}s")
+
+
+"""
+python bench_startup.py
+python bench_startup.py --separate
+"""
+if __name__ == "__main__":
+    main()
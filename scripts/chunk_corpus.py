@@ -0,0 +1,152 @@
+# scripts/chunk_corpus.py
+
+import os
+import json
+from typing import Dict, Iterator, List
+
+# ——— CONFIGURATION ———
+CORPUS_NAME    = "chunks"                 # data/chunks/chunks.jsonl or chunks.parquet
+FORMATS        = ("jsonl", "parquet", "files")
+ROW_GROUP_SIZE = 10000                    # parquet rows buffered per row group
+
+# Columns of the Parquet schema, in order; JSONL lines carry the same keys.
+CORPUS_COLUMNS = [
+    ("chunk_id",     "string"),
+    ("issue_number", "int64"),
+    ("source",       "string"),
+    ("comment_id",   "int64"),
+    ("start",        "int64"),
+    ("end",          "int64"),
+    ("text",         "string"),
+    ("repo",         "string"),
+    ("state",        "string"),
+    ("labels",       "list<string>"),
+    ("author",       "string"),      # issue author for body chunks, comment author for comments
+    ("created_at",   "string"),      # the issue's timestamps, ISO 8601
+    ("updated_at",   "string"),
+    ("subject",      "string"),      # mailing-list chunks only (ingest_mbox.py)
+    ("message_id",   "string"),
+]
+
+
+def _arrow_type(pa, typ: str):
+    return pa.list_(pa.string()) if typ == "list<string>" else getattr(pa, typ)()
+
+
+def corpus_path(output_dir: str, fmt: str) -> str:
+    return os.path.join(output_dir, f"{CORPUS_NAME}.{fmt}")
+
+
+def find_corpus(data_dir: str) -> str:
+    """The corpus file in data_dir if there is one, else data_dir itself (per-chunk files)."""
+    for fmt in ("parquet", "jsonl"):
+        path = corpus_path(data_dir, fmt)
+        if os.path.exists(path):
+            return path
+    return data_dir
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("The parquet chunk corpus needs pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+class CorpusWriter:
+    """
+    Streams chunk dicts into one JSONL or Parquet file.
+    Writes go to `<path>.tmp`, renamed over `path` on close(), so readers
+    never see a half-written corpus.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp = path + ".tmp"
+        self.parquet = path.endswith(".parquet")
+        self._rows: List[Dict] = []
+        if self.parquet:
+            pa = _pyarrow()
+            self._schema = pa.schema([(name, _arrow_type(pa, typ)) for name, typ in CORPUS_COLUMNS])
+            self._f = pa.parquet.ParquetWriter(self.tmp, self._schema)
+        else:
+            self._f = open(self.tmp, "w")
+
+    def write(self, chunks: List[Dict]):
+        if not self.parquet:
+            for chunk in chunks:
+                self._f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            return
+        self._rows.extend(chunks)
+        if len(self._rows) >= ROW_GROUP_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._rows:
+            pa = _pyarrow()
+            cols = {name: [row.get(name) for row in self._rows] for name, _ in CORPUS_COLUMNS}
+            self._f.write_table(pa.Table.from_pydict(cols, schema=self._schema))
+            self._rows = []
+
+    def close(self):
+        if self.parquet:
+            self._flush()
+        self._f.close()
+        os.replace(self.tmp, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        else:
+            self._f.close()
+            os.remove(self.tmp)
+
+
+def iter_chunks(source: str) -> Iterator[Dict]:
+    """
+    Stream chunk dicts from a .jsonl or .parquet corpus, or from a directory
+    of per-chunk JSON files. Only one batch is held in memory at a time.
+    """
+    if os.path.isdir(source):
+        for fname in os.listdir(source):
+            if not fname.endswith(".json") or fname.startswith("."):
+                continue   # dotfiles are chunker bookkeeping
+            with open(os.path.join(source, fname), "r") as f:
+                yield json.load(f)
+    elif source.endswith(".parquet"):
+        pq = _pyarrow().parquet
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=ROW_GROUP_SIZE):
+            for row in batch.to_pylist():
+                yield {k: v for k, v in row.items() if v is not None}
+    else:
+        with open(source, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def iter_batches(source: str, batch_size: int) -> Iterator[List[Dict]]:
+    """Group iter_chunks(source) into lists of at most batch_size chunks."""
+    batch = []
+    for chunk in iter_chunks(source):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def count_chunks(source: str) -> int:
+    """Cheap chunk count for progress bars (parquet footer, line count or listing)."""
+    if os.path.isdir(source):
+        return sum(1 for f in os.listdir(source) if f.endswith(".json") and not f.startswith("."))
+    if source.endswith(".parquet"):
+        return _pyarrow().parquet.ParquetFile(source).metadata.num_rows
+    with open(source, "rb") as f:
+        return sum(1 for line in f if line.strip())
@@ -2,9 +2,22 @@
 import os
 import json
 import argparse
+import time
+import hashlib
+import multiprocessing
 import nltk
 from nltk.tokenize import word_tokenize, sent_tokenize
 
+from issue_store import IssueStore, is_store, repo_from_issue
+from chunk_corpus import CorpusWriter, FORMATS, corpus_path, iter_chunks
+import metrics
+
+MANIFEST_FILE  = ".chunk_manifest.json"   # per-issue input hash + chunk ids
+TOMBSTONE_FILE = ".tombstones.jsonl"      # chunk ids to delete from the index
+EMBED_MODEL    = "sentence-transformers/all-mpnet-base-v2"   # window is counted in its tokens
+CHUNKERS       = ("offsets", "nltk")
+CHUNK_IDS      = 2    # chunk id scheme, part of issue_hash: bumping it re-chunks (and tombstones) everything once
+
 # Ensure NLTK sentence tokenizer data is available
 nltk.download('punkt', quiet=True)
 
@@ -43,6 +56,50 @@ def chunk_text(text, chunk_size, overlap):
         all_tokens.extend(tokenize(sent))
     return chunk_tokens(all_tokens, chunk_size, overlap)
 
+_tokenizer = None
+
+def get_tokenizer():
+    """Load the embedding model's fast tokenizer once per process."""
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+        _tokenizer = AutoTokenizer.from_pretrained(EMBED_MODEL, use_fast=True)
+    return _tokenizer
+
+def chunk_spans(text, chunk_size, overlap, tokenizer=None):
+    """
+    Split text into overlapping windows of embedding-model tokens and return
+    (start, end) character offsets into the original text. Slicing the source
+    keeps code and stack traces intact, and a window can never exceed what
+    the model actually sees.
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    offsets = tokenizer(
+        text, add_special_tokens=False, return_offsets_mapping=True,
+        return_attention_mask=False, return_token_type_ids=False, verbose=False
+    )["offset_mapping"]
+    stride = chunk_size - overlap
+    spans = []
+    for start in range(0, len(offsets), stride):
+        window = offsets[start:start + chunk_size]
+        if window:
+            spans.append((window[0][0], window[-1][1]))
+        if start + chunk_size >= len(offsets):
+            break
+    return spans
+
+def split_text(text, chunk_size, overlap, chunker="offsets"):
+    """
+    Yield (chunk_text, start, end) for each window of text.
+    The legacy "nltk" chunker re-joins word tokens, so it has no offsets.
+    """
+    if chunker == "nltk":
+        for tokens in chunk_text(text, chunk_size, overlap):
+            yield detokenize(tokens), None, None
+    else:
+        for start, end in chunk_spans(text, chunk_size, overlap):
+            yield text[start:end], start, end
+
 def process_issue_file(filepath, output_dir, chunk_size, overlap):
     """
     Read one issue JSON, chunk its title+body and each comment,
@@ -50,44 +107,210 @@ def process_issue_file(filepath, output_dir, chunk_size, overlap):
     """
     with open(filepath, 'r') as f:
         issue = json.load(f)
+    process_issue(issue, output_dir, chunk_size, overlap)
 
+def process_issue(issue, output_dir, chunk_size, overlap, chunker="offsets"):
+    """
+    Chunk one issue dict's title+body and each comment,
+    and write chunk files to output_dir.
+    """
+    write_chunks(chunk_issue(issue, chunk_size, overlap, chunker,
+                             repo=repo_from_issue(issue, None)), output_dir)
+
+def _with_offsets(out, start, end):
+    if start is not None:
+        out["start"], out["end"] = start, end
+    return out
+
+def chunk_issue(issue, chunk_size, overlap, chunker="offsets", repo=None):
+    """
+    Chunk one issue dict's title+body and each comment.
+    Returns the list of chunk dicts; does no I/O, so it can run in a worker.
+    With the "offsets" chunker each chunk carries start/end character offsets
+    into its source text (title+body, or the comment body). Every chunk also
+    carries the issue's repo, state, labels and timestamps, and its author,
+    so the index can filter on them.
+    """
     issue_num = issue.get("number", "unknown")
-    base_id   = f"issue_{issue_num}"
+    # apache/solr and apache/lucene-solr both number issues from 1, so the repo is part of the id
+    base_id   = f"issue_{repo.replace('/', '_')}_{issue_num}" if repo else f"issue_{issue_num}"
+    chunks    = []
+    fields    = {
+        "repo":       repo,
+        "state":      issue.get("state"),
+        "labels":     issue.get("labels", []),
+        "created_at": issue.get("created_at"),
+        "updated_at": issue.get("updated_at"),
+    }
 
     # Prepare combined title+body
     text_body = f"{issue.get('title','')} {issue.get('body','')}".strip()
-    body_chunks = chunk_text(text_body, chunk_size, overlap)
-
-    # Write body chunks
-    for idx, tokens in enumerate(body_chunks):
-        chunk_id = f"{base_id}_body_{idx}"
-        out = {
+    for idx, (text, start, end) in enumerate(split_text(text_body, chunk_size, overlap, chunker)):
+        chunks.append(_with_offsets({
             "issue_number": issue_num,
             "source": "body",
-            "chunk_id": chunk_id,
-            "text": detokenize(tokens)
-        }
-        out_path = os.path.join(output_dir, f"{chunk_id}.json")
-        with open(out_path, 'w') as cf:
-            json.dump(out, cf, ensure_ascii=False, indent=2)
+            "chunk_id": f"{base_id}_body_{idx}",
+            "text": text,
+            "author": issue.get("author"),
+            **fields
+        }, start, end))
 
     # Process comments
     for comment in issue.get("comments", []):
         comment_id = comment.get("id", "x")
         ctext      = comment.get("body", "")
-        c_chunks   = chunk_text(ctext, chunk_size, overlap)
-        for idx, tokens in enumerate(c_chunks):
-            chunk_id = f"{base_id}_comment_{comment_id}_{idx}"
-            out = {
+        for idx, (text, start, end) in enumerate(split_text(ctext, chunk_size, overlap, chunker)):
+            chunks.append(_with_offsets({
                 "issue_number": issue_num,
                 "source": "comment",
                 "comment_id": comment_id,
-                "chunk_id": chunk_id,
-                "text": detokenize(tokens)
-            }
-            out_path = os.path.join(output_dir, f"{chunk_id}.json")
-            with open(out_path, 'w') as cf:
-                json.dump(out, cf, ensure_ascii=False, indent=2)
+                "chunk_id": f"{base_id}_comment_{comment_id}_{idx}",
+                "text": text,
+                "author": comment.get("author"),
+                **fields
+            }, start, end))
+    return chunks
+
+def write_chunks(chunks, output_dir):
+    """Write each chunk dict to output_dir/<chunk_id>.json."""
+    for out in chunks:
+        out_path = os.path.join(output_dir, f"{out['chunk_id']}.json")
+        with open(out_path, 'w') as cf:
+            json.dump(out, cf, ensure_ascii=False, indent=2)
+
+def issue_hash(issue, chunk_size, overlap, chunker="offsets"):
+    """
+    Hash of everything that feeds the chunks (title, body, comment ids/bodies,
+    and the metadata copied onto them) plus the chunking parameters and the
+    chunk id scheme, so a changed setting also re-chunks.
+    """
+    h = hashlib.sha256()
+    h.update(json.dumps([
+        chunk_size, overlap, chunker, CHUNK_IDS,
+        issue.get("number"), issue.get("title", ""), issue.get("body", ""),
+        issue.get("state"), issue.get("labels", []), issue.get("author"),
+        issue.get("created_at"), issue.get("updated_at"),
+        [[c.get("id"), c.get("body", ""), c.get("author")] for c in issue.get("comments", [])]
+    ], ensure_ascii=False).encode("utf-8"))
+    return h.hexdigest()
+
+def iter_issues(input_dir):
+    """Yield (repo, issue) from an issue store or a directory of issue JSONs."""
+    if is_store(input_dir):
+        # Stream issues straight out of the sharded store
+        with IssueStore(input_dir) as store:
+            yield from store.iter_issues()
+        return
+    for fname in os.listdir(input_dir):
+        if not fname.endswith(".json") or fname.startswith("."):
+            continue
+        with open(os.path.join(input_dir, fname), 'r') as f:
+            issue = json.load(f)
+        yield repo_from_issue(issue, fname.split("_issue_")[0]), issue
+
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_manifest(output_dir, manifest):
+    # Write-then-rename so a crash never leaves a half-written manifest
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + ".tmp", 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+def _chunk_job(job):
+    """Process-pool entry point: (key, hash, issue, *chunk args) -> (key, hash, chunks, seconds)."""
+    key, digest, issue, chunk_size, overlap, chunker = job
+    repo = key.rsplit("#", 1)[0]
+    start = time.perf_counter()
+    chunks = chunk_issue(issue, chunk_size, overlap, chunker, repo=repo)
+    return key, digest, chunks, time.perf_counter() - start
+
+@metrics.timed("chunk_issues.chunk_all")
+def chunk_all(input_dir, output_dir, chunk_size, overlap,
+              workers=None, incremental=False, chunker="offsets", fmt="jsonl"):
+    """
+    Chunk every issue across a pool of worker processes.
+
+    With fmt "jsonl" or "parquet" all chunks stream into one corpus file in
+    output_dir; with "files" each chunk is its own JSON file (legacy layout).
+
+    A manifest of input content hashes and the chunk ids each issue produced
+    is kept in output_dir. With `incremental`, issues whose hash is unchanged
+    are skipped: their chunks are copied over from the previous corpus (or
+    left in place as files). Chunk ids an issue no longer produces (edited or
+    deleted comments, shorter bodies, deleted issues) are dropped and
+    appended to the tombstone log for index_chunks.py to delete.
+    Returns (chunked, skipped, tombstoned) counts.
+    """
+    manifest = load_manifest(output_dir)
+    corpus = corpus_path(output_dir, fmt) if fmt != "files" else None
+    if corpus and not os.path.exists(corpus):
+        incremental = False   # nothing to carry unchanged chunks over from
+    seen = set()
+    skipped = 0
+
+    def jobs():
+        nonlocal skipped
+        for repo, issue in iter_issues(input_dir):
+            key = f"{repo}#{issue.get('number', 'unknown')}"
+            digest = issue_hash(issue, chunk_size, overlap, chunker)
+            seen.add(key)
+            if incremental and manifest.get(key, {}).get("hash") == digest:
+                skipped += 1
+                continue
+            yield key, digest, issue, chunk_size, overlap, chunker
+
+    stale = []
+    replaced = set()   # previous chunk ids of every re-chunked issue
+    chunked = 0
+    writer = CorpusWriter(corpus) if corpus else None
+    with multiprocessing.Pool(workers) as pool:
+        for key, digest, chunks, seconds in pool.imap_unordered(_chunk_job, jobs(), chunksize=8):
+            # Workers time their own issues; the spans are recorded here, in the parent
+            metrics.observe("chunk_issues.chunk_issue", seconds)
+            metrics.count("chunk_issues.chunks", len(chunks))
+            new_ids = [c["chunk_id"] for c in chunks]
+            old_ids = manifest.get(key, {}).get("chunks", [])
+            stale.extend((cid, key) for cid in set(old_ids) - set(new_ids))
+            if writer:
+                writer.write(chunks)
+                replaced.update(old_ids)
+                replaced.update(new_ids)
+            else:
+                write_chunks(chunks, output_dir)
+            manifest[key] = {"hash": digest, "chunks": new_ids}
+            chunked += 1
+
+    # Issues that disappeared from the input take all their chunks with them
+    for key in set(manifest) - seen:
+        stale.extend((cid, key) for cid in manifest.pop(key)["chunks"])
+
+    if writer:
+        if incremental:
+            # Carry the unchanged issues' chunks over from the previous corpus
+            dropped = replaced | {cid for cid, _ in stale}
+            for chunk in iter_chunks(corpus):
+                if chunk["chunk_id"] not in dropped:
+                    writer.write([chunk])
+        writer.close()
+
+    if stale:
+        with open(os.path.join(output_dir, TOMBSTONE_FILE), 'a') as f:
+            for cid, key in stale:
+                path = os.path.join(output_dir, f"{cid}.json")
+                if os.path.exists(path):
+                    os.remove(path)
+                f.write(json.dumps({"chunk_id": cid, "issue": key}) + "\n")
+    save_manifest(output_dir, manifest)
+    metrics.count("chunk_issues.issues_chunked", chunked)
+    metrics.count("chunk_issues.issues_skipped", skipped)
+    metrics.count("chunk_issues.chunks_tombstoned", len(stale))
+    return chunked, skipped, len(stale)
 
 def main():
     parser = argparse.ArgumentParser(
@@ -95,39 +318,63 @@ def main():
     )
     parser.add_argument(
         "--input-dir", "-i", required=True,
-        help="Directory containing issue JSON files"
+        help="Issue store directory, or a directory of per-issue JSON files"
     )
     parser.add_argument(
         "--output-dir", "-o", required=True,
-        help="Directory to write chunk JSON files"
+        help="Directory to write the chunk corpus (or chunk JSON files) to"
+    )
+    parser.add_argument(
+        "--format", "-f", choices=FORMATS, default="jsonl",
+        help="jsonl: one chunks.jsonl corpus (default); parquet: one chunks.parquet "
+             "(needs pyarrow); files: one JSON file per chunk"
     )
     parser.add_argument(
         "--chunk-size", "-c", type=int, default=300,
-        help="Maximum number of tokens per chunk (default: 300)"
+        help="Maximum number of embedding-model tokens per chunk (default: 300)"
     )
     parser.add_argument(
         "--overlap", "-l", type=int, default=60,
         help="Number of tokens to overlap between chunks (default: 60)"
     )
+    parser.add_argument(
+        "--chunker", choices=CHUNKERS, default="offsets",
+        help="offsets: slice the source text by mpnet token offsets (default); "
+             "nltk: legacy sentence/word tokenize and re-join"
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=os.cpu_count(),
+        help="Worker processes for tokenization (default: all cores)"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Skip issues whose content hash matches the last run's manifest"
+    )
+    parser.add_argument(
+        "--metrics", metavar="PATH",
+        help="Write timing spans and counters here afterwards (.prom/.txt: Prometheus text, else JSON)"
+    )
     args = parser.parse_args()
 
     os.makedirs(args.output_dir, exist_ok=True)
 
-    # Process each JSON file in the input directory
-    for fname in os.listdir(args.input_dir):
-        if not fname.endswith(".json"):
-            continue
-        fpath = os.path.join(args.input_dir, fname)
-        process_issue_file(fpath, args.output_dir, args.chunk_size, args.overlap)
-
-    print(f"Chunking complete. Chunks written to: {args.output_dir}")
+    chunked, skipped, tombstoned = chunk_all(
+        args.input_dir, args.output_dir, args.chunk_size, args.overlap,
+        workers=args.workers, incremental=args.incremental, chunker=args.chunker,
+        fmt=args.format
+    )
+    print(f"Chunking complete: {chunked} issues chunked, {skipped} unchanged, "
+          f"{tombstoned} stale chunks tombstoned. Chunks written to: {args.output_dir}")
+    if args.metrics:
+        metrics.write(args.metrics)
 
 """
 python chunk_issues.py \
   --input-dir data/github_issues \
   --output-dir data/chunks \
   --chunk-size 300 \
-  --overlap 60
+  --overlap 60 \
+  --incremental
 """
 if __name__ == "__main__":
     main()
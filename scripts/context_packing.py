@@ -0,0 +1,155 @@
+# scripts/context_packing.py
+
+import os
+import re
+import threading
+from typing import Dict, List, Tuple
+
+# ——— CONFIGURATION ———
+CONTEXT_TOKENS   = int(os.getenv("CONTEXT_TOKENS", "3000"))   # prompt tokens the passages may take
+DEFAULT_ENCODING = "o200k_base"     # tiktoken encoding for models tiktoken doesn't know
+OVERLAP_PROBE    = 32               # chars of a chunk's start searched for in its predecessor's tail
+MIN_TAIL_TOKENS  = 64               # a passage cut to fit the budget keeps at least this many tokens
+
+CHUNK_ID = re.compile(r"^issue_(?:(.+)_)?(\d+|unknown)_(body|comment_(.+))_(\d+)$")   # repo is absent in old ids
+MAIL_CHUNK_ID = re.compile(r"^mail_(.+)_([0-9a-f]{12})_(\d+)$")
+
+_encodings: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def get_encoding(model: str):
+    """The tiktoken encoding for an OpenAI model, loaded once per process."""
+    with _lock:
+        if model not in _encodings:
+            import tiktoken
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding(DEFAULT_ENCODING)
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str) -> int:
+    return len(get_encoding(model).encode(text))
+
+
+def chunk_position(chunk_id: str) -> Tuple[Tuple, int]:
+    """
+    (group, index) from a chunk id: chunks of one issue body, of one
+    comment, or of one mailing-list message share a group and are numbered
+    in text order.
+    """
+    m = CHUNK_ID.match(chunk_id)
+    if m is None:
+        m = MAIL_CHUNK_ID.match(chunk_id)
+        if m is None:
+            return (chunk_id,), 0
+        mail_list, message, idx = m.groups()
+        return (mail_list, "mail", message), int(idx)
+    repo, issue, source, comment, idx = m.groups()
+    return (repo, issue, "comment" if comment else "body", comment), int(idx)
+
+
+def overlap(prev: str, text: str) -> int:
+    """
+    Length of the longest suffix of prev that text starts with. Consecutive
+    chunks repeat the chunker's overlap verbatim, so a short probe of text
+    found in prev's tail pins down where the repeat starts.
+    """
+    probe = text[:OVERLAP_PROBE]
+    if not probe:
+        return 0
+    i = prev.find(probe, max(0, len(prev) - len(text)))
+    while i != -1:
+        if text.startswith(prev[i:]):
+            return len(prev) - i
+        i = prev.find(probe, i + 1)
+    return 0
+
+
+def chunk_span(hit: Dict):
+    """
+    (group, start, end) from a hit's metadata for chunks indexed with their
+    character offsets: chunks of one issue body, one comment or one mail
+    message share a group, and start/end locate them in its text.
+    None for chunks indexed without offsets.
+    """
+    meta = hit.get("metadata") or {}
+    if meta.get("start") is None or meta.get("end") is None:
+        return None
+    group = (meta.get("repo"), meta.get("issue_number"), meta.get("source"), meta.get("comment_id"))
+    return group, int(meta["start"]), int(meta["end"])
+
+
+def merge_hits(hits: List[Dict]) -> List[Dict]:
+    """
+    Merge retrieved chunks that are adjacent in the same issue body or
+    comment into one passage, dropping the text they repeat. Chunks with
+    start/end offsets are merged when their spans overlap or touch, and
+    only the part past the passage's end is appended; chunks without them
+    (indexed before offsets were stored, or by the nltk chunker) fall back
+    to consecutive chunk-id numbers and a search for the repeated text.
+    Each passage is {"ids", "text", "metadata", "score"} with the metadata
+    and score of its best-ranked chunk; passages are ordered by their best
+    chunk's rank, so the top hit is still cited first.
+    """
+    groups: Dict[Tuple, List] = {}
+    for rank, hit in enumerate(hits):
+        span = chunk_span(hit)
+        if span is not None:
+            group, start, end = span
+            groups.setdefault(("span",) + group, []).append((start, end, rank, hit))
+        else:
+            group, idx = chunk_position(hit["id"])
+            groups.setdefault(("id",) + group, []).append((idx, None, rank, hit))
+
+    passages = []
+    for members in groups.values():
+        members.sort(key=lambda m: m[:2])
+        run = None
+        for pos, end, rank, hit in members:
+            if run is not None and end is not None and pos <= run["end"]:
+                # hit's text is source[pos:end], so what follows the passage starts at run["end"] - pos
+                run["text"] += hit["text"][run["end"] - pos:]
+                run["end"] = max(run["end"], end)
+            elif run is not None and end is None and pos == run["end"] + 1:
+                cut = overlap(run["text"], hit["text"])
+                run["text"] += hit["text"][cut:] if cut else " " + hit["text"]
+                run["end"] = pos
+            else:
+                if run is not None:
+                    passages.append(run)
+                run = {"ids": [hit["id"]], "text": hit["text"], "metadata": hit["metadata"],
+                       "score": hit.get("score"), "rank": rank, "end": pos if end is None else end}
+                continue
+            run["ids"].append(hit["id"])
+            if rank < run["rank"]:
+                run.update(rank=rank, metadata=hit["metadata"], score=hit.get("score"))
+        passages.append(run)
+
+    passages.sort(key=lambda p: p["rank"])
+    return [{k: p[k] for k in ("ids", "text", "metadata", "score")} for p in passages]
+
+
+def pack_context(hits: List[Dict], model: str, budget: int = CONTEXT_TOKENS) -> List[Dict]:
+    """
+    Merge hits into passages (see merge_hits) and keep them, best first,
+    while their text fits in budget tokens of the model's tokenizer. The
+    passage that crosses the budget is cut to what is left if that is at
+    least MIN_TAIL_TOKENS, and packing stops there. Each passage gets its
+    "tokens" count.
+    """
+    enc = get_encoding(model)
+    packed, used = [], 0
+    for passage in merge_hits(hits):
+        tokens = enc.encode(passage["text"])
+        left = budget - used
+        if len(tokens) > left:
+            if left >= MIN_TAIL_TOKENS or not packed:
+                tokens = tokens[:left]
+                packed.append({**passage, "text": enc.decode(tokens), "tokens": len(tokens)})
+            break
+        packed.append({**passage, "tokens": len(tokens)})
+        used += len(tokens)
+    return packed
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# scripts/dedup_chunks.py
+
+import os
+import re
+import json
+import zlib
+import hashlib
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+from chunk_corpus import find_corpus, iter_chunks
+
+# ——— CONFIGURATION ———
+DATA_DIR   = "../data/chunks"
+DEDUP_FILE = ".dedup.json"     # duplicate chunk id -> canonical chunk id
+SHINGLE    = 5                 # words per shingle
+BANDS      = 16                # LSH bands × rows = MinHash permutations
+ROWS       = 8                 # (1/16)^(1/8) ≈ 0.71: pairs above ~0.7 Jaccard collide
+THRESHOLD  = 0.8               # estimated Jaccard needed to call two chunks duplicates
+
+_MERSENNE = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_WORD_RE  = re.compile(r"\w+")
+
+
+class MinHasher:
+    """MinHash signatures over lower-cased word shingles, vectorised with numpy."""
+
+    def __init__(self, num_perm: int = BANDS * ROWS, shingle: int = SHINGLE, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.shingle = shingle
+        self.a = rng.randint(1, _MERSENNE, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.randint(0, _MERSENNE, size=(num_perm, 1), dtype=np.uint64)
+
+    def shingles(self, text: str) -> np.ndarray:
+        words = _WORD_RE.findall(text.lower())
+        if len(words) <= self.shingle:
+            grams = [" ".join(words)]
+        else:
+            grams = {" ".join(words[i:i + self.shingle]) for i in range(len(words) - self.shingle + 1)}
+        return np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        # (a*x + b) mod p per permutation, min over shingles. The uint64 product
+        # is allowed to wrap; that is what spreads the 32-bit inputs over p.
+        with np.errstate(over="ignore"):
+            hashed = ((self.a * self.shingles(text)[None, :] + self.b) % _MERSENNE) & _MAX_HASH
+        return hashed.min(axis=1).astype(np.uint32)
+
+
+def _canonical_rank(chunk: Dict) -> Tuple:
+    # Prefer the oldest issue, and an issue body over a comment quoting it
+    number = chunk.get("issue_number")
+    return (not isinstance(number, int), number if isinstance(number, int) else 0,
+            chunk.get("source") != "body", chunk["chunk_id"])
+
+
+def text_digest(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def find_duplicates(source: str, threshold: float = THRESHOLD,
+                    bands: int = BANDS, rows: int = ROWS) -> Tuple[Dict[str, str], Dict[str, str], Dict]:
+    """
+    Cluster near-duplicate chunks with MinHash + LSH banding.
+    Returns ({duplicate chunk id: canonical chunk id}, {chunk id: text digest}
+    for every chunk in a cluster, stats).
+    """
+    hasher = MinHasher(bands * rows)
+    ids, ranks, lengths, sigs, digests = [], [], [], [], []
+    for chunk in tqdm(iter_chunks(source), desc="MinHashing", unit="chunk"):
+        ids.append(chunk["chunk_id"])
+        ranks.append(_canonical_rank(chunk))
+        lengths.append(len(chunk["text"]))
+        sigs.append(hasher.signature(chunk["text"]))
+        digests.append(text_digest(chunk["text"]))
+    if not ids:
+        return {}, {}, {"chunks": 0, "duplicates": 0, "clusters": 0, "chars_saved": 0, "chars_total": 0}
+    sigs = np.vstack(sigs)
+
+    # Leader clustering: chunks are taken best canonical first, and each one
+    # joins the most similar leader it shares an LSH bucket with if their
+    # full signatures agree on at least `threshold`; otherwise it leads a
+    # cluster of its own. Every duplicate is thus within threshold of its
+    # canonical, so a chain of small edits can't drift into one cluster.
+    buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(bands)]
+    dup_map, member_digests = {}, {}
+    members: Dict[int, int] = {}     # leader -> duplicates assigned to it
+    chars_saved = 0
+    for i in sorted(range(len(ids)), key=lambda i: ranks[i]):
+        keys = [sigs[i, band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+        candidates = {j for band, key in enumerate(keys) for j in buckets[band].get(key, ())}
+        best, best_sim = None, threshold
+        for j in sorted(candidates, key=lambda j: ranks[j]):
+            sim = np.mean(sigs[i] == sigs[j])
+            if sim > best_sim or (best is None and sim >= best_sim):
+                best, best_sim = j, sim
+        if best is None:
+            for band, key in enumerate(keys):
+                buckets[band].setdefault(key, []).append(i)
+            continue
+        dup_map[ids[i]] = ids[best]
+        member_digests[ids[i]], member_digests[ids[best]] = digests[i], digests[best]
+        members[best] = members.get(best, 0) + 1
+        chars_saved += lengths[i]
+
+    stats = {
+        "chunks":      len(ids),
+        "duplicates":  len(dup_map),
+        "clusters":    len(members),
+        "chars_saved": chars_saved,
+        "chars_total": sum(lengths),
+    }
+    return dup_map, member_digests, stats
+
+
+def load_dedup(data_dir: str) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    """
+    Load the dedup map written by this script, checked against the current
+    corpus: a pair is dropped when either chunk is gone or its text changed
+    since the map was built (re-chunking after an edit), so the duplicate is
+    embedded again instead of relying on a canonical that no longer holds
+    its text. A map from before digests were recorded can't be checked and
+    is ignored. Returns (duplicate -> canonical, canonical -> [duplicates]);
+    empty if none.
+    """
+    path = os.path.join(data_dir, DEDUP_FILE)
+    if not os.path.exists(path):
+        return {}, {}
+    with open(path, "r") as f:
+        saved = json.load(f)
+    dup_map, digests = saved["duplicates"], saved.get("digests")
+    if dup_map and digests is None:
+        print(f"Ignoring {path}: written by an older dedup_chunks.py, re-run it.")
+        return {}, {}
+    if dup_map:
+        current = {c["chunk_id"]: text_digest(c["text"]) for c in iter_chunks(find_corpus(data_dir))
+                   if c["chunk_id"] in digests}
+        valid = {cid for cid, digest in digests.items() if current.get(cid) == digest}
+        dup_map = {dup: canon for dup, canon in dup_map.items() if dup in valid and canon in valid}
+    members: Dict[str, List[str]] = {}
+    for dup, canon in dup_map.items():
+        members.setdefault(canon, []).append(dup)
+    return dup_map, members
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find near-duplicate chunks so only one per cluster gets embedded"
+    )
+    parser.add_argument(
+        "--data-dir", "-d", default=DATA_DIR,
+        help=f"Chunk corpus directory (default: {DATA_DIR})"
+    )
+    parser.add_argument(
+        "--threshold", "-t", type=float, default=THRESHOLD,
+        help=f"Estimated Jaccard similarity to count as a duplicate (default: {THRESHOLD})"
+    )
+    args = parser.parse_args()
+
+    dup_map, digests, stats = find_duplicates(find_corpus(args.data_dir), args.threshold)
+    path = os.path.join(args.data_dir, DEDUP_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump({"stats": stats, "duplicates": dup_map, "digests": digests}, f)
+    os.replace(path + ".tmp", path)
+
+    pct = 100.0 * stats["duplicates"] / max(stats["chunks"], 1)
+    print(f"{stats['duplicates']} of {stats['chunks']} chunks ({pct:.1f}%) are near-duplicates "
+          f"in {stats['clusters']} clusters; skipping them saves "
+          f"{stats['chars_saved'] / 1e6:.1f} MB of text to embed and store.")
+    print(f"Dedup map written to: {path}")
+
+
+"""
+python dedup_chunks.py --data-dir ../data/chunks --threshold 0.8
+"""
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+# scripts/embedding_cache.py
+
+import os
+import re
+import hashlib
+from typing import Callable, Dict, List
+
+import numpy as np
+
+# ——— CONFIGURATION ———
+CACHE_DIR   = "../vector_store/embedding_cache"
+KEY_BYTES   = 16                     # blake2b digest of the text
+VECTORS     = "vectors.bin"
+KEYS        = "keys.bin"
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+def model_revision(model) -> str:
+    """Best-effort revision of a SentenceTransformer (the HF commit it was loaded from)."""
+    try:
+        return model[0].auto_model.config._commit_hash or "local"
+    except (AttributeError, IndexError, TypeError):
+        return "local"
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache keyed by (model name, model revision, text hash).
+
+    Each model@revision gets its own directory holding an append-only matrix
+    of vectors (float16 by default) and a parallel file of fixed-size text
+    hashes; row i of one belongs to key i of the other. The matrix is read
+    through np.memmap, so only the rows actually looked up are paged in.
+    """
+
+    def __init__(self, model_name: str, revision: str, dim: int,
+                 root: str = CACHE_DIR, dtype=np.float16):
+        safe = re.sub(r"[^A-Za-z0-9._-]+", "_", f"{model_name}@{revision}")
+        self.dir = os.path.join(root, safe)
+        os.makedirs(self.dir, exist_ok=True)
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self._vec_path = os.path.join(self.dir, VECTORS)
+        self._key_path = os.path.join(self.dir, KEYS)
+        self._mm = None
+        self.hits = self.misses = 0
+
+        keys = np.fromfile(self._key_path, dtype=f"S{KEY_BYTES}") if os.path.exists(self._key_path) else []
+        row_bytes = self.dim * self.dtype.itemsize
+        rows = os.path.getsize(self._vec_path) // row_bytes if os.path.exists(self._vec_path) else 0
+        # Vectors are written before keys; a torn append leaves extra rows, never extra keys
+        self.rows = min(len(keys), rows)
+        self.index: Dict[bytes, int] = {bytes(k): i for i, k in enumerate(keys[:self.rows])}
+        if len(keys) != self.rows or rows != self.rows:
+            self._truncate(row_bytes)
+
+    def _truncate(self, row_bytes: int):
+        with open(self._vec_path, "ab") as f:
+            f.truncate(self.rows * row_bytes)
+        with open(self._key_path, "ab") as f:
+            f.truncate(self.rows * KEY_BYTES)
+
+    def __len__(self):
+        return self.rows
+
+    def _matrix(self) -> np.ndarray:
+        if self._mm is None or self._mm.shape[0] != self.rows:
+            self._mm = np.memmap(self._vec_path, dtype=self.dtype, mode="r", shape=(self.rows, self.dim))
+        return self._mm
+
+    def get(self, texts: List[str]):
+        """Return (vectors for the hits, positions of the misses) for texts."""
+        keys = [text_key(t) for t in texts]
+        rows = [self.index.get(k) for k in keys]
+        hit_pos = [i for i, r in enumerate(rows) if r is not None]
+        miss_pos = [i for i, r in enumerate(rows) if r is None]
+        vectors = np.asarray(self._matrix()[[rows[i] for i in hit_pos]], dtype=np.float32) \
+            if hit_pos and self.rows else np.empty((0, self.dim), dtype=np.float32)
+        return hit_pos, vectors, miss_pos
+
+    def put(self, texts: List[str], vectors: np.ndarray):
+        """Append vectors for texts not already cached."""
+        new = [(text_key(t), v) for t, v in zip(texts, vectors) if text_key(t) not in self.index]
+        if not new:
+            return
+        with open(self._vec_path, "ab") as f:
+            np.asarray([v for _, v in new], dtype=self.dtype).tofile(f)
+        with open(self._key_path, "ab") as f:
+            f.write(b"".join(k for k, _ in new))
+        for k, _ in new:
+            self.index[k] = self.rows
+            self.rows += 1
+
+    def encode(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """
+        Embeddings for texts in order: hits come from the cache, and only the
+        misses (each distinct text once) are passed to encode_fn and stored.
+        """
+        out = np.empty((len(texts), self.dim), dtype=np.float32)
+        hit_pos, vectors, miss_pos = self.get(texts)
+        if hit_pos:
+            out[hit_pos] = vectors
+        if miss_pos:
+            unique = list(dict.fromkeys(texts[i] for i in miss_pos))
+            encoded = np.asarray(encode_fn(unique), dtype=np.float32)
+            by_text = dict(zip(unique, encoded))
+            out[miss_pos] = [by_text[texts[i]] for i in miss_pos]
+            self.put(unique, encoded)
+        self.hits += len(hit_pos)
+        self.misses += len(miss_pos)
+        return out
@@ -1,70 +1,62 @@
 # scripts/fetch_github_issues.py
 
 import os
-import json
-import time
-from github import Github
-from tqdm import tqdm
+import argparse
 from dotenv import load_dotenv
 
+from github_sync import GitHubClient, RateLimiter, SyncState, sync_repo, API_URL, STATE_FILE, WORKERS
+from issue_store import IssueStore
+
 # Load GitHub token from .env or environment
 load_dotenv()
 TOKEN = os.getenv("GITHUB_TOKEN")
 if not TOKEN:
     raise RuntimeError("Please set your GITHUB_TOKEN in the environment or .env file")
 
-# Initialize GitHub client
-gh = Github(TOKEN)
-
 # Repositories to ingest
 REPOS = ["apache/solr", "apache/lucene-solr"]
 OUTPUT_DIR = "../data/github_issues"
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-CRAWL_DELAY = 1  # seconds
-
-def fetch_and_save_issues(repo_name: str):
-    repo = gh.get_repo(repo_name)
-    issues = repo.get_issues(state="all")
-    total = getattr(issues, "totalCount", None)
-
-    loop = tqdm(issues, total=total, desc=f"Fetching {repo_name}", unit="issue")
-    for issue in loop:
-        # Fetch comments list
-        comments_data = []
-        for comment in issue.get_comments():
-            comments_data.append({
-                "id":          comment.id,
-                "author":      comment.user.login,
-                "body":        comment.body,
-                "created_at":  comment.created_at.isoformat()
-            })
-            time.sleep(0.1)  # slight delay per-comment to avoid secondary rate limits
-
-        data = {
-            "id":           issue.id,
-            "number":       issue.number,
-            "title":        issue.title,
-            "body":         issue.body or "",
-            "state":        issue.state,
-            "labels":       [l.name for l in issue.labels],
-            "comments":     comments_data,          # now the full list of comment objects
-            "created_at":   issue.created_at.isoformat(),
-            "updated_at":   issue.updated_at.isoformat(),
-            "url":          issue.html_url
-        }
-
-        safe_name = repo_name.replace("/", "_")
-        fn = os.path.join(OUTPUT_DIR, f"{safe_name}_issue_{issue.number}.json")
-        with open(fn, "w") as f:
-            json.dump(data, f, indent=2)
-
-        time.sleep(CRAWL_DELAY)
+def fetch_and_save_issues(repo_name: str, incremental: bool = False,
+                          api_url: str = API_URL, workers: int = WORKERS):
+    """
+    Fetch issues and their comments with a pool of concurrent workers paced by
+    GitHub's rate-limit headers. With `incremental`, only issues updated since
+    the last run's watermark are fetched, and a crashed run resumes from its
+    checkpoint. Issues land in the sharded IssueStore under OUTPUT_DIR
+    (see issue_store.py for per-file import/export).
+    """
+    # The bucket's burst is what lets `workers` requests go out at once
+    client = GitHubClient(TOKEN, api_url=api_url, limiter=RateLimiter(burst=workers))
+    state = SyncState(os.path.join(OUTPUT_DIR, STATE_FILE))
+    with IssueStore(OUTPUT_DIR) as store:
+        n = sync_repo(client, repo_name, store, state,
+                      workers=workers, full=not incremental)
+    print(f"Synced {n} issues from {repo_name} "
+          f"(watermark: {state.repo(repo_name)['watermark']})")
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Fetch GitHub issues and comments for the Solr repos"
+    )
+    parser.add_argument(
+        "--incremental", action="store_true",
+        help="Only fetch issues updated since the last run (resumable)"
+    )
+    parser.add_argument(
+        "--api-url", default=API_URL,
+        help=f"GitHub REST API base URL (default: {API_URL})"
+    )
+    parser.add_argument(
+        "--workers", "-w", type=int, default=WORKERS,
+        help=f"Concurrent requests (default: {WORKERS})"
+    )
+    args = parser.parse_args()
+
     for repo in REPOS:
-        fetch_and_save_issues(repo)
+        fetch_and_save_issues(repo, incremental=args.incremental,
+                              api_url=args.api_url, workers=args.workers)
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,398 @@
+# scripts/github_sync.py
+
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from tqdm import tqdm
+
+from issue_store import IssueStore
+
+# ——— CONFIGURATION ———
+API_URL    = os.getenv("GITHUB_API_URL", "https://api.github.com")
+PER_PAGE   = 100
+WORKERS    = 8                       # concurrent requests; GitHub allows up to 100
+STATE_FILE = ".sync_state.json"      # lives next to the issue shards
+
+
+def _iso(ts: Optional[str]) -> Optional[str]:
+    """Normalise GitHub's '...Z' timestamps to the isoformat PyGithub produced."""
+    if ts and ts.endswith("Z"):
+        return ts[:-1] + "+00:00"
+    return ts
+
+
+def _safe_name(repo_name: str) -> str:
+    return repo_name.replace("/", "_")
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all workers.
+    The refill rate is re-derived from every response's X-RateLimit-Remaining /
+    X-RateLimit-Reset, so the remaining budget is spread evenly over the rest of
+    the window instead of idling on fixed sleeps. Retry-After, or an exhausted
+    budget, pauses every worker until the server says to resume.
+    """
+
+    def __init__(self, rate: float = 5000 / 3600, burst: int = WORKERS):
+        self.rate = rate                 # tokens per second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                if now >= self.paused_until:
+                    elapsed = now - max(self.updated, self.paused_until)
+                    self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.paused_until - now
+            time.sleep(wait)
+
+    def refund(self):
+        """Give back the token of a request GitHub didn't count (a 304 to a conditional request)."""
+        with self.lock:
+            self.tokens = min(self.burst, self.tokens + 1)
+
+    def update(self, headers):
+        with self.lock:
+            now = time.monotonic()
+            if "Retry-After" in headers:
+                self.paused_until = max(self.paused_until, now + float(headers["Retry-After"]))
+            remaining = headers.get("X-RateLimit-Remaining")
+            reset = headers.get("X-RateLimit-Reset")
+            if remaining is None or reset is None:
+                return
+            window = max(float(reset) - time.time(), 1.0)
+            if int(remaining) == 0:
+                self.paused_until = max(self.paused_until, now + window + 1)
+                self.tokens = 0
+            else:
+                self.rate = int(remaining) / window
+                self.tokens = min(self.tokens, int(remaining))
+
+
+class GitHubClient:
+    """
+    Thin REST client over requests, safe to share between worker threads.
+    Every request goes through the shared RateLimiter. Supports conditional
+    requests (If-None-Match) so unchanged resources come back as 304 and
+    don't count against the rate limit.
+    """
+
+    def __init__(self, token: Optional[str] = None, api_url: str = API_URL,
+                 limiter: RateLimiter = None):
+        self.api_url = api_url.rstrip("/")
+        self.limiter = limiter or RateLimiter()
+        self.headers = {"Accept": "application/vnd.github+json"}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+        self._local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        # requests.Session isn't guaranteed thread-safe; keep one per worker
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+            self._local.session.headers.update(self.headers)
+        return self._local.session
+
+    def get(self, path_or_url: str, params: Dict = None, etag: str = None) -> requests.Response:
+        """
+        GET a path (relative to api_url) or an absolute URL.
+        Retries once the limiter has waited out a primary or secondary rate limit.
+        """
+        url = path_or_url if path_or_url.startswith("http") else f"{self.api_url}{path_or_url}"
+        headers = {"If-None-Match": etag} if etag else {}
+        while True:
+            self.limiter.acquire()
+            resp = self.session.get(url, params=params, headers=headers, timeout=30)
+            self.limiter.update(resp.headers)
+            if resp.status_code in (403, 429) and self._rate_limited(resp):
+                continue
+            if resp.status_code == 304:
+                self.limiter.refund()
+            else:
+                resp.raise_for_status()
+            return resp
+
+    @staticmethod
+    def _rate_limited(resp: requests.Response) -> bool:
+        return ("Retry-After" in resp.headers
+                or resp.headers.get("X-RateLimit-Remaining") == "0")
+
+
+class Listing:
+    """
+    A sort=updated&direction=asc list endpoint walked in waves.
+    Each wave fetches page 1 from a since-cursor, then the rest of the pages
+    (up to `workers`, bounded by Link: rel="last") concurrently. The next wave
+    restarts from the updated_at of the previous wave's last item, so items
+    updated mid-run can't shift pages under us.
+    """
+
+    def __init__(self, client: GitHubClient, pool: ThreadPoolExecutor,
+                 path: str, workers: int = WORKERS):
+        self.client = client
+        self.pool = pool
+        self.path = path
+        self.workers = workers
+        self.etag = None          # ETag of the first page of the first wave
+
+    def _params(self, cursor: Optional[str], page: int) -> Dict:
+        params = {"sort": "updated", "direction": "asc", "per_page": PER_PAGE, "page": page}
+        if self.path.endswith("/issues"):
+            params["state"] = "all"
+        if cursor:
+            params["since"] = cursor
+        return params
+
+    def waves(self, cursor: Optional[str], etag: str = None) -> Iterator[List[Dict]]:
+        """
+        Yield each wave's items in listing order.
+        `etag` makes the very first request conditional; on a 304 nothing is yielded.
+        """
+        offset = 0
+        first_request = True
+        while True:
+            first = self.client.get(self.path, self._params(cursor, offset + 1),
+                                    etag=etag if first_request else None)
+            if first.status_code == 304:
+                return
+            if first_request:
+                self.etag, first_request = first.headers.get("ETag"), False
+            last_page = offset + 1
+            if "last" in first.links:
+                last_page = int(_query_param(first.links["last"]["url"], "page"))
+            rest = [
+                self.pool.submit(self.client.get, self.path, self._params(cursor, p))
+                for p in range(offset + 2, min(last_page, offset + self.workers) + 1)
+            ]
+            items = first.json()
+            for fut in rest:
+                items.extend(fut.result().json())
+            yield items
+
+            if len(items) < PER_PAGE * (1 + len(rest)) or last_page <= offset + 1 + len(rest):
+                return
+            # A whole wave stamped with the cursor can't advance it; page past it instead
+            last = _iso(items[-1]["updated_at"])
+            if last == cursor:
+                offset += 1 + len(rest)
+            else:
+                cursor, offset = last, 0
+
+
+def _query_param(url: str, name: str) -> str:
+    return parse_qs(urlparse(url).query)[name][0]
+
+
+class SyncState:
+    """
+    Per-repo sync state persisted as JSON. Issues and the repo-wide comment
+    listing each keep:
+      watermark / comments_watermark  – max updated_at fully synced
+      seen / comments_seen            – ids already written at that timestamp
+      list_etag / comments_etag       – ETag of the first since=watermark page,
+                                        so idle runs cost a 304
+    plus `checkpoint`, the phase and cursor of an in-progress run, so a crash
+    resumes where it stopped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.data: Dict[str, Dict] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.data = json.load(f)
+
+    def repo(self, repo_name: str) -> Dict:
+        return self.data.setdefault(repo_name, {"watermark": None, "checkpoint": None})
+
+    def reset(self, repo_name: str) -> Dict:
+        self.data[repo_name] = {"watermark": None, "checkpoint": None}
+        return self.data[repo_name]
+
+    def save(self):
+        # Write-then-rename so a crash never leaves a half-written state file
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def to_comment(raw: Dict) -> Dict:
+    return {
+        "id":          raw["id"],
+        "author":      (raw.get("user") or {}).get("login", "ghost"),
+        "body":        raw.get("body") or "",
+        "created_at":  _iso(raw["created_at"]),
+        "updated_at":  _iso(raw.get("updated_at")),
+    }
+
+
+def to_issue(raw: Dict, comments: List[Dict]) -> Dict:
+    """Map a REST issue payload onto the schema fetch_and_save_issues writes."""
+    return {
+        "id":           raw["id"],
+        "number":       raw["number"],
+        "title":        raw["title"],
+        "author":       (raw.get("user") or {}).get("login", "ghost"),
+        "body":         raw.get("body") or "",
+        "state":        raw["state"],
+        "labels":       [l["name"] for l in raw.get("labels", [])],
+        "comments":     comments,
+        "created_at":   _iso(raw["created_at"]),
+        "updated_at":   _iso(raw["updated_at"]),
+        "url":          raw["html_url"]
+    }
+
+
+def merge_comments(existing: List[Dict], updates: Dict[int, Dict]) -> List[Dict]:
+    """Overlay updated comments (by id) onto the stored ones, in thread order."""
+    by_id = {c["id"]: c for c in existing}
+    by_id.update(updates)
+    return sorted(by_id.values(), key=lambda c: (c["created_at"], c["id"]))
+
+
+def _walk(listing: Listing, state: SyncState, rs: Dict, phase: str, key: str,
+          handle, prefix: str = ""):
+    """
+    Drain one listing from its checkpoint (or watermark), passing each wave's
+    new items to `handle` and checkpointing after every wave. On completion
+    the listing's watermark, seen-set and first-page ETag are committed.
+    """
+    watermark = rs.get(f"{prefix}watermark")
+    cp = rs.get("checkpoint") or {}
+    if cp.get("phase") == phase and "cursor" in cp:
+        cursor, seen = cp["cursor"], set(cp["seen"])
+    else:
+        cursor, seen = watermark, set(rs.get(f"{prefix}seen", []))
+    etag_key = f"{prefix}etag" if prefix else "list_etag"
+
+    for items in listing.waves(cursor, etag=rs.get(etag_key) if cursor == watermark else None):
+        fresh = []
+        for raw in items:
+            updated = _iso(raw["updated_at"])
+            if updated == cursor and raw[key] in seen:
+                continue   # `since` is inclusive; already written before
+            fresh.append(raw)
+            if updated != cursor:
+                cursor, seen = updated, set()
+            seen.add(raw[key])
+        handle(fresh)
+        rs["checkpoint"] = dict(cp, phase=phase, cursor=cursor, seen=sorted(seen))
+        state.save()
+
+    if cursor == watermark:
+        rs[etag_key] = listing.etag or rs.get(etag_key)
+    else:
+        rs[etag_key] = None   # cached for the old since= URL
+    rs[f"{prefix}watermark"] = cursor
+    rs[f"{prefix}seen"] = sorted(seen)
+
+
+def _get_issue(client: GitHubClient, repo_name: str, number: int) -> Optional[Dict]:
+    try:
+        return client.get(f"/repos/{repo_name}/issues/{number}").json()
+    except requests.HTTPError as e:
+        if e.response is not None and e.response.status_code in (404, 410):
+            return None   # deleted or transferred
+        raise
+
+
+def sync_repo(client: GitHubClient, repo_name: str, store: IssueStore,
+              state: SyncState, workers: int = WORKERS, full: bool = False) -> int:
+    """
+    Sync one repo with a bounded pool of concurrent workers.
+
+    Comments are pulled in bulk from the repo-wide issue-comments listing
+    (spooled to disk, so the phase survives a crash), then the issues listing
+    is walked and each issue is joined locally with its comments. Incremental
+    runs only fetch what changed since the stored watermarks; `full` re-crawls
+    everything and drops stored comments that no longer exist.
+    Returns the number of issues written.
+    """
+    rs = state.repo(repo_name)
+    if full and not (rs.get("checkpoint") or {}).get("full"):
+        rs = state.reset(repo_name)
+    if not rs.get("checkpoint"):
+        rs["checkpoint"] = {"phase": "comments", "full": full}
+    full = rs["checkpoint"].get("full", False)
+    spool = os.path.join(store.root, f".{_safe_name(repo_name)}_comments.jsonl")
+    written = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as pool, \
+            tqdm(desc=f"Syncing {repo_name}", unit="issue") as loop:
+
+        # 1. Repo-wide comments updated since the watermark, spooled per wave
+        if rs["checkpoint"]["phase"] == "comments":
+            if "cursor" not in rs["checkpoint"] and os.path.exists(spool):
+                os.remove(spool)   # left over from an older run
+
+            def spool_comments(raws):
+                with open(spool, "a") as f:
+                    for raw in raws:
+                        number = int(raw["issue_url"].rsplit("/", 1)[1])
+                        f.write(json.dumps({"issue": number, "comment": to_comment(raw)}) + "\n")
+
+            comments = Listing(client, pool, f"/repos/{repo_name}/issues/comments", workers)
+            _walk(comments, state, rs, "comments", "id", spool_comments, prefix="comments_")
+            rs["checkpoint"] = {"phase": "issues", "full": full}
+            state.save()
+
+        pending: Dict[int, Dict[int, Dict]] = {}
+        if os.path.exists(spool):
+            with open(spool, "r") as f:
+                for line in f:
+                    rec = json.loads(line)
+                    pending.setdefault(rec["issue"], {})[rec["comment"]["id"]] = rec["comment"]
+
+        def join(raw: Dict) -> Dict:
+            existing = None if full else store.get(repo_name, raw["number"])
+            stored = existing["comments"] if existing else []
+            return to_issue(raw, merge_comments(stored, pending.pop(raw["number"], {})))
+
+        def write_issues(raws):
+            nonlocal written
+            for raw in raws:
+                store.put(repo_name, join(raw))
+            written += len(raws)
+            loop.update(len(raws))
+
+        # 2. Issues updated since the watermark, joined with their comments
+        issues = Listing(client, pool, f"/repos/{repo_name}/issues", workers)
+        _walk(issues, state, rs, "issues", "number", write_issues)
+
+        # 3. Comments edited on issues whose updated_at didn't move
+        for number, updates in list(pending.items()):
+            existing = store.get(repo_name, number)
+            if existing is not None:
+                existing["comments"] = merge_comments(existing["comments"], updates)
+                store.put(repo_name, existing)
+                del pending[number]
+        missing = pool.map(lambda n: _get_issue(client, repo_name, n), list(pending))
+        write_issues([raw for raw in missing if raw is not None])
+
+    if os.path.exists(spool):
+        os.remove(spool)
+    rs["checkpoint"] = None
+    rs["last_synced_at"] = datetime.now(timezone.utc).isoformat()
+    state.save()
+    return written
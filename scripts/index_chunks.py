@@ -1,79 +1,336 @@
 #!/usr/bin/env python3
 import os
 import json
+import time
+import queue
+import hashlib
+import argparse
+import threading
+from contextlib import contextmanager
 from tqdm import tqdm
-from sentence_transformers import SentenceTransformer
-from chromadb import PersistentClient
-from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+import metrics
+
+from chunk_corpus import find_corpus, iter_batches, count_chunks
+from dedup_chunks import load_dedup
+from embedding_cache import EmbeddingCache, model_revision
+from length_batching import encode_by_length, TOKEN_BUDGET, SORT_WINDOW
+from model_registry import get_collection, get_model, BACKENDS, EMBED_BACKEND
+from lexical_index import LexicalIndex, lexical_root
+from vector_store import export_collection, mmap_root, to_timestamp, DTYPES, LABEL_PREFIX
 
 # ——— CONFIGURATION ———
-DATA_DIR        = "../data/chunks"        # directory with chunk JSONs
+DATA_DIR        = "../data/chunks"        # chunks.jsonl / chunks.parquet, or chunk JSONs
+MAIL_DATA_DIR   = "../data/mail_chunks"   # mailing-list corpus from ingest_mbox.py, indexed too if present
 PERSIST_DIR     = "../vector_store"       # ChromaDB persistence folder
 COLLECTION_NAME = "solr_support"
-BATCH_SIZE      = 64                   # tune between 32–64 on CPU :contentReference[oaicite:4]{index=4}
+EMBED_MODEL     = "all-mpnet-base-v2"
+BATCH_SIZE      = 64                   # chunks per Chroma upsert; encoding batches by TOKEN_BUDGET
+TOMBSTONE_FILE  = ".tombstones.jsonl"  # stale chunk ids written by chunk_issues.py
+INDEX_STATE     = ".index_state.json"  # chunk id -> digest of the text+metadata last upserted
+QUEUE_SIZE      = 4                    # batches buffered between pipeline stages
+
+_DONE = object()   # end-of-stream marker passed down the pipeline
+
+class Stage:
+    """
+    Counters for one pipeline stage: items handled, seconds spent working,
+    and seconds blocked on a full downstream queue (backpressure).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+
+    @contextmanager
+    def timed(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.busy += elapsed
+            metrics.observe(f"index_chunks.{self.name}", elapsed)
+
+    def put(self, q, item, stop):
+        start = time.perf_counter()
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self.blocked += time.perf_counter() - start
+
+    def get(self, q, stop):
+        while not stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+def run_stages(stages, stop):
+    """Run each stage function in its own thread; the first failure stops them all and is re-raised."""
+    errors = []
+
+    def guarded(fn):
+        try:
+            fn()
+        except BaseException as e:
+            errors.append(e)
+            stop.set()
+
+    threads = [threading.Thread(target=guarded, args=(fn,), name=fn.__name__) for fn in stages]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    if errors:
+        raise errors[0]
+
+def print_stage_report(stages, wall):
+    """items/s is each stage's own rate while busy; the slowest one is the bottleneck."""
+    print(f"{'stage':<8}{'items':>9}{'items/s':>10}{'busy %':>8}{'blocked s':>11}")
+    for st in stages:
+        rate = st.items / st.busy if st.busy else 0.0
+        print(f"{st.name:<8}{st.items:>9}{rate:>10.1f}{100 * st.busy / max(wall, 1e-9):>8.1f}"
+              f"{st.blocked:>11.1f}")
+
+def chunk_digest(text, meta):
+    """Fingerprint of what gets upserted for a chunk, to detect changes between runs."""
+    payload = json.dumps([text, meta], sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+def load_index_state():
+    path = os.path.join(PERSIST_DIR, INDEX_STATE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def save_index_state(state):
+    # Write-then-rename so a crash never leaves a half-written state file
+    path = os.path.join(PERSIST_DIR, INDEX_STATE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+def chunk_metadata(chunk, dup_members):
+    """
+    Chroma metadata for a chunk. Values must be scalars, so id lists are
+    comma-joined, every label also becomes its own "label:<name>" flag to
+    filter on, and timestamps are epoch seconds so they can be range-filtered.
+    """
+    meta = {"issue_number": chunk["issue_number"], "source": chunk["source"]}
+    for key in ("repo", "state", "author", "subject", "message_id"):
+        if chunk.get(key):
+            meta[key] = chunk[key]
+    for key in ("comment_id", "start", "end"):
+        # Where the chunk sits in its body/comment text, so context_packing can merge neighbours
+        if chunk.get(key) is not None:
+            meta[key] = chunk[key]
+    for key in ("created_at", "updated_at"):
+        if chunk.get(key):
+            meta[key] = to_timestamp(chunk[key])
+    if chunk.get("labels"):
+        meta["labels"] = ",".join(chunk["labels"])
+        meta.update({LABEL_PREFIX + label: True for label in chunk["labels"]})
+    dups = dup_members.get(chunk["chunk_id"])
+    if dups:
+        meta["duplicate_ids"] = ",".join(dups)
+        meta["duplicate_count"] = len(dups)
+    return meta
 
 def main():
-    # 1. Initialize PersistentClient (duckdb+parquet under the hood) :contentReference[oaicite:5]{index=5}
-    client = PersistentClient(
-        path=PERSIST_DIR,
-        settings=Settings(),
-        tenant=DEFAULT_TENANT,
-        database=DEFAULT_DATABASE
+    parser = argparse.ArgumentParser(
+        description="Embed the chunk corpus and index it into ChromaDB"
     )
-
-    # 2. Use MPNet for embeddings (supports 384–512 tokens) :contentReference[oaicite:6]{index=6}
-    embedding_fn = SentenceTransformerEmbeddingFunction(
-        model_name="all-mpnet-base-v2"
+    parser.add_argument(
+        "--workers", "-w", type=int, default=1,
+        help="Encoder processes (sentence-transformers multi-process pool); 1 encodes in-process"
     )
-    collection = client.get_or_create_collection(
-        name=COLLECTION_NAME,
-        embedding_function=embedding_fn,
-        metadata={"hnsw:space": "cosine"}
+    parser.add_argument(
+        "--queue-size", "-q", type=int, default=QUEUE_SIZE,
+        help=f"Batches buffered between the read/encode/upsert stages (default: {QUEUE_SIZE})"
     )
+    parser.add_argument(
+        "--token-budget", "-t", type=int, default=TOKEN_BUDGET,
+        help=f"Padded tokens per encoder batch (default: {TOKEN_BUDGET})"
+    )
+    parser.add_argument(
+        "--backend", "-b", choices=BACKENDS, default=EMBED_BACKEND,
+        help=f"Embedding runtime: PyTorch fp32, ONNX Runtime, or ONNX with int8 dynamic quantization "
+             f"(default: {EMBED_BACKEND}, from $EMBED_BACKEND)"
+    )
+    parser.add_argument(
+        "--export-mmap", choices=DTYPES,
+        help="Afterwards, rebuild the memory-mapped store (float16 or int8) that VECTOR_STORE=mmap serves from"
+    )
+    parser.add_argument(
+        "--metrics", metavar="PATH",
+        help="Write timing spans and counters here afterwards (.prom/.txt: Prometheus text, else JSON)"
+    )
+    args = parser.parse_args()
+    if args.backend != "torch" and args.workers > 1:
+        # ONNX Runtime already spreads one batch over all cores
+        parser.error("--workers > 1 needs the torch backend")
+    index_corpus(workers=args.workers, queue_size=args.queue_size, token_budget=args.token_budget,
+                 backend=args.backend)
+    if args.export_mmap:
+        collection = get_collection(PERSIST_DIR, COLLECTION_NAME, EMBED_MODEL, backend=args.backend)
+        export_collection(collection, mmap_root(PERSIST_DIR, COLLECTION_NAME), dtype=args.export_mmap)
+    if args.metrics:
+        metrics.write(args.metrics)
+
+@metrics.timed("index_chunks.index_corpus")
+def index_corpus(workers=1, queue_size=QUEUE_SIZE, token_budget=TOKEN_BUDGET, backend=EMBED_BACKEND):
+    """
+    Index the chunk corpus as a three-stage pipeline connected by bounded
+    queues: a reader streams chunks and drops unchanged ones, an encoder
+    embeds them (across a process pool when workers > 1), and a writer
+    upserts into Chroma. The stages overlap, so the CPU keeps encoding
+    while Chroma writes, and a full queue throttles the stage feeding it.
+    """
+    # 1-2. Shared PersistentClient (duckdb+parquet under the hood) and a collection whose
+    #      MPNet embedding function reuses the registry's model :contentReference[oaicite:5]{index=5}
+    collection = get_collection(
+        PERSIST_DIR, COLLECTION_NAME, EMBED_MODEL,
+        create=True, metadata={"hnsw:space": "cosine"}, backend=backend
+    )
+
+    # 3. Drop chunks that chunk_issues.py tombstoned (edited/deleted comments, deleted issues)
+    state = load_index_state()
+    lexical = LexicalIndex(lexical_root(PERSIST_DIR, COLLECTION_NAME))
+    tombstone_path = os.path.join(DATA_DIR, TOMBSTONE_FILE)
+    if os.path.exists(tombstone_path):
+        with open(tombstone_path, "r") as f:
+            stale = list({json.loads(line)["chunk_id"] for line in f if line.strip()})
+        for start in range(0, len(stale), BATCH_SIZE):
+            collection.delete(ids=stale[start:start + BATCH_SIZE])
+        for cid in stale:
+            state.pop(cid, None)
+        lexical.delete(stale)
+        os.remove(tombstone_path)
+        print(f"Deleted {len(stale)} tombstoned chunks.")
+
+    # 4. Stream chunks (corpus file, or per-chunk JSONs) through the pipeline.
+    #    Near-duplicates found by dedup_chunks.py are not embedded; their ids
+    #    ride along in the canonical chunk's metadata instead.
+    dup_map, dup_members = load_dedup(DATA_DIR)
+    sources = [find_corpus(DATA_DIR)]
+    if MAIL_DATA_DIR and os.path.isdir(MAIL_DATA_DIR):
+        # Same collection, so the stale sweep below keeps mail chunks
+        sources.append(find_corpus(MAIL_DATA_DIR))
+    model = get_model(EMBED_MODEL, backend=backend)
+    # Backends produce slightly different vectors, so each gets its own cache
+    revision = model_revision(model) if backend == "torch" else f"{model_revision(model)}-{backend}"
+    cache = EmbeddingCache(EMBED_MODEL, revision, model.get_sentence_embedding_dimension(),
+                           root=os.path.join(PERSIST_DIR, "embedding_cache"))
+
+    pool = model.start_multi_process_pool(["cpu"] * workers) if workers > 1 else None
+
+    def encode(texts):
+        # Generate embeddings on CPU in length-bucketed, token-budgeted batches :contentReference[oaicite:8]{index=8}
+        return encode_by_length(model, texts, token_budget, pool=pool)
+
+    # 5. Read -> embed (cache misses only) -> upsert, overlapped :contentReference[oaicite:7]{index=7}
+    seen = set()
+    counts = {"unchanged": 0, "upserted": 0}
+    reader, encoder, writer = Stage("read"), Stage("encode"), Stage("upsert")
+    to_encode, to_write = queue.Queue(queue_size), queue.Queue(queue_size)
+    stop = threading.Event()
+    progress = tqdm(total=sum(count_chunks(s) for s in sources), desc="Indexing chunks", unit="chunk")
+
+    def read():
+        # Wide reads give the encoder enough chunks to sort by length
+        width = max(SORT_WINDOW, BATCH_SIZE * workers)
+        batches = (batch for s in sources for batch in iter_batches(s, width))
+        while True:
+            with reader.timed():
+                batch = next(batches, None)
+                if batch is None:
+                    break
+                changed = []
+                for c in batch:
+                    if c["chunk_id"] in dup_map:
+                        continue
+                    meta = chunk_metadata(c, dup_members)
+                    digest = chunk_digest(c["text"], meta)
+                    seen.add(c["chunk_id"])
+                    if state.get(c["chunk_id"]) == digest:
+                        counts["unchanged"] += 1
+                    else:
+                        changed.append((c["chunk_id"], c["text"], meta, digest))
+                    # The BM25 index catches up on its own, e.g. when it is built for an existing index
+                    if c["chunk_id"] not in lexical or state.get(c["chunk_id"]) != digest:
+                        lexical.add(c["chunk_id"], c["text"])
+                reader.items += len(batch)
+            progress.update(len(batch))
+            if changed:
+                reader.put(to_encode, changed, stop)
+        reader.put(to_encode, _DONE, stop)
+
+    def embed():
+        while (changed := encoder.get(to_encode, stop)) is not _DONE:
+            with encoder.timed():
+                embeddings = cache.encode([text for _, text, _, _ in changed], encode)
+                encoder.items += len(changed)
+            encoder.put(to_write, (changed, embeddings), stop)
+        encoder.put(to_write, _DONE, stop)
+
+    def write():
+        while (item := writer.get(to_write, stop)) is not _DONE:
+            changed, embeddings = item
+            with writer.timed():
+                # Upsert batch into ChromaDB :contentReference[oaicite:9]{index=9}
+                for start in range(0, len(changed), BATCH_SIZE):
+                    part = changed[start:start + BATCH_SIZE]
+                    collection.upsert(
+                        ids=[cid for cid, _, _, _ in part],
+                        documents=[text for _, text, _, _ in part],
+                        embeddings=embeddings[start:start + BATCH_SIZE],
+                        metadatas=[meta for _, _, meta, _ in part]
+                    )
+                    for cid, _, _, digest in part:
+                        state[cid] = digest
+                writer.items += len(changed)
+                counts["upserted"] += len(changed)
+
+    wall = time.perf_counter()
+    try:
+        run_stages([read, embed, write], stop)
+    finally:
+        progress.close()
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+    wall = time.perf_counter() - wall
+
+    # 6. Delete everything the collection holds that is no longer in the chunk set
+    #    (removed chunks, and chunks that have since become near-duplicates)
+    stale = [cid for cid in collection.get(include=[])["ids"] if cid not in seen]
+    for start in range(0, len(stale), BATCH_SIZE):
+        collection.delete(ids=stale[start:start + BATCH_SIZE])
+    for cid in stale:
+        state.pop(cid, None)
+    lexical.delete([cid for cid in lexical.ids() if cid not in seen])
+    lex_counts = lexical.commit()
+    save_index_state(state)
 
-    # 3. Load chunk files
-    files = [f for f in os.listdir(DATA_DIR) if f.endswith(".json")]
-    ids, texts, metadatas = [], [], []
-    for fname in files:
-        path = os.path.join(DATA_DIR, fname)
-        chunk = json.load(open(path, "r"))
-        ids.append(chunk["chunk_id"])
-        texts.append(chunk["text"])
-        metadatas.append({
-            "issue_number": chunk["issue_number"],
-            "source":       chunk["source"]
-        })
-
-    # 4. Batch embedding & upsert with progress bar :contentReference[oaicite:7]{index=7}
-    model = SentenceTransformer("all-mpnet-base-v2")
-    total_batches = (len(texts) + BATCH_SIZE - 1) // BATCH_SIZE
-
-    for batch_start in tqdm(range(0, len(texts), BATCH_SIZE),
-                            total=total_batches,
-                            desc="Indexing batches",
-                            unit="batch"):
-        batch_ids       = ids[batch_start:batch_start + BATCH_SIZE]
-        batch_texts     = texts[batch_start:batch_start + BATCH_SIZE]
-        batch_metadatas = metadatas[batch_start:batch_start + BATCH_SIZE]
-
-        # Generate embeddings in batches on CPU :contentReference[oaicite:8]{index=8}
-        embeddings = model.encode(
-            batch_texts,
-            batch_size=BATCH_SIZE,
-            show_progress_bar=False,
-            device="cpu"
-        )
-
-        # Upsert batch into ChromaDB :contentReference[oaicite:9]{index=9}
-        collection.upsert(
-            ids=batch_ids,
-            documents=batch_texts,
-            embeddings=embeddings,
-            metadatas=batch_metadatas
-        )
-
-    print(f"✅ Indexed {len(ids)} chunks in {total_batches} batches.")
+    print(f"✅ Upserted {counts['upserted']} changed chunks ({counts['unchanged']} unchanged, "
+          f"{len(dup_map)} near-duplicates skipped), deleted {len(stale)} stale chunks. "
+          f"Embedding cache: {cache.hits} hits, {cache.misses} encoded. "
+          f"BM25 index: {lex_counts['added']} added, {lex_counts['deleted']} deleted, "
+          f"{lex_counts['segments']} segments.")
+    print_stage_report([reader, encoder, writer], wall)
+    metrics.count("index_chunks.chunks_read", reader.items)
+    metrics.count("index_chunks.chunks_upserted", counts["upserted"])
+    metrics.count("index_chunks.chunks_unchanged", counts["unchanged"])
+    metrics.count("index_chunks.chunks_deleted", len(stale))
+    metrics.count("index_chunks.embeddings_encoded", cache.misses)
+    metrics.count("index_chunks.embedding_cache_hits", cache.hits)
 
 if __name__ == "__main__":
     main()
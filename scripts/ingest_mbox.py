@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# scripts/ingest_mbox.py
+
+import os
+import re
+import gzip
+import json
+import hashlib
+import argparse
+import multiprocessing
+from email import policy
+from email.errors import MessageError
+from email.parser import BytesParser
+from email.utils import parseaddr
+from datetime import timezone
+from typing import Dict, Iterator, List, Tuple
+
+import html2text
+from bs4 import BeautifulSoup
+
+from chunk_issues import split_text, CHUNKERS
+from chunk_corpus import CorpusWriter, corpus_path, iter_chunks
+import metrics
+
+# ——— CONFIGURATION ———
+MAIL_DIR      = "../data/mailing_list"      # one subdirectory of monthly mbox archives per list
+OUTPUT_DIR    = "../data/mail_chunks"       # index_chunks.py indexes this corpus alongside the issues
+MANIFEST_FILE = ".mail_manifest.json"       # archive -> size, mtime and the chunk ids it produced
+THREADS_FILE  = ".mail_threads.tsv"         # message key -> thread root key, append-only
+MAX_MESSAGE   = 8 * 1024 * 1024             # bytes of one message parsed; the rest (attachments) is dropped
+
+SUBJECT_PREFIX = re.compile(r"^\s*((re|aw|fw|fwd|sv)\s*(\[\d+\])?\s*:\s*|\[[^\]]*\]\s*)+", re.IGNORECASE)
+ATTRIBUTION    = re.compile(r"^(On\b.{0,200}(\n.{0,200})?\bwrote:|.{0,120}\b(wrote|writes|schrieb):)[ \t]*$", re.MULTILINE)
+REPLY_HEADER   = re.compile(r"^(-{3,}\s*Original Message\s*-{3,}|_{10,}\s*$|From:\s.+\n(Sent|Date):\s)",
+                            re.MULTILINE | re.IGNORECASE)
+LIST_FOOTER    = re.compile(r"^-{20,}\s*\n(To unsubscribe|For additional commands)", re.MULTILINE)
+SIGNATURE      = re.compile(r"^--\s?$", re.MULTILINE)
+
+
+def iter_mbox(path: str) -> Iterator[bytes]:
+    """
+    The raw messages of an mbox file (or .gz), one at a time: a message
+    starts at a "From " line after a blank line. ">From " escapes in the
+    body are undone.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rb") as f:
+        buf, blank = None, True
+        for line in f:
+            if blank and line.startswith(b"From "):
+                if buf:
+                    yield bytes(buf)
+                buf, blank = bytearray(), False
+                continue
+            if buf is not None and len(buf) < MAX_MESSAGE:
+                buf += line[1:] if line.startswith(b">From ") else line
+            blank = line in (b"\n", b"\r\n")
+        if buf:
+            yield bytes(buf)
+
+
+def html_to_text(html: str) -> str:
+    converter = html2text.HTML2Text()
+    converter.body_width = 0
+    converter.ignore_images = True
+    converter.ignore_emphasis = True
+    try:
+        return converter.handle(html)
+    except Exception:
+        # html2text gives up on some broken markup; plain text extraction doesn't
+        return BeautifulSoup(html, "html.parser").get_text("\n")
+
+
+def message_text(msg) -> str:
+    """The message's text: its text/plain part, else its HTML part converted to text; attachments are skipped."""
+    part = msg.get_body(preferencelist=("plain", "html"))
+    if part is None:
+        return ""
+    try:
+        text = part.get_content()
+    except (LookupError, UnicodeError, AssertionError):
+        payload = part.get_payload(decode=True) or b""
+        text = payload.decode("utf-8", errors="replace")
+    if not isinstance(text, str):
+        return ""
+    return html_to_text(text) if part.get_content_subtype() == "html" else text
+
+
+def clean_body(text: str) -> str:
+    """
+    Strip what is not this message's own words: quoted lines, the "On ...
+    wrote:" attribution above them, forwarded/Outlook-style reply blocks and
+    everything after them, the signature, and the list's unsubscribe footer.
+    """
+    text = text.replace("\r\n", "\n")
+    for pattern in (LIST_FOOTER, REPLY_HEADER, SIGNATURE):
+        m = pattern.search(text)
+        if m:
+            text = text[:m.start()]
+    lines = [line for line in text.split("\n") if not line.lstrip().startswith(">")]
+    text = ATTRIBUTION.sub("", "\n".join(lines))
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def message_key(message_id: str) -> int:
+    """A 48-bit number for a Message-ID: the thread and message numbers chunks carry."""
+    norm = message_id.strip().strip("<>").lower()
+    return int.from_bytes(hashlib.blake2b(norm.encode("utf-8"), digest_size=6).digest(), "big")
+
+
+def _header(msg, name: str) -> str:
+    try:
+        return str(msg.get(name) or "")
+    except Exception:
+        return ""   # malformed header the parser could not fold
+
+
+def read_message(raw: bytes) -> Dict:
+    """
+    The parts of one raw message the corpus needs: Message-ID, subject
+    without Re:/Fwd:/[list] prefixes, sender, ISO date in UTC, References and
+    In-Reply-To ids, and the cleaned body. Raises email.errors.MessageError,
+    UnicodeError or ValueError for a message that can't be parsed.
+    """
+    msg = BytesParser(policy=policy.default).parsebytes(raw)
+    message_id = _header(msg, "Message-ID").strip()
+    name, addr = parseaddr(_header(msg, "From"))
+    try:
+        date = msg["Date"].datetime if msg["Date"] is not None else None
+    except (AttributeError, TypeError, ValueError):
+        date = None     # unparseable Date header
+    if date is not None:
+        # In UTC, so dates from different senders' offsets sort as strings
+        if date.tzinfo is None:
+            date = date.replace(tzinfo=timezone.utc)
+        date = date.astimezone(timezone.utc).isoformat()
+    if not message_id:
+        # No Message-ID: a stable stand-in from what identifies the message
+        message_id = hashlib.blake2b(raw[:4096], digest_size=12).hexdigest()
+    return {
+        "message_id": message_id,
+        "subject": SUBJECT_PREFIX.sub("", _header(msg, "Subject")).strip(),
+        "author": addr or name or None,
+        "date": date,
+        "refs": re.findall(r"<[^>]+>", _header(msg, "References")),
+        "in_reply_to": re.findall(r"<[^>]+>", _header(msg, "In-Reply-To")),
+        "body": clean_body(message_text(msg)),
+    }
+
+
+def message_record(fields: Dict, list_name: str, chunk_size: int, overlap: int, chunker: str) -> Dict:
+    """
+    One message (from read_message) as {"key", "parent", "root_ref", "date",
+    "chunks"}: its own key, the keys of the message it replies to and of
+    its References root, and its chunks in the corpus schema minus the
+    thread number, which needs every archive (see resolve_threads). A
+    message with nothing but quotes has no chunks but still links its
+    replies into the thread.
+    """
+    key = message_key(fields["message_id"])
+    body, subject, refs, in_reply_to = fields["body"], fields["subject"], fields["refs"], fields["in_reply_to"]
+    text = f"{subject} {body}".strip() if body else ""
+    chunks = []
+    for idx, (chunk, start, end) in enumerate(split_text(text, chunk_size, overlap, chunker) if text else []):
+        chunk = {
+            "chunk_id": f"mail_{list_name}_{key:012x}_{idx}",
+            "source": "mail",
+            "comment_id": key,
+            "text": chunk,
+            "repo": list_name,
+            "labels": [],
+            "author": fields["author"],
+            "created_at": fields["date"],
+            "updated_at": fields["date"],
+            "subject": subject,
+            "message_id": fields["message_id"],
+        }
+        if start is not None:
+            chunk.update(start=start, end=end)
+        chunks.append(chunk)
+    return {
+        "key": key,
+        "parent": message_key(in_reply_to[-1]) if in_reply_to else (message_key(refs[-1]) if refs else None),
+        "root_ref": message_key(refs[0]) if refs else None,
+        "date": fields["date"] or "",
+        "chunks": chunks,
+    }
+
+
+def _archive_job(job) -> Tuple[str, List[Dict], int]:
+    """
+    Process-pool entry point: parse one archive -> (relpath, messages,
+    unreadable messages). Only a message that fails to parse is skipped;
+    chunker errors hit every message, so they propagate and stop the run.
+    """
+    rel, path, list_name, chunk_size, overlap, chunker = job
+    messages, unreadable = [], 0
+    for raw in iter_mbox(path):
+        try:
+            fields = read_message(raw)
+        except (MessageError, UnicodeError, ValueError):
+            unreadable += 1   # one broken message doesn't cost the archive
+            continue
+        messages.append(message_record(fields, list_name, chunk_size, overlap, chunker))
+    return rel, messages, unreadable
+
+
+def resolve_threads(messages: List[Dict], threads: Dict[int, int]) -> List[Tuple[int, int]]:
+    """
+    Give each message its thread root and stamp it on the message's chunks
+    as issue_number. A reply joins its parent's thread when the parent has
+    been seen (in any archive so far); otherwise the first References entry,
+    the thread's original message by convention, is the root. Messages are
+    taken in date order so parents usually come first. Returns the new
+    (key, root) pairs, which are also added to threads.
+    """
+    new = []
+    for m in sorted(messages, key=lambda m: m["date"]):
+        root = threads.get(m["parent"]) if m["parent"] is not None else None
+        if root is None and m["root_ref"] is not None:
+            root = threads.get(m["root_ref"], m["root_ref"])
+        if root is None:
+            root = m["parent"] if m["parent"] is not None else m["key"]
+        if m["key"] not in threads:
+            threads[m["key"]] = root
+            new.append((m["key"], root))
+        for chunk in m["chunks"]:
+            chunk["issue_number"] = threads[m["key"]]
+    return new
+
+
+def list_archives(mail_dir: str) -> List[Tuple[str, str, str]]:
+    """(relative path, path, list name) of every archive under mail_dir/<list>/, in name (month) order."""
+    archives = []
+    for list_name in sorted(os.listdir(mail_dir)):
+        list_dir = os.path.join(mail_dir, list_name)
+        if not os.path.isdir(list_dir) or list_name.startswith("."):
+            continue
+        for fname in sorted(os.listdir(list_dir)):
+            path = os.path.join(list_dir, fname)
+            if os.path.isfile(path) and not fname.startswith("."):
+                archives.append((f"{list_name}/{fname}", path, list_name))
+    return archives
+
+
+def load_manifest(output_dir: str) -> Dict:
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_manifest(output_dir: str, manifest: Dict):
+    # Write-then-rename so a crash never leaves a half-written manifest
+    path = os.path.join(output_dir, MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(path + ".tmp", path)
+
+
+def load_threads(output_dir: str) -> Dict[int, int]:
+    threads = {}
+    path = os.path.join(output_dir, THREADS_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 2:     # a torn trailing line from a crash is skipped
+                    threads[int(parts[0], 16)] = int(parts[1], 16)
+    return threads
+
+
+@metrics.timed("ingest_mbox.ingest")
+def ingest(mail_dir: str, output_dir: str, chunk_size: int, overlap: int,
+           workers: int = None, chunker: str = "offsets", full: bool = False) -> Dict:
+    """
+    Parse every new or changed archive across a pool of worker processes
+    (one archive per task, messages streamed one at a time) and write the
+    mail chunk corpus to output_dir/chunks.jsonl.
+
+    The manifest remembers each archive's size and mtime and the chunk ids
+    it produced, so a re-run only parses archives that were added or have
+    grown (the current month); the other archives' chunks are copied over
+    from the previous corpus. Thread roots found so far are kept in
+    THREADS_FILE, so a reply in a new archive joins a thread started months
+    before. full ignores both and starts over.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {} if full else load_manifest(output_dir)
+    threads = {} if full else load_threads(output_dir)
+    corpus = corpus_path(output_dir, "jsonl")
+    archives = list_archives(mail_dir)
+
+    def stamp(path):
+        st = os.stat(path)
+        return {"size": st.st_size, "mtime": int(st.st_mtime)}
+
+    todo = [(rel, path, name) for rel, path, name in archives
+            if {k: manifest.get(rel, {}).get(k) for k in ("size", "mtime")} != stamp(path)]
+    paths = {rel: path for rel, path, _ in archives}
+    current = set(paths)
+    redo = {rel for rel, _, _ in todo} | (set(manifest) - current)
+    dropped = {cid for rel in redo for cid in manifest.get(rel, {}).get("chunks", [])}
+    counts = {"archives": len(todo), "unchanged": len(archives) - len(todo), "messages": 0, "skipped": 0, "chunks": 0}
+
+    with CorpusWriter(corpus) as writer:
+        if os.path.exists(corpus) and not full:
+            # Carry over the chunks of archives that haven't changed
+            for chunk in iter_chunks(corpus):
+                if chunk["chunk_id"] not in dropped:
+                    writer.write([chunk])
+        jobs = ((rel, path, name, chunk_size, overlap, chunker) for rel, path, name in todo)
+        new_threads = []
+        with multiprocessing.Pool(workers) as pool:
+            # Archives come back in month order, so a thread's start is usually known before its replies
+            for rel, messages, unreadable in pool.imap(_archive_job, jobs):
+                new_threads.extend(resolve_threads(messages, threads))
+                chunks = [c for m in messages for c in m["chunks"]]
+                empty = sum(1 for m in messages if not m["chunks"])
+                writer.write(chunks)
+                if not messages and unreadable:
+                    # Not one message parsed: leave it out of the manifest so the next run tries again
+                    manifest.pop(rel, None)
+                    print(f"  {rel}: none of its {unreadable} messages could be parsed; will retry next run")
+                    continue
+                manifest[rel] = {**stamp(paths[rel]), "messages": len(messages) - empty,
+                                 "chunks": [c["chunk_id"] for c in chunks]}
+                counts["messages"] += len(messages) - empty
+                counts["skipped"] += empty + unreadable
+                counts["chunks"] += len(chunks)
+                print(f"  {rel}: {len(messages) - empty} messages, {len(chunks)} chunks")
+
+    for rel in set(manifest) - current:
+        del manifest[rel]
+    with open(os.path.join(output_dir, THREADS_FILE), "w" if full else "a") as f:
+        for key, root in new_threads:
+            f.write(f"{key:x}\t{root:x}\n")
+    save_manifest(output_dir, manifest)
+    for name, value in counts.items():
+        metrics.count(f"ingest_mbox.{name}", value)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Chunk the solr-user/lucene-user mailing-list mbox archives for embedding"
+    )
+    parser.add_argument("--mail-dir", "-i", default=MAIL_DIR,
+                        help=f"Directory with one subdirectory of mbox archives per list (default: {MAIL_DIR})")
+    parser.add_argument("--output-dir", "-o", default=OUTPUT_DIR,
+                        help=f"Where the mail chunk corpus is written (default: {OUTPUT_DIR})")
+    parser.add_argument("--chunk-size", "-c", type=int, default=300,
+                        help="Maximum number of embedding-model tokens per chunk (default: 300)")
+    parser.add_argument("--overlap", "-l", type=int, default=60,
+                        help="Number of tokens to overlap between chunks (default: 60)")
+    parser.add_argument("--chunker", choices=CHUNKERS, default="offsets",
+                        help="offsets (default) or nltk, as in chunk_issues.py")
+    parser.add_argument("--workers", "-w", type=int, default=os.cpu_count(),
+                        help="Worker processes, one archive each (default: all cores)")
+    parser.add_argument("--full", action="store_true",
+                        help="Re-parse every archive instead of only new and grown ones")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="Write timing spans and counters here afterwards (.prom/.txt: Prometheus text, else JSON)")
+    args = parser.parse_args()
+
+    counts = ingest(args.mail_dir, args.output_dir, args.chunk_size, args.overlap,
+                    workers=args.workers, chunker=args.chunker, full=args.full)
+    print(f"Mail ingestion complete: {counts['archives']} archives parsed ({counts['unchanged']} unchanged), "
+          f"{counts['messages']} messages, {counts['skipped']} skipped (empty after stripping quotes, or "
+          f"unreadable), {counts['chunks']} chunks. Corpus: {corpus_path(args.output_dir, 'jsonl')}")
+    if args.metrics:
+        metrics.write(args.metrics)
+
+
+"""
+python ingest_mbox.py --mail-dir ../data/mailing_list --output-dir ../data/mail_chunks
+python index_chunks.py
+"""
+if __name__ == "__main__":
+    main()
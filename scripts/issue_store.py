@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# scripts/issue_store.py
+
+import os
+import re
+import gzip
+import json
+import argparse
+from typing import Dict, Iterator, Optional, Tuple
+
+# ——— CONFIGURATION ———
+SHARD_BYTES  = 64 * 1024 * 1024      # roll over to a new shard past this size
+SHARD_FORMAT = "issues-{:05d}.jsonl.gz"
+SHARD_RE     = re.compile(r"^issues-(\d+)\.jsonl\.gz$")
+INDEX_FILE   = "issues.idx"
+
+ISSUE_FILE_RE = re.compile(r"^(?P<safe>.+)_issue_(?P<number>\d+)\.json$")
+
+
+class IssueStore:
+    """
+    Append-only, gzip-compressed, sharded storage for raw issues.
+
+    Every record is one JSON line compressed as its own gzip member, so a
+    record can be read back by seeking straight to it. Shards are plain
+    concatenations of members (`zcat` still works on them). The offset index
+    is an append-only TSV of `repo, number, shard, offset, length`; the last
+    line for a key wins, so rewriting an issue is just another append and
+    `compact()` drops the superseded records.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.index: Dict[Tuple[str, int], Tuple[int, int, int]] = {}
+        self._shard_no = 0
+        self._shard = None
+        self._index_f = None
+        self._load_index()
+
+    # ——— index ———
+    def _load_index(self):
+        path = os.path.join(self.root, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 5:
+                    continue   # torn trailing line from a crash mid-append
+                repo, number, shard, offset, length = parts
+                self.index[(repo, int(number))] = (int(shard), int(offset), int(length))
+                self._shard_no = max(self._shard_no, int(shard))
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, key: Tuple[str, int]):
+        return key in self.index
+
+    # ——— writing ———
+    def _shard_path(self, shard: int) -> str:
+        return os.path.join(self.root, SHARD_FORMAT.format(shard))
+
+    def _writer(self):
+        if self._shard is None:
+            self._shard = open(self._shard_path(self._shard_no), "ab")
+            self._index_f = open(os.path.join(self.root, INDEX_FILE), "a")
+        if self._shard.tell() >= SHARD_BYTES:
+            self._shard.close()
+            self._shard_no += 1
+            self._shard = open(self._shard_path(self._shard_no), "ab")
+        return self._shard
+
+    def put(self, repo_name: str, issue: Dict):
+        """Append one issue; it supersedes any earlier record for the same number."""
+        data = gzip.compress(
+            (json.dumps(issue, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+        )
+        shard = self._writer()
+        offset = shard.tell()
+        shard.write(data)
+        shard.flush()
+        # Index line goes last: a crash in between leaves only unreferenced bytes
+        self._index_f.write(f"{repo_name}\t{issue['number']}\t{self._shard_no}\t{offset}\t{len(data)}\n")
+        self._index_f.flush()
+        self.index[(repo_name, int(issue["number"]))] = (self._shard_no, offset, len(data))
+
+    def close(self):
+        if self._shard is not None:
+            self._shard.close()
+            self._index_f.close()
+            self._shard = self._index_f = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ——— reading ———
+    def get(self, repo_name: str, number: int) -> Optional[Dict]:
+        """Random access to the latest record of one issue."""
+        loc = self.index.get((repo_name, int(number)))
+        if loc is None:
+            return None
+        shard, offset, length = loc
+        with open(self._shard_path(shard), "rb") as f:
+            f.seek(offset)
+            return json.loads(gzip.decompress(f.read(length)))
+
+    def iter_issues(self, repo_name: str = None) -> Iterator[Tuple[str, Dict]]:
+        """
+        Stream (repo, issue) for the latest record of every issue, optionally
+        for one repo. Reads each shard front to back, one record at a time.
+        """
+        if self._shard is not None:
+            self._shard.flush()
+        by_shard: Dict[int, list] = {}
+        for (repo, _), (shard, offset, length) in self.index.items():
+            if repo_name is None or repo == repo_name:
+                by_shard.setdefault(shard, []).append((offset, length, repo))
+        for shard in sorted(by_shard):
+            with open(self._shard_path(shard), "rb") as f:
+                for offset, length, repo in sorted(by_shard[shard]):
+                    f.seek(offset)
+                    yield repo, json.loads(gzip.decompress(f.read(length)))
+
+    # ——— maintenance ———
+    def compact(self):
+        """
+        Rewrite the shards keeping only the latest record of each issue.
+
+        The live records are copied (still compressed) into shards numbered
+        after the current ones and indexed in a new index file, which is
+        renamed over the old one; only then are the old shards deleted. A
+        crash at any point leaves either the old store or the new one.
+        """
+        self.close()
+        first = self._shard_no + 1
+        for fname in os.listdir(self.root):
+            m = SHARD_RE.match(fname)
+            if m and int(m.group(1)) >= first:
+                os.remove(os.path.join(self.root, fname))   # left by a compaction that crashed
+        index_path = os.path.join(self.root, INDEX_FILE)
+        shard_no, shard = first, open(self._shard_path(first), "wb")
+        index = {}
+        with open(index_path + ".tmp", "w") as index_f:
+            by_shard: Dict[int, list] = {}
+            for key, (old, offset, length) in self.index.items():
+                by_shard.setdefault(old, []).append((offset, length, key))
+            for old in sorted(by_shard):
+                with open(self._shard_path(old), "rb") as f:
+                    for offset, length, (repo, number) in sorted(by_shard[old]):
+                        if shard.tell() >= SHARD_BYTES:
+                            _sync_close(shard)
+                            shard_no += 1
+                            shard = open(self._shard_path(shard_no), "wb")
+                        f.seek(offset)
+                        new_offset = shard.tell()
+                        shard.write(f.read(length))
+                        index_f.write(f"{repo}\t{number}\t{shard_no}\t{new_offset}\t{length}\n")
+                        index[(repo, number)] = (shard_no, new_offset, length)
+            _sync_close(shard)
+            index_f.flush()
+            os.fsync(index_f.fileno())
+        os.replace(index_path + ".tmp", index_path)
+        for old in range(first):
+            if os.path.exists(self._shard_path(old)):
+                os.remove(self._shard_path(old))
+        self.index, self._shard_no = index, shard_no
+
+    # ——— per-file layout import/export ———
+    def import_dir(self, input_dir: str) -> int:
+        """Import `{repo}_issue_{n}.json` files written by the old per-file layout."""
+        count = 0
+        for fname in sorted(os.listdir(input_dir)):
+            m = ISSUE_FILE_RE.match(fname)
+            if not m:
+                continue
+            with open(os.path.join(input_dir, fname), "r") as f:
+                issue = json.load(f)
+            self.put(repo_from_issue(issue, m.group("safe")), issue)
+            count += 1
+        return count
+
+    def export_dir(self, output_dir: str, repo_name: str = None) -> int:
+        """Write every issue back out as `{repo}_issue_{n}.json`."""
+        os.makedirs(output_dir, exist_ok=True)
+        count = 0
+        for repo, issue in self.iter_issues(repo_name):
+            fn = os.path.join(output_dir, f"{repo.replace('/', '_')}_issue_{issue['number']}.json")
+            with open(fn, "w") as f:
+                json.dump(issue, f, indent=2)
+            count += 1
+        return count
+
+
+def _sync_close(f):
+    """Close f once its bytes are on disk, so a renamed-in index never points past them."""
+    f.flush()
+    os.fsync(f.fileno())
+    f.close()
+
+
+def repo_from_issue(issue: Dict, fallback: str) -> str:
+    """Recover 'owner/name' from the issue's html url (safe names are ambiguous)."""
+    m = re.match(r"https?://[^/]+/([^/]+/[^/]+)/", issue.get("url") or "")
+    return m.group(1) if m else fallback
+
+
+def is_store(path: str) -> bool:
+    return os.path.exists(os.path.join(path, INDEX_FILE))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Manage the sharded raw-issue store"
+    )
+    parser.add_argument(
+        "--store", "-s", default="../data/github_issues",
+        help="Store directory (default: ../data/github_issues)"
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_imp = sub.add_parser("import", help="Import per-issue JSON files")
+    p_imp.add_argument("--input-dir", "-i", required=True)
+    p_exp = sub.add_parser("export", help="Export to per-issue JSON files")
+    p_exp.add_argument("--output-dir", "-o", required=True)
+    p_exp.add_argument("--repo", default=None, help="Only export one repo, e.g. apache/solr")
+    sub.add_parser("compact", help="Drop superseded records")
+    sub.add_parser("stats", help="Print issue counts and on-disk size")
+    args = parser.parse_args()
+
+    with IssueStore(args.store) as store:
+        if args.command == "import":
+            print(f"Imported {store.import_dir(args.input_dir)} issues into {args.store}")
+        elif args.command == "export":
+            print(f"Exported {store.export_dir(args.output_dir, args.repo)} issues to {args.output_dir}")
+        elif args.command == "compact":
+            store.compact()
+            print(f"Compacted {args.store}: {len(store)} issues")
+        else:
+            repos: Dict[str, int] = {}
+            for repo, _ in store.index:
+                repos[repo] = repos.get(repo, 0) + 1
+            size = sum(os.path.getsize(os.path.join(args.store, f))
+                       for f in os.listdir(args.store) if f.endswith(".jsonl.gz"))
+            for repo, n in sorted(repos.items()):
+                print(f"{repo}: {n} issues")
+            print(f"Shards: {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
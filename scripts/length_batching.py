@@ -0,0 +1,67 @@
+# scripts/length_batching.py
+
+from typing import List
+
+import numpy as np
+
+# ——— CONFIGURATION ———
+TOKEN_BUDGET = 64 * 256      # padded tokens per forward pass (≈ the old 64-chunk batches)
+MAX_BATCH    = 256           # cap on chunks per batch, however short they are
+SORT_WINDOW  = 1024          # chunks sorted together; wider windows pad less but lag more
+
+
+def token_lengths(model, texts: List[str]) -> np.ndarray:
+    """Per-text sequence length as the model sees it (special tokens, truncation included)."""
+    enc = model.tokenizer(
+        texts, add_special_tokens=True, truncation=True, max_length=model.max_seq_length,
+        return_length=True, return_attention_mask=False, return_token_type_ids=False, verbose=False
+    )
+    return np.asarray(enc["length"])
+
+
+def plan_batches(lengths: np.ndarray, token_budget: int = TOKEN_BUDGET,
+                 max_batch: int = MAX_BATCH) -> List[np.ndarray]:
+    """
+    Group text positions into batches of similar length.
+    Positions are sorted longest first and a batch grows while
+    (its longest length × its size) stays within token_budget, so short
+    chunks get big batches and long ones small, with little padding.
+    """
+    order = np.argsort(-lengths, kind="stable")
+    batches, start = [], 0
+    while start < len(order):
+        longest = max(int(lengths[order[start]]), 1)
+        size = max(1, min(max_batch, token_budget // longest))
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def padding_waste(lengths: np.ndarray, batches: List[np.ndarray]) -> float:
+    """Fraction of computed token positions that are padding."""
+    padded = sum(int(lengths[b].max()) * len(b) for b in batches)
+    return 1.0 - float(lengths.sum()) / padded if padded else 0.0
+
+
+def encode_by_length(model, texts: List[str], token_budget: int = TOKEN_BUDGET,
+                     pool=None) -> np.ndarray:
+    """
+    Encode texts in length-bucketed, token-budgeted batches and return the
+    embeddings in the original order. With a multi-process pool the texts
+    are handed over length-sorted, so each worker's share is homogeneous.
+    """
+    if not texts:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    lengths = token_lengths(model, texts)
+    out = np.empty((len(texts), model.get_sentence_embedding_dimension()), dtype=np.float32)
+    if pool is not None:
+        order = np.argsort(-lengths, kind="stable")
+        batch_size = max(1, token_budget // max(int(np.median(lengths)), 1))
+        out[order] = model.encode_multi_process([texts[i] for i in order], pool, batch_size=batch_size)
+        return out
+    for batch in plan_batches(lengths, token_budget):
+        out[batch] = model.encode(
+            [texts[i] for i in batch], batch_size=len(batch),
+            show_progress_bar=False, device="cpu"
+        )
+    return out
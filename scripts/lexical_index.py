@@ -0,0 +1,313 @@
+# scripts/lexical_index.py
+
+import os
+import re
+import json
+import math
+import shutil
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# ——— CONFIGURATION ———
+LEXICAL_SUBDIR = "lexical"       # <persist_dir>/lexical/<collection>/ holds the BM25 segments
+MANIFEST       = "lexical.json"  # live segments and their doc/length counts
+TERM_BYTES     = 48              # terms are stored as utf-8, cut to this many bytes
+K1             = 1.2             # BM25 term-frequency saturation
+B              = 0.75            # BM25 length normalisation
+MAX_SEGMENTS   = 8               # more than this after a commit and they are merged into one
+RRF_K          = 60              # reciprocal rank fusion constant
+
+# Identifiers stay whole (solrconfig.xml, SOLR-12345, o.a.s.core.SolrCore) ...
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+(?:[.\-/:#$][A-Za-z0-9_]+)*")
+# ... and are also split into their dotted/dashed/camelCase parts
+_PART_RE  = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+_lock    = threading.Lock()
+_indexes: Dict[str, Tuple[Optional[int], "LexicalIndex"]] = {}
+
+
+def analyze(text: str) -> List[str]:
+    """
+    Lower-cased BM25 terms. Each identifier is indexed whole and by its
+    parts, so "SolrCloud" also matches "solr cloud" and "SOLR-12345"
+    matches exactly as well as by number.
+    """
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        terms.append(token.lower())
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            terms.extend(p.lower() for p in parts)
+    return terms
+
+
+def _encode(term: str) -> bytes:
+    return term.encode("utf-8")[:TERM_BYTES]
+
+
+def _write_segment(path: str, ids: np.ndarray, doc_len: np.ndarray,
+                   post_terms: np.ndarray, post_docs: np.ndarray, post_tfs: np.ndarray):
+    """
+    Write one segment from flat (term, doc, tf) postings: a sorted term
+    array, each term's start in the postings, and postings sorted by
+    (term, doc). Segments are immutable apart from their deletion mask.
+    """
+    tmp = path + ".tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    terms, inverse = np.unique(post_terms, return_inverse=True)
+    order = np.lexsort((post_docs, inverse))
+    save = lambda name, arr: np.save(os.path.join(tmp, name), arr)
+    save("terms.npy", terms.astype(f"S{TERM_BYTES}"))
+    save("term_offsets.npy", np.concatenate([[0], np.cumsum(np.bincount(inverse, minlength=len(terms)))]))
+    save("post_docs.npy", post_docs[order].astype(np.int32))
+    save("post_tfs.npy", post_tfs[order].astype(np.int32))
+    save("doc_len.npy", doc_len.astype(np.int32))
+    save("doc_ids.npy", ids)
+    save("deleted.npy", np.zeros(len(ids), dtype=bool))
+    os.replace(tmp, path)
+
+
+class _Segment:
+    def __init__(self, path: str):
+        self.path = path
+        load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")
+        self.terms = load("terms.npy")
+        self.term_offsets = load("term_offsets.npy")
+        self.post_docs = load("post_docs.npy")
+        self.post_tfs = load("post_tfs.npy")
+        self.doc_len = load("doc_len.npy")
+        self.ids = load("doc_ids.npy")
+        self.deleted = np.load(os.path.join(path, "deleted.npy"))
+
+    def postings(self, term: bytes):
+        i = int(np.searchsorted(self.terms, term))
+        if i < len(self.terms) and self.terms[i] == term:
+            lo, hi = int(self.term_offsets[i]), int(self.term_offsets[i + 1])
+            return self.post_docs[lo:hi], self.post_tfs[lo:hi]
+        return None
+
+    def save_deleted(self):
+        path = os.path.join(self.path, "deleted.npy")
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, self.deleted)
+        os.replace(path + ".tmp", path)
+
+
+class LexicalIndex:
+    """
+    BM25 over chunk texts, kept like a small Lucene index: immutable
+    segments of sorted term arrays and (doc, tf) postings arrays, opened
+    with mmap_mode="r" so processes share the pages.
+
+    add()/delete() buffer changes and commit() applies them: added chunks
+    become a new segment, and replaced or deleted chunks are flagged in
+    their old segment's deletion mask. Past MAX_SEGMENTS, all segments are
+    merged into one and the flagged docs are dropped for good.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        path = os.path.join(root, MANIFEST)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = {"next": 0, "segments": {}}
+        self.segments = {name: _Segment(os.path.join(root, name)) for name in self.manifest["segments"]}
+        self._pending: Dict[str, str] = {}
+        self._deletes = set()
+        self._live = None   # chunk id -> (segment, doc); built on first need by writers
+
+    def _locations(self) -> Dict[str, Tuple[str, int]]:
+        if self._live is None:
+            self._live = {}
+            for name, seg in self.segments.items():
+                for doc in np.flatnonzero(~seg.deleted):
+                    self._live[seg.ids[doc].decode("utf-8")] = (name, int(doc))
+        return self._live
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._pending or chunk_id in self._locations()
+
+    def ids(self) -> List[str]:
+        return list(self._locations()) + [cid for cid in self._pending if cid not in self._locations()]
+
+    def add(self, chunk_id: str, text: str):
+        """Index (or re-index) a chunk at the next commit."""
+        self._pending[chunk_id] = text
+        self._deletes.discard(chunk_id)
+
+    def delete(self, chunk_ids: Iterable[str]):
+        for cid in chunk_ids:
+            self._pending.pop(cid, None)
+            self._deletes.add(cid)
+
+    def _new_segment(self) -> str:
+        name = f"seg_{self.manifest['next']:06d}"
+        self.manifest["next"] += 1
+        return name
+
+    def _record(self, name: str):
+        seg = self.segments[name]
+        live = ~seg.deleted
+        self.manifest["segments"][name] = {
+            "docs":     len(seg.deleted),
+            "live":     int(live.sum()),
+            "live_len": int(np.asarray(seg.doc_len)[live].sum()),
+        }
+
+    def _add_segment(self, name: str):
+        self.segments[name] = _Segment(os.path.join(self.root, name))
+        self._record(name)
+        locations = self._locations()
+        for doc, cid in enumerate(self.segments[name].ids):
+            locations[cid.decode("utf-8")] = (name, doc)
+
+    def commit(self) -> Dict[str, int]:
+        """Apply buffered adds and deletes; returns counts of what changed."""
+        locations = self._locations()
+        touched = set()
+        for cid in list(self._deletes) + list(self._pending):
+            where = locations.pop(cid, None)
+            if where is not None:
+                self.segments[where[0]].deleted[where[1]] = True
+                touched.add(where[0])
+        for name in touched:
+            self.segments[name].save_deleted()
+            self._record(name)
+
+        added = len(self._pending)
+        if self._pending:
+            ids, lens, terms, docs, tfs = [], [], [], [], []
+            for doc, (cid, text) in enumerate(self._pending.items()):
+                words = analyze(text)
+                counts = Counter(_encode(t) for t in words)
+                ids.append(cid.encode("utf-8"))
+                lens.append(len(words))
+                terms.extend(counts)
+                tfs.extend(counts.values())
+                docs.extend([doc] * len(counts))
+            name = self._new_segment()
+            _write_segment(os.path.join(self.root, name), np.array(ids), np.array(lens),
+                           np.array(terms, dtype=f"S{TERM_BYTES}"), np.array(docs), np.array(tfs))
+            self._add_segment(name)
+
+        dropped = [n for n, info in self.manifest["segments"].items() if info["live"] == 0]
+        for name in dropped:
+            del self.manifest["segments"][name]
+        if len(self.manifest["segments"]) > MAX_SEGMENTS:
+            merged = list(self.manifest["segments"])
+            self._merge(merged)
+            dropped += merged
+        self._save_manifest()
+        # Only now that the manifest no longer lists them
+        for name in dropped:
+            self.segments.pop(name, None)
+            shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+
+        deleted = len(self._deletes)
+        self._pending, self._deletes = {}, set()
+        return {"added": added, "deleted": deleted, "segments": len(self.manifest["segments"])}
+
+    def _merge(self, names: List[str]):
+        """Rewrite the live docs of the given segments as one new segment."""
+        ids, lens, terms, docs, tfs = [], [], [], [], []
+        base = 0
+        for name in names:
+            seg = self.segments[name]
+            live = ~seg.deleted
+            renumber = np.cumsum(live) - 1 + base
+            term_of = np.repeat(np.arange(len(seg.terms)), np.diff(seg.term_offsets))
+            keep = live[seg.post_docs]
+            terms.append(np.asarray(seg.terms)[term_of[keep]])
+            docs.append(renumber[np.asarray(seg.post_docs)[keep]])
+            tfs.append(np.asarray(seg.post_tfs)[keep])
+            ids.append(np.asarray(seg.ids)[live])
+            lens.append(np.asarray(seg.doc_len)[live])
+            base += int(live.sum())
+            del self.manifest["segments"][name]
+            del self.segments[name]
+        name = self._new_segment()
+        _write_segment(os.path.join(self.root, name), np.concatenate(ids), np.concatenate(lens),
+                       np.concatenate(terms), np.concatenate(docs), np.concatenate(tfs))
+        self._live = None
+        self._add_segment(name)
+
+    def _save_manifest(self):
+        path = os.path.join(self.root, MANIFEST)
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(path + ".tmp", path)
+
+    def search(self, query: str, top_k: int) -> List[Tuple[str, float]]:
+        """Top_k (chunk id, BM25 score) for the query, best first."""
+        stats = self.manifest["segments"].values()
+        n_live = sum(s["live"] for s in stats)
+        if not n_live:
+            return []
+        avgdl = sum(s["live_len"] for s in stats) / n_live
+        n_docs = sum(s["docs"] for s in stats)         # matches df, which counts deleted docs
+        terms = {_encode(t) for t in analyze(query)}
+
+        # Per segment, the (docs, BM25 weights) of every query term it contains
+        weights: Dict[str, List] = {name: [] for name in self.segments}
+        for term in terms:
+            hits = [(name, seg, seg.postings(term)) for name, seg in self.segments.items()]
+            hits = [(name, seg, p) for name, seg, p in hits if p is not None]
+            df = sum(len(p[0]) for _, _, p in hits)   # deleted docs count until merged, as in Lucene
+            if not df:
+                continue
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for name, seg, (docs, tf) in hits:
+                docs, tf = np.asarray(docs), np.asarray(tf, dtype=np.float32)
+                norm = K1 * (1 - B + B * np.asarray(seg.doc_len)[docs] / avgdl)
+                weights[name].append((docs, idf * tf * (K1 + 1) / (tf + norm)))
+
+        found_ids, found_scores = [], []
+        for name, parts in weights.items():
+            if not parts:
+                continue
+            seg = self.segments[name]
+            docs, inverse = np.unique(np.concatenate([d for d, _ in parts]), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate([w for _, w in parts]))
+            live = ~seg.deleted[docs]
+            found_ids.extend(seg.ids[d].decode("utf-8") for d in docs[live])
+            found_scores.append(scores[live])
+        if not found_ids:
+            return []
+        scores = np.concatenate(found_scores)
+        best = np.argsort(-scores, kind="stable")[:top_k]
+        return [(found_ids[i], float(scores[i])) for i in best]
+
+
+def rrf_fuse(*rankings: List[str], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Reciprocal rank fusion: each id scores sum(1 / (k + rank)) over the rankings it appears in."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, cid in enumerate(ranking, start=1):
+            fused[cid] = fused.get(cid, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: -kv[1])
+
+
+def lexical_root(persist_dir: str, collection_name: str) -> str:
+    return os.path.join(persist_dir, LEXICAL_SUBDIR, collection_name)
+
+
+def get_lexical(persist_dir: str, collection_name: str) -> LexicalIndex:
+    """
+    The process-wide read handle on a collection's lexical index, reopened
+    once its manifest changes so a long-running process sees new commits.
+    """
+    root = lexical_root(persist_dir, collection_name)
+    path = os.path.join(root, MANIFEST)
+    version = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    key = os.path.realpath(root)
+    with _lock:
+        if key not in _indexes or _indexes[key][0] != version:
+            _indexes[key] = (version, LexicalIndex(root))
+        return _indexes[key][1]
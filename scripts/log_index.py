@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+# scripts/log_index.py
+
+import os
+import re
+import gzip
+import json
+import mmap
+import hashlib
+import calendar
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from re import _parser as sre_parse     # Python 3.11+
+except ImportError:
+    import sre_parse
+
+# ——— CONFIGURATION ———
+LOG_INDEX_DIR  = "../vector_store/log_index"
+STRIDE         = 64 * 1024       # bytes of log between sparse index entries
+HEAD_BYTES     = 1024            # leading bytes hashed to tell a rotated file from one that grew
+TAIL_BYTES     = 256 * 1024      # read from the end of a file to find its last timestamp
+LIMIT          = 100             # matching lines returned by default
+LOG_WORKERS    = min(4, os.cpu_count() or 1)
+PARALLEL_BYTES = 32 * 1024 * 1024   # below this much log in total, files are searched in-process
+
+# Solr's log4j layout starts each entry with "2024-01-15 10:23:45.123"; lines without one continue the entry above
+TIMESTAMP = re.compile(rb"(\d{4})-(\d{2})-(\d{2})[ T](\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,3}))?")
+
+
+def _ts_at(buf, pos: int) -> Optional[int]:
+    """Epoch milliseconds of the timestamp starting the line at pos, or None."""
+    m = TIMESTAMP.match(buf, pos)
+    if m is None:
+        return None
+    y, mo, d, h, mi, s, ms = m.groups()
+    secs = calendar.timegm((int(y), int(mo), int(d), int(h), int(mi), int(s)))
+    return secs * 1000 + int((ms or b"0").ljust(3, b"0"))
+
+
+def to_millis(value) -> Optional[int]:
+    """An ISO date/time (naive, like the logs, or with an offset) as epoch milliseconds."""
+    if value is None or value == "":
+        return None
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    parts = dt.utctimetuple() if dt.tzinfo else dt.timetuple()
+    return calendar.timegm(parts) * 1000 + dt.microsecond // 1000
+
+
+def _iso(ms: Optional[int]) -> Optional[str]:
+    if ms is None:
+        return None
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).replace(tzinfo=None).isoformat(sep=" ", timespec="milliseconds")
+
+
+def required_literal(pattern: bytes, flags: int = 0) -> Optional[bytes]:
+    """
+    The longest run of literal bytes every match of pattern must contain,
+    found in the pattern's top level, or None. Searching for it with
+    bytes.find skips most lines before the regex runs at all.
+    """
+    if flags & re.IGNORECASE:
+        return None
+    parsed = sre_parse.parse(pattern, flags)
+    if parsed.state.flags & re.IGNORECASE:
+        return None
+    best, run = b"", bytearray()
+    for op, av in parsed:
+        if op is sre_parse.LITERAL:
+            run.append(av)
+            continue
+        best, run = max(best, bytes(run), key=len), bytearray()
+    best = max(best, bytes(run), key=len)
+    return best or None
+
+
+def log_files(log_dir: str) -> List[str]:
+    """Every file in log_dir: solr.log, its rotations (solr.log.1, ...) and gzipped ones."""
+    return sorted(
+        os.path.join(log_dir, f) for f in os.listdir(log_dir)
+        if os.path.isfile(os.path.join(log_dir, f)) and not f.startswith(".")
+    )
+
+
+class LogFileIndex:
+    """
+    Sparse timestamp -> byte offset index of one log file: an entry every
+    STRIDE bytes, at the first timestamped line after each boundary. A time
+    window becomes a binary search plus a scan of under STRIDE bytes at each
+    end. Building reads only a few lines per stride (the file is mmapped),
+    and a file that has grown since is extended from where the index ended;
+    one whose head changed was rotated and is re-indexed. Gzipped files
+    can't be seeked, so for them only the first and last timestamps are
+    kept, to skip files outside a window. Saved as one .npz per file under
+    index_dir.
+    """
+
+    def __init__(self, path: str, index_dir: str = LOG_INDEX_DIR):
+        self.path = path
+        self.gz = path.endswith(".gz")
+        key = hashlib.blake2b(os.path.realpath(path).encode("utf-8"), digest_size=8).hexdigest()
+        self.index_path = os.path.join(index_dir, f"{key}.npz")
+        self.ts = np.empty(0, dtype=np.int64)
+        self.offsets = np.empty(0, dtype=np.int64)
+        self.meta: Dict = {}
+        if os.path.exists(self.index_path):
+            with np.load(self.index_path) as data:
+                self.ts, self.offsets = data["ts"], data["offsets"]
+                self.meta = json.loads(str(data["meta"]))
+
+    def _head(self) -> str:
+        opener = gzip.open if self.gz else open
+        with opener(self.path, "rb") as f:
+            return hashlib.blake2b(f.read(HEAD_BYTES), digest_size=8).hexdigest()
+
+    def update(self) -> bool:
+        """Bring the index up to date with the file; True if anything changed."""
+        st = os.stat(self.path)
+        head = self._head()
+        meta = self.meta
+        if meta.get("size") == st.st_size and meta.get("mtime_ns") == st.st_mtime_ns and meta.get("head") == head:
+            return False
+        grown = meta.get("head") == head and st.st_size >= meta.get("size", 0) and not self.gz
+        if not grown:
+            self.ts, self.offsets = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+            meta = {"first_ts": None, "last_ts": None, "size": 0}
+
+        if self.gz:
+            meta.update(self._gz_range())
+        elif st.st_size:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                size = len(buf)
+                resume = int(self.offsets[-1]) + STRIDE if len(self.offsets) else 0
+                points = [p for p in (_next_line(buf, pos, size) for pos in range(resume, size, STRIDE))
+                          if p is not None]
+                if points:
+                    new_offsets = np.array([o for o, _ in points], dtype=np.int64)
+                    new_ts = np.array([t for _, t in points], dtype=np.int64)
+                    keep = new_offsets > (self.offsets[-1] if len(self.offsets) else -1)
+                    self.offsets = np.concatenate([self.offsets, new_offsets[keep]])
+                    # Entries from different threads can be a few ms out of order; keep the keys sorted
+                    self.ts = np.maximum.accumulate(np.concatenate([self.ts, new_ts[keep]]))
+                meta["first_ts"] = int(self.ts[0]) if len(self.ts) else None
+                meta["last_ts"] = _last_ts(buf, size)
+        meta.update(path=self.path, size=st.st_size, mtime_ns=st.st_mtime_ns, head=head)
+        self.meta = meta
+        self._save()
+        return True
+
+    def _gz_range(self) -> Dict:
+        first = last = None
+        try:
+            with gzip.open(self.path, "rb") as f:
+                for line in f:
+                    ts = _ts_at(line, 0)
+                    if ts is not None:
+                        first = ts if first is None else first
+                        last = ts
+        except (EOFError, OSError):
+            pass        # truncated (still being compressed?) or corrupt: index what could be read
+        return {"first_ts": first, "last_ts": last}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp = self.index_path + ".tmp.npz"
+        np.savez(tmp, ts=self.ts, offsets=self.offsets, meta=np.array(json.dumps(self.meta)))
+        os.replace(tmp, self.index_path)
+
+    def overlaps(self, start_ms: Optional[int], end_ms: Optional[int]) -> bool:
+        first, last = self.meta.get("first_ts"), self.meta.get("last_ts")
+        if start_ms is not None and last is not None and last < start_ms:
+            return False
+        if end_ms is not None and first is not None and first > end_ms:
+            return False
+        return True
+
+    def bounds(self, buf, start_ms: Optional[int], end_ms: Optional[int]) -> Tuple[int, int]:
+        """Byte range [lo, hi) of buf holding exactly the entries inside the window."""
+        size = len(buf)
+        lo, hi = 0, size
+        if start_ms is not None and len(self.ts):
+            i = int(np.searchsorted(self.ts, start_ms, side="left")) - 1
+            lo = _first_line(buf, int(self.offsets[i]) if i >= 0 else 0, size, lambda ts: ts >= start_ms)
+        if end_ms is not None and len(self.ts):
+            j = int(np.searchsorted(self.ts, end_ms, side="right"))
+            from_pos = max(lo, int(self.offsets[j - 1]) if j > 0 else 0)
+            hi = _first_line(buf, from_pos, size, lambda ts: ts > end_ms)
+        return lo, max(lo, hi)
+
+
+def _next_line(buf, pos: int, size: int) -> Optional[Tuple[int, int]]:
+    """(offset, timestamp) of the first timestamped line starting at or after pos, looking one stride ahead."""
+    if pos > 0:
+        nl = buf.find(b"\n", pos - 1, size)
+        if nl == -1:
+            return None
+        pos = nl + 1
+    limit = min(size, pos + STRIDE)
+    while pos < limit:
+        ts = _ts_at(buf, pos)
+        if ts is not None:
+            return pos, ts
+        nl = buf.find(b"\n", pos, size)
+        if nl == -1:
+            return None
+        pos = nl + 1
+    return None
+
+
+def _first_line(buf, pos: int, size: int, test) -> int:
+    """Start of the first timestamped line at or after pos (a line start) whose timestamp passes test, else size."""
+    while pos < size:
+        ts = _ts_at(buf, pos)
+        if ts is not None and test(ts):
+            return pos
+        nl = buf.find(b"\n", pos, size)
+        if nl == -1:
+            return size
+        pos = nl + 1
+    return size
+
+
+def _last_ts(buf, size: int) -> Optional[int]:
+    pos = max(0, size - TAIL_BYTES)
+    last = None
+    while True:
+        line_start = pos if pos == 0 or buf[pos - 1:pos] == b"\n" else None
+        if line_start is not None:
+            ts = _ts_at(buf, line_start)
+            last = ts if ts is not None else last
+        nl = buf.find(b"\n", pos, size)
+        if nl == -1:
+            return last
+        pos = nl + 1
+
+
+def _hit(path: str, offset: int, line: bytes) -> Dict:
+    return {
+        "file": path,
+        "offset": offset,
+        "time": _iso(_ts_at(line, 0)),
+        "line": line.decode("utf-8", errors="replace").rstrip("\r"),
+    }
+
+
+def _scan(buf, lo: int, hi: int, regex, literal: Optional[bytes], limit: int) -> List[Tuple[int, bytes]]:
+    """Matching lines in buf[lo:hi]: jump between literal hits (or regex hits) and verify the line."""
+    found, pos = [], lo
+    while pos < hi and len(found) < limit:
+        if literal is not None:
+            cand = buf.find(literal, pos, hi)
+            match_end = None
+        else:
+            m = regex.search(buf, pos, hi)
+            cand, match_end = (m.start(), m.end()) if m else (-1, None)
+        if cand == -1:
+            break
+        line_start = buf.rfind(b"\n", 0, cand) + 1
+        line_end = buf.find(b"\n", cand, hi)
+        line_end = hi if line_end == -1 else line_end
+        # A regex match within the line stands; otherwise (literal hit, or a match running past
+        # the newline) the line is checked on its own
+        if (match_end is not None and match_end <= line_end) or regex.search(buf, line_start, line_end):
+            found.append((line_start, buf[line_start:line_end]))
+        pos = line_end + 1
+    return found
+
+
+def _scan_gz(path: str, regex, literal: Optional[bytes], start_ms: Optional[int], end_ms: Optional[int],
+             limit: int, found: List[Dict]):
+    """Stream a gzipped log; no seeking, but lines before the window are skipped cheaply and it stops after it."""
+    entry_ts, offset = None, 0
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            here, offset = offset, offset + len(line)
+            if start_ms is not None or end_ms is not None:
+                ts = _ts_at(line, 0)
+                entry_ts = ts if ts is not None else entry_ts
+                if start_ms is not None and (entry_ts is None or entry_ts < start_ms):
+                    continue
+                if end_ms is not None and entry_ts is not None and entry_ts > end_ms:
+                    break
+            if (literal is None or literal in line) and regex.search(line):
+                found.append(_hit(path, here, line.rstrip(b"\n")))
+                if len(found) >= limit:
+                    break
+
+
+def search_file(path: str, pattern: str, flags: int = 0, start_ms: Optional[int] = None,
+                end_ms: Optional[int] = None, limit: int = LIMIT, index_dir: str = LOG_INDEX_DIR) -> List[Dict]:
+    """Up to limit lines of one log file matching pattern inside the window, in file order."""
+    regex = re.compile(pattern.encode("utf-8"), flags | re.MULTILINE)
+    literal = required_literal(pattern.encode("utf-8"), flags)
+    index = LogFileIndex(path, index_dir)
+    index.update()
+    if not index.overlaps(start_ms, end_ms) or os.path.getsize(path) == 0:
+        return []
+
+    if index.gz:
+        found = []
+        try:
+            _scan_gz(path, regex, literal, start_ms, end_ms, limit, found)
+        except (EOFError, OSError):
+            pass        # truncated or corrupt: keep what was read
+        return found
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        lo, hi = index.bounds(buf, start_ms, end_ms)
+        return [_hit(path, offset, line) for offset, line in _scan(buf, lo, hi, regex, literal, limit)]
+
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """
+    One worker pool per size for the life of the process. Workers are
+    spawned, not forked: the agent and rag_service.py call this from
+    processes that already run threads.
+    """
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return pool
+
+
+def search_logs(log_dir: str, pattern: str, start=None, end=None, limit: int = LIMIT,
+                workers: int = LOG_WORKERS, index_dir: str = LOG_INDEX_DIR, flags: int = 0) -> Iterator[Dict]:
+    """
+    Stream at most limit lines matching pattern (a Python regex, applied per
+    line) from every log file in log_dir, optionally only between start and
+    end (ISO date/times). With more than PARALLEL_BYTES of logs, files are
+    searched on a shared pool of worker processes, each updating its file's
+    index first; lines come file by file as files finish, in file order
+    within a file. Each hit is {"file", "offset", "time", "line"}.
+    """
+    re.compile(pattern, flags)      # a bad pattern fails here, not in a worker
+    start_ms, end_ms = to_millis(start), to_millis(end)
+    paths = log_files(log_dir)
+    sent = 0
+    if workers <= 1 or len(paths) <= 1 or sum(os.path.getsize(p) for p in paths) < PARALLEL_BYTES:
+        for path in paths:
+            for hit in search_file(path, pattern, flags, start_ms, end_ms, limit - sent, index_dir):
+                yield hit
+                sent += 1
+            if sent >= limit:
+                return
+        return
+
+    pool = _pool(workers)
+    futures = []
+    try:
+        futures = [pool.submit(search_file, p, pattern, flags, start_ms, end_ms, limit, index_dir) for p in paths]
+        for future in as_completed(futures):
+            for hit in future.result():
+                yield hit
+                sent += 1
+                if sent >= limit:
+                    return
+    except BrokenProcessPool:
+        with _pools_lock:       # a worker died; the next search starts a fresh pool
+            if _pools.get(workers) is pool:
+                del _pools[workers]
+        raise
+    finally:
+        for future in futures:
+            future.cancel()     # files not started yet are not searched for nothing
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Search Solr logs (plain, rotated and .gz) for a regex, optionally within a time window"
+    )
+    parser.add_argument("log_dir", help="Directory of Solr log files")
+    parser.add_argument("pattern", help="Python regex, matched against each line")
+    parser.add_argument("--start", help="Only entries at/after this ISO time, e.g. 2024-01-15T10:00")
+    parser.add_argument("--end", help="Only entries at/before this ISO time")
+    parser.add_argument("--limit", "-n", type=int, default=LIMIT, help=f"Max lines returned (default: {LIMIT})")
+    parser.add_argument("--workers", "-w", type=int, default=LOG_WORKERS,
+                        help=f"Files searched in parallel (default: {LOG_WORKERS})")
+    parser.add_argument("--ignore-case", "-i", action="store_true", help="Case-insensitive match")
+    parser.add_argument("--index-dir", default=LOG_INDEX_DIR, help=f"Where the per-file indexes live (default: {LOG_INDEX_DIR})")
+    args = parser.parse_args()
+
+    flags = re.IGNORECASE if args.ignore_case else 0
+    for hit in search_logs(args.log_dir, args.pattern, args.start, args.end, args.limit,
+                           args.workers, args.index_dir, flags):
+        print(f"{os.path.basename(hit['file'])}:{hit['offset']}: {hit['line']}")
+
+
+"""
+python log_index.py /var/solr/logs "SolrCore.*ERROR" --start 2024-01-15T10:00 --end 2024-01-15T11:00 --limit 50
+"""
+if __name__ == "__main__":
+    main()
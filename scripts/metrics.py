@@ -0,0 +1,137 @@
+# scripts/metrics.py
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict
+
+import numpy as np
+
+# ——— CONFIGURATION ———
+PREFIX  = "solr_assistant"      # Prometheus metric name prefix
+SAMPLES = 10000                 # most recent durations kept per span, for percentiles
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_lock     = threading.Lock()
+_spans:    Dict[str, "SpanStats"] = {}
+_counters: Dict[str, float] = {}
+
+
+class SpanStats:
+    """Durations of one named span: count, sum, max, histogram buckets and a window of recent samples."""
+    __slots__ = ("count", "total", "max", "buckets", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * len(BUCKETS)
+        self.samples = deque(maxlen=SAMPLES)
+
+    def add(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.samples.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.buckets[i] += 1
+                break
+
+
+def observe(name: str, seconds: float):
+    """Record one duration for span name."""
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            stats = _spans[name] = SpanStats()
+        stats.add(seconds)
+
+
+@contextmanager
+def span(name: str):
+    """Time the body as one occurrence of span name (recorded even if it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timed(name: str):
+    """Decorator form of span()."""
+    def wrap(fn):
+        @wraps(fn)
+        def inner(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def count(name: str, n: float = 1):
+    """Add n to counter name."""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def reset():
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+
+def snapshot() -> Dict:
+    """
+    {"spans": {name: {count, total_s, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}},
+     "counters": {name: value}}; percentiles are over the last SAMPLES
+    durations of each span.
+    """
+    with _lock:
+        spans = {name: (s.count, s.total, s.max, list(s.samples)) for name, s in _spans.items()}
+        counters = dict(_counters)
+    out = {}
+    for name, (n, total, peak, samples) in sorted(spans.items()):
+        p50, p95, p99 = np.percentile(samples, [50, 95, 99]) if samples else (0.0, 0.0, 0.0)
+        out[name] = {"count": n, "total_s": round(total, 6), "mean_ms": round(1000 * total / max(n, 1), 3),
+                     "p50_ms": round(1000 * p50, 3), "p95_ms": round(1000 * p95, 3),
+                     "p99_ms": round(1000 * p99, 3), "max_ms": round(1000 * peak, 3)}
+    return {"spans": out, "counters": dict(sorted(counters.items()))}
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def prometheus() -> str:
+    """All spans as one histogram and all counters as one counter, labelled by name, in Prometheus text format."""
+    with _lock:
+        spans = {name: (s.count, s.total, list(s.buckets)) for name, s in _spans.items()}
+        counters = dict(_counters)
+    lines = [f"# HELP {PREFIX}_span_seconds Time spent in each instrumented stage",
+             f"# TYPE {PREFIX}_span_seconds histogram"]
+    for name, (n, total, buckets) in sorted(spans.items()):
+        label = _label(name)
+        cumulative = 0
+        for bound, hits in zip(BUCKETS, buckets):
+            cumulative += hits
+            lines.append(f'{PREFIX}_span_seconds_bucket{{span="{label}",le="{bound:g}"}} {cumulative}')
+        lines.append(f'{PREFIX}_span_seconds_bucket{{span="{label}",le="+Inf"}} {n}')
+        lines.append(f'{PREFIX}_span_seconds_sum{{span="{label}"}} {total:.6f}')
+        lines.append(f'{PREFIX}_span_seconds_count{{span="{label}"}} {n}')
+    lines += [f"# HELP {PREFIX}_events_total Items processed and events seen, by counter name",
+              f"# TYPE {PREFIX}_events_total counter"]
+    lines += [f'{PREFIX}_events_total{{name="{_label(name)}"}} {value:g}' for name, value in sorted(counters.items())]
+    return "\n".join(lines) + "\n"
+
+
+def write(path: str):
+    """Write the metrics to path: Prometheus text for .prom/.txt, JSON otherwise."""
+    text = prometheus() if path.endswith((".prom", ".txt")) else json.dumps(snapshot(), indent=2)
+    with open(path + ".tmp", "w") as f:
+        f.write(text)
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,145 @@
+# scripts/model_registry.py
+
+import os
+import re
+import time
+import threading
+from typing import Dict, Iterable, Tuple
+
+from sentence_transformers import SentenceTransformer
+from chromadb import PersistentClient
+from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+# ——— CONFIGURATION ———
+BACKENDS      = ("torch", "onnx", "onnx-int8")
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")       # default for get_model / retrievers
+ONNX_DIR      = "../vector_store/onnx"                    # exported (and quantized) models, reused across runs
+QUANT_CONFIG  = os.getenv("ONNX_QUANT_CONFIG", "avx2")    # arm64 | avx2 | avx512 | avx512_vnni
+
+# Process-wide singletons: the indexer, RAGRetriever and the agent's DocRetriever
+# all go through here, so each model and each Chroma client is loaded once.
+_lock        = threading.Lock()
+_model_locks: Dict[Tuple[str, str], threading.Lock] = {}
+_models:      Dict[Tuple[str, str], SentenceTransformer] = {}
+_clients:     Dict[str, PersistentClient] = {}
+_collections: Dict[Tuple[str, str], object] = {}
+LOAD_SECONDS: Dict[str, float] = {}      # what each first load cost, for startup reports
+
+
+def _onnx_dir(model_name: str) -> str:
+    return os.path.join(ONNX_DIR, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+
+
+def _load(model_name: str, device: str, backend: str) -> SentenceTransformer:
+    """
+    Build the model for a backend. ONNX exports (and the int8 dynamic
+    quantization of the export) are written under ONNX_DIR the first time
+    and loaded from there afterwards; all backends return a SentenceTransformer,
+    so callers see the same encode/tokenizer interface.
+    """
+    if backend == "torch":
+        return SentenceTransformer(model_name, device=device)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}; expected one of {BACKENDS}")
+    local = _onnx_dir(model_name)
+    if not os.path.exists(os.path.join(local, "onnx", "model.onnx")):
+        SentenceTransformer(model_name, device=device, backend="onnx").save(local)
+    if backend == "onnx":
+        return SentenceTransformer(local, device=device, backend="onnx")
+    quantized = f"model_qint8_{QUANT_CONFIG}.onnx"
+    if not os.path.exists(os.path.join(local, "onnx", quantized)):
+        # Needs sentence-transformers >= 3.2 with optimum[onnxruntime]
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+        export_dynamic_quantized_onnx_model(
+            SentenceTransformer(local, device=device, backend="onnx"), QUANT_CONFIG, local
+        )
+    return SentenceTransformer(local, device=device, backend="onnx",
+                               model_kwargs={"file_name": quantized})
+
+
+def get_model(model_name: str, device: str = "cpu", backend: str = None) -> SentenceTransformer:
+    """Load a model on first use; later callers (any thread) share it."""
+    key = (model_name, backend or EMBED_BACKEND)
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _lock:
+        name_lock = _model_locks.setdefault(key, threading.Lock())
+    with name_lock:
+        if key not in _models:
+            start = time.perf_counter()
+            _models[key] = _load(model_name, device, key[1])
+            LOAD_SECONDS[f"model:{model_name}[{key[1]}]"] = time.perf_counter() - start
+    return _models[key]
+
+
+def warm(model_names: Iterable[str], backend: str = None) -> threading.Thread:
+    """Load models in a background thread so the first query doesn't pay for it."""
+    t = threading.Thread(target=lambda: [get_model(n, backend=backend) for n in model_names],
+                         name="model-warmup", daemon=True)
+    t.start()
+    return t
+
+
+def get_client(persist_dir: str) -> PersistentClient:
+    key = os.path.realpath(persist_dir)
+    with _lock:
+        if key not in _clients:
+            start = time.perf_counter()
+            _clients[key] = PersistentClient(
+                path=persist_dir,
+                settings=Settings(),
+                tenant=DEFAULT_TENANT,
+                database=DEFAULT_DATABASE
+            )
+            LOAD_SECONDS[f"chroma:{key}"] = time.perf_counter() - start
+        return _clients[key]
+
+
+def get_collection(persist_dir: str, collection_name: str, embed_model: str,
+                   create: bool = False, metadata: Dict = None, backend: str = None):
+    """
+    Open (or with `create`, get-or-create) a collection once per process per
+    embedding model and backend: the handle carries the embedding function
+    its queries are embedded with, so each model/backend needs its own.
+    """
+    key = (os.path.realpath(persist_dir), collection_name, embed_model, backend or EMBED_BACKEND)
+    if key in _collections:
+        return _collections[key]
+    client = get_client(persist_dir)
+    emb_fn = SharedEmbeddingFunction(embed_model, backend=backend)
+    if create:
+        collection = client.get_or_create_collection(
+            name=collection_name, embedding_function=emb_fn, metadata=metadata
+        )
+    else:
+        collection = client.get_collection(name=collection_name, embedding_function=emb_fn)
+    with _lock:
+        return _collections.setdefault(key, collection)
+
+
+class SharedEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    """
+    Chroma's SentenceTransformer embedding function, minus its own model load:
+    the model comes from the registry, and only when something is embedded.
+    Subclassing keeps the collection's persisted embedding-function config
+    unchanged.
+    """
+
+    def __init__(self, model_name: str, device: str = "cpu", normalize_embeddings: bool = False,
+                 backend: str = None):
+        self.model_name = model_name
+        self.device = device
+        self.backend = backend
+        self.normalize_embeddings = normalize_embeddings
+        self.kwargs = {}
+
+    @property
+    def _model(self) -> SentenceTransformer:
+        return get_model(self.model_name, self.device, self.backend)
+
+
+def loaded() -> Dict[str, float]:
+    """Everything loaded so far and its load time in seconds."""
+    return dict(LOAD_SECONDS)
@@ -2,12 +2,23 @@
 import os
 import sys
 import json
-from typing import List, Dict
+import time
+import argparse
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from typing import List, Dict, Iterable, Iterator, Tuple
 
+import numpy as np
 from openai import OpenAI
-from chromadb import PersistentClient
-from chromadb.config import Settings, DEFAULT_TENANT, DEFAULT_DATABASE
-from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+from tqdm import tqdm
+
+from model_registry import get_model
+from vector_store import get_store, where_clause
+from lexical_index import get_lexical, rrf_fuse
+from answer_cache import AnswerCache, normalize_query
+from length_batching import encode_by_length
+from context_packing import pack_context, CONTEXT_TOKENS
+import metrics
 
 from dotenv import load_dotenv
 load_dotenv()  # <— load env vars from .env 
@@ -18,6 +29,11 @@ COLLECTION_NAME  = "solr_support"
 EMBED_MODEL      = "all-mpnet-base-v2"
 OPENAI_MODEL     = "gpt-4o"       # or "gpt-3.5-turbo"
 TOP_K            = 5             # number of passages to retrieve
+RETRIEVAL_MODES  = ("vector", "hybrid")
+RETRIEVAL_MODE   = os.getenv("RETRIEVAL_MODE", "vector")
+HYBRID_DEPTH     = 4             # each side of a hybrid search contributes top_k × this candidates
+QUERY_BATCH      = 64            # answer_many embeds and searches this many questions at a time
+LLM_CONCURRENCY  = int(os.getenv("LLM_CONCURRENCY", "8"))   # answer_many's parallel LLM calls
 OPENAI_API_KEY   = os.getenv("OPENAI_API_KEY")
 client_llm = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
@@ -25,63 +41,138 @@ class RAGRetriever:
     def __init__(self,
                  persist_dir: str,
                  collection_name: str,
-                 embed_model: str):
-        # Initialize persistent Chroma client
-        self.client = PersistentClient(
-            path=persist_dir,
-            settings=Settings(),
-            tenant=DEFAULT_TENANT,
-            database=DEFAULT_DATABASE
-        )
-        # Configure embedding function
-        embedding_fn = SentenceTransformerEmbeddingFunction(
-            model_name=embed_model
-        )
-        # Load the collection
-        self.collection = self.client.get_collection(
-            name=collection_name,
-            embedding_function=embedding_fn
-        )
+                 embed_model: str,
+                 backend: str = None,
+                 store: str = None,
+                 mode: str = None):
+        # The embedding model is shared process-wide and loaded on the first
+        # query (or by model_registry.warm); backend defaults to $EMBED_BACKEND
+        # (torch, onnx or onnx-int8). The vector store is Chroma, or with
+        # store="mmap" (default $VECTOR_STORE) the memory-mapped export.
+        # mode="hybrid" (default $RETRIEVAL_MODE) also searches the BM25 index
+        # index_chunks.py builds, for exact identifiers dense vectors miss.
+        # Both are looked up per search, so a re-index or re-export is
+        # picked up by a long-running service.
+        self.persist_dir = persist_dir
+        self.collection_name = collection_name
+        self.embed_model = embed_model
+        self.backend = backend
+        self.store_kind = store
+        self.mode = mode or RETRIEVAL_MODE
+        # Open both now, so a missing index fails here and not on a query
+        self.store, self.lexical
+
+    @property
+    def store(self):
+        return get_store(self.persist_dir, self.collection_name, self.embed_model,
+                         kind=self.store_kind, backend=self.backend)
+
+    @property
+    def lexical(self):
+        return get_lexical(self.persist_dir, self.collection_name) if self.mode == "hybrid" else None
+
+    def embed(self, query: str):
+        with metrics.span("retriever.embed"):
+            return get_model(self.embed_model, backend=self.backend).encode([query])
+
+    def embed_many(self, queries: List[str]):
+        # Length-bucketed batches, so short questions share forward passes
+        metrics.count("retriever.queries_embedded", len(queries))
+        with metrics.span("retriever.embed_many"):
+            return encode_by_length(get_model(self.embed_model, backend=self.backend), queries)
 
-    def retrieve(self, query: str, top_k: int) -> List[Dict]:
+    def retrieve(self, query: str, top_k: int, filters: Dict = None, query_emb=None) -> List[Dict]:
         """
-        Embed the query and retrieve top_k passages.
-        Returns a list of dicts: {'text': ..., 'metadata': {...}}
+        Embed the query (unless query_emb is given) and retrieve top_k
+        passages, optionally only among chunks matching filters (see
+        vector_store.where_clause), e.g.
+        {"repo": "apache/solr", "state": "open", "updated_after": "2023-06-01"}.
+        Returns a list of dicts: {'id': ..., 'text': ..., 'metadata': {...}, 'score': ...}
         """
         # Embed the query
-        query_emb = self.collection._embedding_function([query])[0]
-        # Perform similarity search
-        results = self.collection.query(
-            query_embeddings=[query_emb],
-            n_results=top_k
-        )
-        docs = results["documents"][0]
-        metas = results["metadatas"][0]
-        return [{"text": doc, "metadata": meta}
-                for doc, meta in zip(docs, metas)]
+        if query_emb is None:
+            query_emb = self.embed(query)
+        # Perform similarity search; filters are pushed down into the store
+        return self._search([query], query_emb, top_k, where_clause(filters))[0]
 
+    def retrieve_many(self, queries: List[str], top_k: int, filters=None, query_embs=None) -> List[List[Dict]]:
+        """
+        Retrieve for many queries with one batched encode (unless query_embs
+        is given) and one multi-query search per distinct set of filters.
+        filters is one dict for every query or a list with one per query.
+        Returns each query's hits, in order.
+        """
+        if query_embs is None:
+            query_embs = self.embed_many(queries)
+        query_embs = np.asarray(query_embs)
+        per_query = filters if isinstance(filters, list) else [filters] * len(queries)
+        groups: Dict[str, List[int]] = {}
+        for i, f in enumerate(per_query):
+            groups.setdefault(json.dumps(f or {}, sort_keys=True), []).append(i)
 
-class RAGGenerator:
-    def __init__(self, llm_model: str, api_key: str):
-        self.model = llm_model
+        results = [None] * len(queries)
+        for rows in groups.values():
+            hits = self._search([queries[i] for i in rows], query_embs[rows], top_k, where_clause(per_query[rows[0]]))
+            for i, h in zip(rows, hits):
+                results[i] = h
+        return results
 
-    def generate(self, query: str, contexts: List[Dict]) -> str:
+    def _search(self, queries: List[str], query_embs, top_k: int, where: Dict) -> List[List[Dict]]:
+        if self.mode != "hybrid":
+            with metrics.span("retriever.search"):
+                return self.store.query(query_embs, top_k, where=where)
+        store, lexical = self.store, self.lexical
+        with metrics.span("retriever.search"):
+            dense = store.query(query_embs, top_k * HYBRID_DEPTH, where=where)
+        with metrics.span("retriever.hybrid"):
+            return [self._hybrid(store, lexical, query, hits, top_k, where) for query, hits in zip(queries, dense)]
+
+    @staticmethod
+    def _hybrid(store, lexical, query: str, dense: List[Dict], top_k: int, where: Dict) -> List[Dict]:
         """
-        Build a grounded prompt and call the LLM.
-        Returns the model's answer text.
+        Fuse the dense hits with the query's BM25 ranking by reciprocal rank.
+        Lexical-only hits are fetched from the store, which applies the
+        filters to them too; each hit's score is its fused score.
         """
+        depth = top_k * HYBRID_DEPTH
+        by_id = {hit["id"]: hit for hit in dense}
+        ranking = [cid for cid, _ in lexical.search(query, depth)]
+        by_id.update(store.get([cid for cid in ranking if cid not in by_id], where))
+        fused = rrf_fuse([hit["id"] for hit in dense], [cid for cid in ranking if cid in by_id])
+        return [{**by_id[cid], "score": score} for cid, score in fused[:top_k]]
+
+
+class RAGGenerator:
+    def __init__(self, llm_model: str, api_key: str, context_tokens: int = CONTEXT_TOKENS):
+        # Retrieved chunks are merged where they overlap and packed into
+        # context_tokens prompt tokens (see context_packing); None sends
+        # them verbatim, as before.
+        self.model = llm_model
+        self.context_tokens = context_tokens
+
+    def passages(self, contexts: List[Dict]) -> List[Dict]:
+        """The passages the prompt cites as [1], [2], ...: merged and packed contexts, or the contexts verbatim."""
+        if self.context_tokens is None:
+            return contexts
+        with metrics.span("generator.pack"):
+            return pack_context(contexts, self.model, self.context_tokens)
+
+    def build_prompt(self, query: str, contexts: List[Dict]) -> str:
+        return self.format_prompt(query, self.passages(contexts))
+
+    @metrics.timed("generator.prompt")
+    def format_prompt(self, query: str, passages: List[Dict]) -> str:
+        """Build the grounded prompt, citing each passage as [n] (source_label)."""
         # Build the context block
         context_blocks = []
-        for i, ctx in enumerate(contexts, start=1):
-            src = ctx["metadata"].get("source", "unknown")
-            src_id = ctx["metadata"].get("issue_number", "")
+        for i, ctx in enumerate(passages, start=1):
             context_blocks.append(
-                f"[{i}] ({src}:{src_id}) {ctx['text']}"
+                f"[{i}] ({source_label(ctx['metadata'])}) {ctx['text']}"
             )
         context_str = "\n\n".join(context_blocks)
         #print(f"Fetched context from db: {context_str}")
         # Prompt template
-        prompt = (
+        return (
             "You are a technical support assistant for Apache Solr and Lucene.\n"
             "Answer the user's question based **only** on the following passages:\n\n"
             f"{context_str}\n\n"
@@ -89,14 +180,80 @@ class RAGGenerator:
             "Answer (with citations in [n] format):"
         )
 
+    def generate(self, query: str, contexts: List[Dict]) -> str:
+        """
+        Build a grounded prompt and call the LLM.
+        Returns the model's answer text.
+        """
+        prompt = self.build_prompt(query, contexts)
+
         # Call OpenAI
+        metrics.count("generator.llm_calls")
+        with metrics.span("generator.llm"):
+            response = client_llm.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "system", "content": prompt}],
+                temperature=0.0,
+                max_tokens=512
+            )
+        return response.choices[0].message.content.strip()
+
+    def stream(self, query: str, passages: List[Dict]) -> Iterator[str]:
+        """
+        Call the LLM with streaming on for already packed passages (see
+        passages()) and yield the answer text as it arrives.
+        """
+        metrics.count("generator.llm_calls")
+        start = time.perf_counter()
         response = client_llm.chat.completions.create(
             model=self.model,
-            messages=[{"role": "system", "content": prompt}],
+            messages=[{"role": "system", "content": self.format_prompt(query, passages)}],
             temperature=0.0,
-            max_tokens=512
+            max_tokens=512,
+            stream=True
         )
-        return response.choices[0].message.content.strip()
+        started = False
+        try:
+            for chunk in response:
+                text = chunk.choices[0].delta.content if chunk.choices else None
+                if not started and text:
+                    text = text.lstrip()
+                if text:
+                    if not started:
+                        metrics.observe("generator.llm_first_token", time.perf_counter() - start)
+                    started = True
+                    yield text
+        finally:
+            metrics.observe("generator.llm", time.perf_counter() - start)
+
+
+def source_label(metadata: Dict) -> str:
+    """
+    How a passage is cited: "body:1234" / "comment:1234" for issues, and
+    "mail:<list> "<subject>"" for mailing-list messages, whose issue_number
+    is only a thread hash (the Message-ID stands in for a missing subject).
+    """
+    source = metadata.get("source", "unknown")
+    if source == "mail":
+        subject = metadata.get("subject")
+        return f'mail:{metadata.get("repo", "")} "{subject}"' if subject else \
+            f'mail:{metadata.get("repo", "")} {metadata.get("message_id", "")}'
+    return f"{source}:{metadata.get('issue_number', '')}"
+
+
+def citations(passages: List[Dict]) -> List[Dict]:
+    """What each [n] in an answer refers to: source, issue, citation label, chunk ids and score."""
+    return [
+        {
+            "n": i,
+            "source": p["metadata"].get("source"),
+            "issue_number": p["metadata"].get("issue_number"),
+            "label": source_label(p["metadata"]),
+            "ids": p.get("ids", [p.get("id")]),
+            "score": p.get("score"),
+        }
+        for i, p in enumerate(passages, start=1)
+    ]
 
 
 class RAGPipeline:
@@ -106,38 +263,274 @@ class RAGPipeline:
                  embed_model: str,
                  llm_model: str,
                  api_key: str,
-                 top_k: int = 5):
-        self.retriever = RAGRetriever(persist_dir, collection_name, embed_model)
+                 top_k: int = 5,
+                 mode: str = None,
+                 cache: bool = True):
+        # With cache (see answer_cache.AnswerCache), repeated questions skip
+        # retrieval and the LLM, and reworded ones that retrieve the same
+        # chunks skip the LLM; cache.stats() reports hit rates and time saved.
+        self.retriever = RAGRetriever(persist_dir, collection_name, embed_model, mode=mode)
         self.generator = RAGGenerator(llm_model, api_key)
         self.top_k = top_k
+        self.cache = AnswerCache(persist_dir, collection_name) if cache else None
+
+    def _scope(self, filters: Dict):
+        return (self.top_k, self.retriever.mode, json.dumps(filters or {}, sort_keys=True))
+
+    def _generate(self, query: str, contexts: List[Dict], scope=None, query_vec=None) -> str:
+        start = time.perf_counter()
+        answer = self.generator.generate(query, contexts)
+        if self.cache is not None:
+            chunk_ids = [ctx["id"] for ctx in contexts]
+            self.cache.put(query, scope, query_vec, chunk_ids, answer, time.perf_counter() - start)
+        return answer
 
-    def answer(self, query: str) -> str:
-        contexts = self.retriever.retrieve(query, self.top_k)
-        return self.generator.generate(query, contexts)
+    @metrics.timed("pipeline.answer")
+    def answer(self, query: str, filters: Dict = None) -> str:
+        if self.cache is None:
+            contexts = self.retriever.retrieve(query, self.top_k, filters)
+            return self.generator.generate(query, contexts)
+
+        scope = self._scope(filters)
+        cached = self.cache.lookup(query, scope)
+        if cached is not None:
+            return cached.answer
+        query_emb = self.retriever.embed(query)
+        contexts = self.retriever.retrieve(query, self.top_k, filters, query_emb=query_emb)
+        cached = self.cache.lookup_similar(query, scope, query_emb[0], [ctx["id"] for ctx in contexts])
+        if cached is not None:
+            return cached.answer
+        return self._generate(query, contexts, scope, query_emb[0])
+
+    def answer_stream(self, query: str, filters: Dict = None) -> Iterator[Dict]:
+        """
+        Answer as a stream of events, so a caller can render the answer
+        while it is written:
+          {"type": "sources", "sources": [...]}    first; see citations()
+          {"type": "token", "text": ...}           pieces of the answer
+          {"type": "done", "answer", "cached", "retrieval_s", "ttft_s", "total_s"}
+        ttft_s is the time to the first token. A cached answer arrives as a
+        single token; on an exact hit its sources are re-read by chunk id.
+        """
+        start = time.perf_counter()
+        scope = self._scope(filters)
+        cached = self.cache.lookup(query, scope) if self.cache is not None else None
+        if cached is not None:
+            hits = self.retriever.store.get(cached.chunk_ids)
+            contexts = [hits[cid] for cid in cached.chunk_ids if cid in hits]
+        else:
+            query_emb = self.retriever.embed(query)
+            contexts = self.retriever.retrieve(query, self.top_k, filters, query_emb=query_emb)
+            if self.cache is not None:
+                cached = self.cache.lookup_similar(query, scope, query_emb[0], [ctx["id"] for ctx in contexts])
+        passages = self.generator.passages(contexts)
+        retrieval = time.perf_counter() - start
+        yield {"type": "sources", "sources": citations(passages)}
+
+        if cached is not None:
+            answer, ttft = cached.answer, time.perf_counter() - start
+            yield {"type": "token", "text": answer}
+        else:
+            pieces, ttft = [], None
+            llm_start = time.perf_counter()
+            for text in self.generator.stream(query, passages):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+                pieces.append(text)
+                yield {"type": "token", "text": text}
+            answer = "".join(pieces).rstrip()
+            if self.cache is not None:
+                self.cache.put(query, scope, query_emb[0], [ctx["id"] for ctx in contexts], answer,
+                               time.perf_counter() - llm_start)
+        metrics.observe("pipeline.answer_stream", time.perf_counter() - start)
+        yield {"type": "done", "answer": answer, "cached": cached is not None, "retrieval_s": retrieval,
+               "ttft_s": ttft, "total_s": time.perf_counter() - start}
+
+    def answer_many(self, queries: Iterable, concurrency: int = LLM_CONCURRENCY,
+                    batch_size: int = QUERY_BATCH) -> Iterator[Tuple[int, object]]:
+        """
+        Answer many questions, yielding (position, answer) as answers
+        complete rather than in input order. Each item is a question or a
+        (question, filters) pair, and queries may be a lazy iterable.
+
+        Questions are embedded and searched batch_size at a time while the
+        previous batch's LLM calls run, at most concurrency at once; about
+        one batch of calls is kept queued. Repeats of a question still in
+        flight share its call. A question whose LLM call fails yields the
+        exception in place of its answer, so one failure doesn't end a run.
+        """
+        items = ((i, *(q if isinstance(q, tuple) else (q, None))) for i, q in enumerate(queries))
+        pending: Dict = {}      # future -> (cache key, positions waiting on it)
+        inflight: Dict = {}     # cache key -> future
+
+        def finished(futures):
+            for future in futures:
+                try:
+                    answer = future.result()
+                except Exception as e:
+                    answer = e
+                key, positions = pending.pop(future)
+                inflight.pop(key, None)
+                for i in positions:
+                    yield i, answer
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for batch in iter(lambda: list(islice(items, batch_size)), []):
+                todo = []
+                for i, query, filters in batch:
+                    cached = self.cache.lookup(query, self._scope(filters)) if self.cache is not None else None
+                    if cached is not None:
+                        yield i, cached.answer
+                    else:
+                        todo.append((i, query, filters))
+                if todo:
+                    questions = [query for _, query, _ in todo]
+                    query_embs = self.retriever.embed_many(questions)
+                    results = self.retriever.retrieve_many(
+                        questions, self.top_k, [filters for _, _, filters in todo], query_embs=query_embs
+                    )
+                    for (i, query, filters), query_vec, contexts in zip(todo, query_embs, results):
+                        scope = self._scope(filters)
+                        if self.cache is not None:
+                            cached = self.cache.lookup_similar(query, scope, query_vec, [c["id"] for c in contexts])
+                            if cached is not None:
+                                yield i, cached.answer
+                                continue
+                        key = (scope, normalize_query(query))
+                        future = inflight.get(key)
+                        if future is None:
+                            future = pool.submit(self._generate, query, contexts, scope, query_vec)
+                            inflight[key] = future
+                            pending[future] = (key, [])
+                        pending[future][1].append(i)
+
+                yield from finished([f for f in pending if f.done()])
+                while len(pending) > batch_size:
+                    done, _ = wait(list(pending), return_when=FIRST_COMPLETED)
+                    yield from finished(done)
+            yield from finished(as_completed(list(pending)))
+
+
+def answer_file(pipeline: RAGPipeline, path: str, out, filters: Dict, concurrency: int):
+    """
+    Stream questions from a JSONL file ({"question": ..., "filters": {...}},
+    any other fields are passed through) and write each record back with its
+    "answer", or "error", as soon as it completes. Per-line filters extend
+    the command-line ones.
+    """
+    records: Dict[int, Dict] = {}
+
+    def questions():
+        with open(path, "r") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records[len(records)] = record
+                    yield record["question"], {**filters, **record.get("filters", {})} or None
+
+    errors = 0
+    start = time.perf_counter()
+    progress = tqdm(desc="Answering", unit="question")
+    for i, answer in pipeline.answer_many(questions(), concurrency=concurrency):
+        record = records.pop(i)
+        if isinstance(answer, Exception):
+            record["error"] = f"{type(answer).__name__}: {answer}"
+            errors += 1
+        else:
+            record["answer"] = answer
+        out.write(json.dumps(record) + "\n")
+        out.flush()
+        progress.update(1)
+    progress.close()
+
+    wall = time.perf_counter() - start
+    print(f"Answered {progress.n} questions in {wall:.1f}s ({progress.n / max(wall, 1e-9):.2f}/s), "
+          f"{errors} failed.", file=sys.stderr)
+    if pipeline.cache is not None:
+        print(f"Answer cache: {pipeline.cache.stats()}", file=sys.stderr)
 
 
 def main():
     if OPENAI_API_KEY is None:
         print("Error: Set the environment variable OPENAI_API_KEY", file=sys.stderr)
         sys.exit(1)
-    if len(sys.argv) != 2:
-        print("Usage: python rag_pipeline.py \"Your question here\"", file=sys.stderr)
-        sys.exit(1)
+    parser = argparse.ArgumentParser(
+        description="Answer a Solr/Lucene question from the indexed issues"
+    )
+    parser.add_argument("query", nargs="?", help="Your question")
+    parser.add_argument(
+        "--batch", metavar="JSONL",
+        help='Answer every {"question": ...} line of this file instead, writing JSONL answers as they complete'
+    )
+    parser.add_argument("--output", "-o", help="With --batch, write answers here (default: stdout)")
+    parser.add_argument(
+        "--concurrency", "-c", type=int, default=LLM_CONCURRENCY,
+        help=f"With --batch, parallel LLM calls (default: {LLM_CONCURRENCY}, from $LLM_CONCURRENCY)"
+    )
+    parser.add_argument(
+        "--mode", choices=RETRIEVAL_MODES, default=RETRIEVAL_MODE,
+        help=f"vector, or hybrid: fuse vector and BM25 hits (default: {RETRIEVAL_MODE}, from $RETRIEVAL_MODE)"
+    )
+    parser.add_argument("--repo", help="Only search this repo, e.g. apache/solr")
+    parser.add_argument("--state", choices=("open", "closed"), help="Only search open or closed issues")
+    parser.add_argument("--source", choices=("body", "comment", "mail"),
+                        help="Only search issue bodies, comments or mailing-list messages")
+    parser.add_argument("--label", action="append", dest="labels", help="Only issues with this label (repeatable)")
+    parser.add_argument("--author", help="Only chunks written by this GitHub user")
+    parser.add_argument("--created-after", help="Only issues created on/after this ISO date")
+    parser.add_argument("--updated-after", help="Only issues updated on/after this ISO date")
+    parser.add_argument(
+        "--metrics", metavar="PATH",
+        help="Write timing spans (embed, search, pack, prompt, LLM) and counters here afterwards "
+             "(.prom/.txt: Prometheus text, else JSON)"
+    )
+    args = parser.parse_args()
+    if (args.query is None) == (args.batch is None):
+        parser.error("give either a question or --batch FILE")
 
-    user_query = sys.argv[1].strip()
+    filter_keys = ("repo", "state", "source", "labels", "author", "created_after", "updated_after")
+    filters = {k: v for k, v in vars(args).items() if k in filter_keys and v is not None}
     pipeline = RAGPipeline(
         persist_dir=VECTOR_STORE_DIR,
         collection_name=COLLECTION_NAME,
         embed_model=EMBED_MODEL,
         llm_model=OPENAI_MODEL,
         api_key=OPENAI_API_KEY,
-        top_k=TOP_K
+        top_k=TOP_K,
+        mode=args.mode
     )
-    answer = pipeline.answer(user_query)
-    print("\n=== RAG Answer ===")
-    print(answer)
+    if args.batch:
+        if args.output:
+            with open(args.output, "w") as out:
+                answer_file(pipeline, args.batch, out, filters, args.concurrency)
+        else:
+            answer_file(pipeline, args.batch, sys.stdout, filters, args.concurrency)
+        if args.metrics:
+            metrics.write(args.metrics)
+        return
+
+    # Sources are known once retrieval finishes; the answer prints as it streams in
+    for event in pipeline.answer_stream(args.query.strip(), filters):
+        if event["type"] == "sources":
+            print("\n=== Sources ===")
+            for src in event["sources"]:
+                print(f"[{src['n']}] ({src['label']}) {', '.join(src['ids'])}")
+            print("\n=== RAG Answer ===")
+        elif event["type"] == "token":
+            print(event["text"], end="", flush=True)
+        else:
+            print()
+            ttft = f"{event['ttft_s']:.2f}s" if event["ttft_s"] is not None else "n/a"
+            print(f"(retrieval {event['retrieval_s']:.2f}s, first token {ttft}, total {event['total_s']:.2f}s"
+                  f"{', cached' if event['cached'] else ''})", file=sys.stderr)
+    if args.metrics:
+        metrics.write(args.metrics)
 
 
+"""
+python rag_pipeline.py "How do I tune the filterCache?" --repo apache/solr --state open --updated-after 2023-01-01
+python rag_pipeline.py --batch questions.jsonl --output answers.jsonl --concurrency 16
+"""
 if __name__ == "__main__":
     main()
 
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+# scripts/rag_service.py
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+
+import metrics
+from answer_cache import normalize_query
+from vector_store import where_clause
+from rag_pipeline import (RAGPipeline, citations, VECTOR_STORE_DIR, COLLECTION_NAME, EMBED_MODEL,
+                          OPENAI_MODEL, OPENAI_API_KEY, TOP_K, RETRIEVAL_MODES, RETRIEVAL_MODE)
+
+# ——— CONFIGURATION ———
+HOST            = os.getenv("SERVICE_HOST", "127.0.0.1")
+PORT            = int(os.getenv("SERVICE_PORT", "8000"))
+BATCH_MAX       = int(os.getenv("SERVICE_BATCH_MAX", "64"))           # questions embedded and searched together
+BATCH_WAIT      = float(os.getenv("SERVICE_BATCH_WAIT_MS", "5")) / 1000   # an idle batcher waits this long for company
+LLM_SLOTS       = int(os.getenv("SERVICE_LLM_CONCURRENCY", "64"))     # LLM calls in flight; below the client's keep-alive pool
+AGENT_WORKERS   = int(os.getenv("SERVICE_AGENT_WORKERS", "4"))        # agent runs in parallel (threads)
+BACKLOG         = 1024          # pending connections the listening socket queues
+MAX_BODY        = 1 << 20       # request bodies larger than this are refused
+
+
+class RetrievalBatcher:
+    """
+    Coalesces concurrent requests' retrievals into micro-batches: one
+    length-bucketed encode and one multi-query search (retrieve_many) per
+    batch. A batch closes at max_batch questions or max_wait seconds after
+    its first question, whichever is sooner; while the model is busy the
+    next batch fills up behind it, so the wait only applies when idle. The
+    model runs on a single thread, batch after batch.
+    """
+
+    def __init__(self, pipeline: RAGPipeline, max_batch: int = BATCH_MAX, max_wait: float = BATCH_WAIT):
+        self.pipeline = pipeline
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieval")
+        self._task: Optional[asyncio.Task] = None
+        self.counts = dict.fromkeys(("batches", "questions", "largest"), 0)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def retrieve(self, query: str, filters: Dict) -> Tuple[object, List[Dict]]:
+        """(query vector, hits) for one question, computed in whatever batch it lands in."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, filters, future))
+        return await future
+
+    def _retrieve(self, queries: List[str], filters: List[Dict]):
+        retriever = self.pipeline.retriever
+        query_embs = retriever.embed_many(queries)
+        return query_embs, retriever.retrieve_many(queries, self.pipeline.top_k, filters, query_embs=query_embs)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.counts["batches"] += 1
+            self.counts["questions"] += len(batch)
+            self.counts["largest"] = max(self.counts["largest"], len(batch))
+            metrics.count("service.retrieval_batches")
+            metrics.count("service.batched_questions", len(batch))
+            try:
+                with metrics.span("service.retrieval_batch"):
+                    query_embs, hits = await loop.run_in_executor(
+                        self._executor, self._retrieve, [q for q, _, _ in batch], [f for _, f, _ in batch]
+                    )
+            except Exception as e:
+                if len(batch) == 1:
+                    self._settle(batch[0][2], error=e)
+                    continue
+                # One request's bad input must not fail the others: retry them one at a time
+                metrics.count("service.retrieval_batch_retries")
+                for query, filters, future in batch:
+                    try:
+                        (query_vec,), (contexts,) = await loop.run_in_executor(
+                            self._executor, self._retrieve, [query], [filters])
+                        self._settle(future, (query_vec, contexts))
+                    except Exception as e:
+                        self._settle(future, error=e)
+                continue
+            for (_, _, future), query_vec, contexts in zip(batch, query_embs, hits):
+                self._settle(future, (query_vec, contexts))
+
+    @staticmethod
+    def _settle(future: asyncio.Future, result=None, error: BaseException = None):
+        if future.done():
+            return      # the request went away
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def stats(self) -> Dict:
+        return {**self.counts, "mean": self.counts["questions"] / max(self.counts["batches"], 1)}
+
+
+class Flight:
+    """
+    One in-flight computation's events, replayed to every request that
+    asked the same question: each follower gets all events so far, then
+    the rest as they are emitted.
+    """
+
+    def __init__(self):
+        self.events: List[Dict] = []
+        self.error: Optional[BaseException] = None
+        self.done = False
+        self.task: Optional[asyncio.Task] = None    # the computation; held here so it isn't garbage-collected
+        self._wake = asyncio.Event()
+
+    def emit(self, event: Dict):
+        self.events.append(event)
+        self._signal()
+
+    def finish(self, error: BaseException = None):
+        self.error, self.done = error, True
+        self._signal()
+
+    def _signal(self):
+        wake, self._wake = self._wake, asyncio.Event()
+        wake.set()
+
+    async def follow(self) -> AsyncIterator[Dict]:
+        i = 0
+        while True:
+            wake = self._wake
+            while i < len(self.events):
+                yield self.events[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            if i == len(self.events):
+                await wake.wait()
+
+
+class RAGService:
+    """
+    Answers questions with one resident RAGPipeline: the embedding model,
+    vector store, BM25 index and answer cache are loaded once and shared by
+    every request. Retrieval is micro-batched (RetrievalBatcher), LLM calls
+    go through one AsyncOpenAI client (one keep-alive connection pool) with
+    at most llm_slots in flight, and concurrent requests for the same
+    question (same scope, normalised text) share one computation.
+    """
+
+    def __init__(self, pipeline: RAGPipeline, max_batch: int = BATCH_MAX, max_wait: float = BATCH_WAIT,
+                 llm_slots: int = LLM_SLOTS, agent_workers: int = AGENT_WORKERS):
+        self.pipeline = pipeline
+        self.batcher = RetrievalBatcher(pipeline, max_batch, max_wait)
+        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY)   # honours OPENAI_BASE_URL, e.g. stub_llm.py
+        self.llm_slots = llm_slots
+        self._llm: Optional[asyncio.Semaphore] = None
+        self._flights: Dict[Tuple, Flight] = {}
+        self._agent_pool = ThreadPoolExecutor(max_workers=agent_workers, thread_name_prefix="agent")
+        self._agent_flights: Dict[str, asyncio.Future] = {}
+        self.counts = dict.fromkeys(("requests", "merged", "errors", "llm_calls", "agent_requests"), 0)
+
+    async def start(self, warm: bool = True):
+        self._llm = asyncio.Semaphore(self.llm_slots)
+        self.batcher.start()
+        if warm:
+            # Load the embedding model (and open the store) before the first request pays for it
+            await self.batcher.retrieve("warm up", None)
+
+    def answer_events(self, query: str, filters: Dict = None) -> AsyncIterator[Dict]:
+        """The answer_stream events for a question, shared with identical questions in flight."""
+        self.counts["requests"] += 1
+        key = (self.pipeline._scope(filters), normalize_query(query))
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = self._flights[key] = Flight()
+            flight.task = asyncio.get_running_loop().create_task(self._compute(key, query, filters, flight))
+        else:
+            self.counts["merged"] += 1
+        return flight.follow()
+
+    async def _compute(self, key: Tuple, query: str, filters: Dict, flight: Flight):
+        try:
+            await self._answer(query, filters, flight)
+            flight.finish()
+        except Exception as e:
+            self.counts["errors"] += 1
+            flight.finish(e)
+        finally:
+            self._flights.pop(key, None)
+
+    async def _answer(self, query: str, filters: Dict, flight: Flight):
+        """RAGPipeline.answer_stream, with batched retrieval and an async LLM call."""
+        loop = asyncio.get_running_loop()
+        pipeline = self.pipeline
+        start = time.perf_counter()
+        scope = pipeline._scope(filters)
+        cached = pipeline.cache.lookup(query, scope) if pipeline.cache is not None else None
+        if cached is not None:
+            hits = await loop.run_in_executor(None, pipeline.retriever.store.get, cached.chunk_ids)
+            contexts = [hits[cid] for cid in cached.chunk_ids if cid in hits]
+        else:
+            query_vec, contexts = await self.batcher.retrieve(query, filters)
+            if pipeline.cache is not None:
+                cached = pipeline.cache.lookup_similar(query, scope, query_vec, [ctx["id"] for ctx in contexts])
+        passages = await loop.run_in_executor(None, pipeline.generator.passages, contexts)
+        retrieval = time.perf_counter() - start
+        flight.emit({"type": "sources", "sources": citations(passages)})
+
+        if cached is not None:
+            answer, ttft = cached.answer, time.perf_counter() - start
+            flight.emit({"type": "token", "text": answer})
+        else:
+            pieces, ttft = [], None
+            async with self._llm:
+                self.counts["llm_calls"] += 1
+                llm_start = time.perf_counter()
+                response = await self.client.chat.completions.create(
+                    model=pipeline.generator.model,
+                    messages=[{"role": "system", "content": pipeline.generator.format_prompt(query, passages)}],
+                    temperature=0.0,
+                    max_tokens=512,
+                    stream=True
+                )
+                async for chunk in response:
+                    text = chunk.choices[0].delta.content if chunk.choices else None
+                    if not pieces and text:
+                        text = text.lstrip()
+                    if text:
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                            metrics.observe("service.llm_first_token", time.perf_counter() - llm_start)
+                        pieces.append(text)
+                        flight.emit({"type": "token", "text": text})
+            answer = "".join(pieces).rstrip()
+            metrics.observe("service.llm", time.perf_counter() - llm_start)
+            if pipeline.cache is not None:
+                pipeline.cache.put(query, scope, query_vec, [ctx["id"] for ctx in contexts], answer,
+                                   time.perf_counter() - llm_start)
+        metrics.observe("service.answer", time.perf_counter() - start)
+        flight.emit({"type": "done", "answer": answer, "cached": cached is not None, "retrieval_s": retrieval,
+                     "ttft_s": ttft, "total_s": time.perf_counter() - start})
+
+    async def answer(self, query: str, filters: Dict = None) -> Dict:
+        """The whole answer: the "done" event plus the sources."""
+        result = {}
+        async for event in self.answer_events(query, filters):
+            if event["type"] == "sources":
+                result["sources"] = event["sources"]
+            elif event["type"] == "done":
+                result.update({k: v for k, v in event.items() if k != "type"})
+        return result
+
+    async def ask_agent(self, query: str) -> Dict:
+        """Run the agent (built once, in agent_service) on a worker thread; identical questions share a run."""
+        self.counts["agent_requests"] += 1
+        key = normalize_query(query)
+        future = self._agent_flights.get(key)
+        if future is None:
+            from agent_service import run_agent
+            start = time.perf_counter()
+            future = asyncio.get_running_loop().run_in_executor(self._agent_pool, run_agent, query)
+            self._agent_flights[key] = future
+            future.add_done_callback(lambda _: self._agent_flights.pop(key, None))
+        else:
+            self.counts["merged"] += 1
+            start = time.perf_counter()
+        answer = await asyncio.shield(future)
+        return {"answer": answer, "total_s": time.perf_counter() - start}
+
+    def stats(self) -> Dict:
+        stats = {**self.counts, "in_flight": len(self._flights), "batches": self.batcher.stats()}
+        if self.pipeline.cache is not None:
+            stats["cache"] = self.pipeline.cache.stats()
+        return stats
+
+
+# ——— HTTP ———
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+def _head(status: int, headers: Dict[str, str]) -> bytes:
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"] + [f"{k}: {v}" for k, v in headers.items()]
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(writer: asyncio.StreamWriter, status: int, body, keep_alive: bool):
+    data = json.dumps(body).encode("utf-8")
+    writer.write(_head(status, {"Content-Type": "application/json", "Content-Length": str(len(data)),
+                                "Connection": "keep-alive" if keep_alive else "close"}) + data)
+    await writer.drain()
+
+
+async def _send_text(writer: asyncio.StreamWriter, text: str, keep_alive: bool):
+    data = text.encode("utf-8")
+    writer.write(_head(200, {"Content-Type": "text/plain; version=0.0.4", "Content-Length": str(len(data)),
+                             "Connection": "keep-alive" if keep_alive else "close"}) + data)
+    await writer.drain()
+
+
+async def _send_events(writer: asyncio.StreamWriter, events: AsyncIterator[Dict]):
+    """Server-sent events, one per answer_stream event; the connection closes after "done"."""
+    writer.write(_head(200, {"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                             "Connection": "close"}))
+    try:
+        async for event in events:
+            writer.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            await writer.drain()
+    except Exception as e:
+        writer.write(f"data: {json.dumps({'type': 'error', 'error': f'{type(e).__name__}: {e}'})}\n\n".encode("utf-8"))
+        await writer.drain()
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    """(method, path, headers, body) of the next request on the connection, or None at EOF."""
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    parts = line.decode("latin-1").split()
+    if len(parts) != 3:
+        raise ValueError("malformed request line")
+    method, path, _ = parts
+    headers = {}
+    while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY:
+        raise ValueError(f"body larger than {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method, path, headers, body
+
+
+def _question(body: bytes) -> Tuple[str, Optional[Dict]]:
+    """
+    (question, filters) from a {"question": ..., "filters": {...}} request
+    body. Raises ValueError if the body is malformed or the filters are not
+    ones the stores understand, so a bad request gets a 400 before it can
+    join a retrieval batch.
+    """
+    try:
+        payload = json.loads(body or b"{}")
+        question, filters = str(payload["question"]).strip(), payload.get("filters") or None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        raise ValueError('expected {"question": ..., "filters": {...}}')
+    if filters is not None:
+        if not isinstance(filters, dict):
+            raise ValueError("filters must be an object")
+        try:
+            where_clause(filters)
+        except (ValueError, TypeError, AttributeError) as e:
+            raise ValueError(f"bad filters: {e}")
+    return question, filters
+
+
+def make_handler(service: RAGService):
+    """
+    Routes:
+      POST /answer         {"question", "filters"?} -> {"answer", "sources", "cached", timings}
+      POST /answer/stream  same body -> server-sent answer_stream events
+      POST /agent          {"question"} -> {"answer", "total_s"}
+      GET  /stats          counters, batch sizes and cache hit rates
+      GET  /metrics        timing spans and counters (see metrics.py) in Prometheus text format
+    Connections are kept alive between JSON requests.
+    """
+    async def route(method: str, path: str, body: bytes) -> Tuple[int, Dict]:
+        if path == "/stats":
+            return 200, service.stats()
+        if path not in ("/answer", "/answer/stream", "/agent"):
+            return 404, {"error": f"no route {path}"}
+        if method != "POST":
+            return 405, {"error": "use POST"}
+        try:
+            question, filters = _question(body)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        try:
+            if path == "/agent":
+                return 200, await service.ask_agent(question)
+            return 200, await service.answer(question, filters)
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except ValueError as e:
+                    await _send_json(writer, 400, {"error": str(e)}, False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                keep_alive = headers.get("connection", "").lower() != "close"
+                path = path.split("?", 1)[0].rstrip("/")
+                if path == "/metrics":
+                    await _send_text(writer, metrics.prometheus(), keep_alive)
+                    if not keep_alive:
+                        break
+                    continue
+                if path == "/answer/stream" and method == "POST":
+                    try:
+                        question, filters = _question(body)
+                    except ValueError:
+                        pass        # route() answers it with a 400
+                    else:
+                        await _send_events(writer, service.answer_events(question, filters))
+                        break
+                status, result = await route(method, path, body)
+                await _send_json(writer, status, result, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(service: RAGService, host: str, port: int, warm_agent: bool = False):
+    start = time.perf_counter()
+    await service.start()
+    if warm_agent:
+        from agent_service import warm_agent as warm
+        warm()
+    server = await asyncio.start_server(make_handler(service), host, port, backlog=BACKLOG)
+    print(f"RAG service on http://{host}:{port} (ready in {time.perf_counter() - start:.1f}s)", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Long-lived HTTP service answering Solr questions with resident models, batched retrieval "
+                    "and pooled LLM connections"
+    )
+    parser.add_argument("--host", default=HOST, help=f"Interface to listen on (default: {HOST})")
+    parser.add_argument("--port", "-p", type=int, default=PORT, help=f"Port to listen on (default: {PORT})")
+    parser.add_argument("--mode", choices=RETRIEVAL_MODES, default=RETRIEVAL_MODE,
+                        help=f"Retrieval mode (default: {RETRIEVAL_MODE})")
+    parser.add_argument("--batch-max", type=int, default=BATCH_MAX,
+                        help=f"Questions embedded and searched together (default: {BATCH_MAX})")
+    parser.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT * 1000,
+                        help=f"How long an idle batcher waits for more questions (default: {BATCH_WAIT * 1000:g})")
+    parser.add_argument("--llm-concurrency", type=int, default=LLM_SLOTS,
+                        help=f"LLM calls in flight (default: {LLM_SLOTS})")
+    parser.add_argument("--agent", action="store_true", help="Build the agent at startup instead of on first /agent request")
+    args = parser.parse_args()
+    if OPENAI_API_KEY is None:
+        print("Error: Set the environment variable OPENAI_API_KEY", file=sys.stderr)
+        sys.exit(1)
+
+    pipeline = RAGPipeline(
+        persist_dir=VECTOR_STORE_DIR,
+        collection_name=COLLECTION_NAME,
+        embed_model=EMBED_MODEL,
+        llm_model=OPENAI_MODEL,
+        api_key=OPENAI_API_KEY,
+        top_k=TOP_K,
+        mode=args.mode
+    )
+    service = RAGService(pipeline, args.batch_max, args.batch_wait_ms / 1000, args.llm_concurrency)
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.agent))
+    except KeyboardInterrupt:
+        pass
+
+
+"""
+python rag_service.py --port 8000
+curl -s localhost:8000/answer -d '{"question": "How do I tune the filterCache?", "filters": {"repo": "apache/solr"}}'
+curl -sN localhost:8000/answer/stream -d '{"question": "How do I tune the filterCache?"}'
+"""
+if __name__ == "__main__":
+    main()
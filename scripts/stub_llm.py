@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# scripts/stub_llm.py
+
+import json
+import time
+import argparse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# ——— CONFIGURATION ———
+PORT         = 8001
+TTFT         = 0.5       # seconds before the first token
+TOKEN_DELAY  = 0.02      # seconds between tokens
+ANSWER       = ("Increase the filterCache size in solrconfig.xml and watch the hit ratio in the admin UI [1]. "
+                "Autowarming copies the most used entries into the new searcher after a commit [2].")
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Answers POST /v1/chat/completions like the OpenAI API, streamed (SSE)
+    or not, with a canned answer and configurable latency. Enough for
+    RAGGenerator, ChatOpenAI and the batch and streaming paths.
+    """
+    ttft = TTFT
+    token_delay = TOKEN_DELAY
+    answer = ANSWER
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"no route {self.path}"}})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        model = request.get("model", "stub")
+        prompt = " ".join(str(m.get("content", "")) for m in request.get("messages", []))
+        words = self.answer.split(" ")
+        base = {"id": "chatcmpl-stub", "created": int(time.time()), "model": model}
+        time.sleep(self.ttft)
+
+        if not request.get("stream"):
+            self._send_json(200, {
+                **base, "object": "chat.completion",
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": self.answer}}],
+                "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(words),
+                          "total_tokens": len(prompt.split()) + len(words)},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.token_delay)
+            chunk = {**base, "object": "chat.completion.chunk",
+                     "choices": [{"index": 0, "finish_reason": None,
+                                  "delta": {"content": word if i == 0 else " " + word}}]}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        done = {**base, "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "finish_reason": "stop", "delta": {}}]}
+        self.wfile.write(f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local OpenAI-compatible chat endpoint with a canned answer, for testing without an API key"
+    )
+    parser.add_argument("--port", "-p", type=int, default=PORT, help=f"Port to listen on (default: {PORT})")
+    parser.add_argument("--ttft", type=float, default=TTFT, help=f"Seconds before the first token (default: {TTFT})")
+    parser.add_argument("--token-delay", type=float, default=TOKEN_DELAY,
+                        help=f"Seconds between streamed tokens (default: {TOKEN_DELAY})")
+    args = parser.parse_args()
+
+    StubHandler.ttft, StubHandler.token_delay = args.ttft, args.token_delay
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    print(f"Stub LLM on http://127.0.0.1:{args.port}/v1 (set OPENAI_BASE_URL to this)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+"""
+python stub_llm.py --port 8001 --ttft 0.5
+OPENAI_BASE_URL=http://127.0.0.1:8001/v1 OPENAI_API_KEY=stub python rag_pipeline.py "How do I tune the filterCache?"
+"""
+if __name__ == "__main__":
+    main()
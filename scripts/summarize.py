@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# scripts/summarize.py
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+from context_packing import get_encoding
+import metrics
+
+# ——— CONFIGURATION ———
+SUMMARY_MODEL       = os.getenv("OPENAI_MODEL", "gpt-4")
+PIECE_TOKENS        = int(os.getenv("SUMMARY_PIECE_TOKENS", "2000"))   # input tokens per map (and reduce) call
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))       # parallel LLM calls
+SUMMARY_CACHE_SIZE  = int(os.getenv("SUMMARY_CACHE_SIZE", "4096"))     # partial summaries kept, LRU
+BOUNDARY_EVERY      = 16        # on average, one line in this many may end a piece once it is half full
+
+MAP_TEMPLATE = "Summarize the following for a Solr engineer:\n\n{text}\n\nSummary:"
+REDUCE_TEMPLATE = (
+    "The following are summaries of consecutive parts of one text. Combine them into a single summary "
+    "for a Solr engineer, keeping errors, versions, config keys and fixes:\n\n{text}\n\nSummary:"
+)
+
+
+def _boundary(line: str) -> bool:
+    """Whether a piece may end after this line; decided by the line's content alone."""
+    return hashlib.blake2b(line.encode("utf-8"), digest_size=2).digest()[0] % BOUNDARY_EVERY == 0
+
+
+def split_text(text: str, model: str = SUMMARY_MODEL, budget: int = PIECE_TOKENS) -> List[str]:
+    """
+    Split text into pieces of at most budget tokens, on line breaks. Once
+    a piece is half full it ends after any line that hashes to a boundary,
+    so where pieces end depends on the lines around them rather than on
+    where the text starts: two overlapping log excerpts cut the shared part
+    the same way and their pieces hit the same cache entries. A single line
+    longer than budget is cut by tokens.
+    """
+    enc = get_encoding(model)
+    pieces, lines, used = [], [], 0
+    for line in text.splitlines(keepends=True):
+        tokens = enc.encode(line)
+        if len(tokens) > budget:
+            if lines:
+                pieces.append("".join(lines))
+                lines, used = [], 0
+            pieces.extend(enc.decode(tokens[i:i + budget]) for i in range(0, len(tokens), budget))
+            continue
+        if used + len(tokens) > budget:
+            pieces.append("".join(lines))
+            lines, used = [], 0
+        lines.append(line)
+        used += len(tokens)
+        if used >= budget // 2 and _boundary(line):
+            pieces.append("".join(lines))
+            lines, used = [], 0
+    if lines:
+        pieces.append("".join(lines))
+    return pieces
+
+
+def group_summaries(summaries: List[str], model: str = SUMMARY_MODEL, budget: int = PIECE_TOKENS) -> List[List[str]]:
+    """
+    Pack partial summaries, whole and in order, into groups of up to budget
+    tokens for one reduce call each, ending groups at content-defined
+    boundaries as split_text does. Every group but a lone oversized summary
+    holds at least two, so each reduce round shrinks the list.
+    """
+    enc = get_encoding(model)
+    groups, group, used = [], [], 0
+    for summary in summaries:
+        tokens = len(enc.encode(summary))
+        if group and used + tokens > budget and len(group) > 1:
+            groups.append(group)
+            group, used = [], 0
+        group.append(summary)
+        used += tokens
+        if len(group) > 1 and used >= budget // 2 and _boundary(summary):
+            groups.append(group)
+            group, used = [], 0
+    if group:
+        if len(group) == 1 and groups:
+            groups[-1].append(group[0])
+        else:
+            groups.append(group)
+    return groups
+
+
+class MapReduceSummarizer:
+    """
+    Summarises text of any length with a complete(prompt) -> str function.
+    Text that fits in one piece takes one call. Longer text is split
+    (split_text), the pieces are summarised in parallel (map), and the
+    partial summaries are grouped (group_summaries) and summarised again
+    until one summary is left (reduce).
+
+    Every partial summary is cached by a hash of its prompt, so summarising
+    text that overlaps earlier input (a wider log window, a thread with a
+    new comment) only calls the LLM for the pieces that changed. Identical
+    pieces within one input are summarised once.
+    """
+
+    def __init__(self, complete: Callable[[str], str], model: str = SUMMARY_MODEL,
+                 budget: int = PIECE_TOKENS, concurrency: int = SUMMARY_CONCURRENCY,
+                 cache_size: int = SUMMARY_CACHE_SIZE):
+        self.complete = complete
+        self.model = model
+        self.budget = budget
+        self.concurrency = concurrency
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counts = dict.fromkeys(("calls", "cache_hits", "map_pieces", "reduce_rounds"), 0)
+
+    def _key(self, prompt: str) -> bytes:
+        return hashlib.blake2b(f"{self.model}\0{prompt}".encode("utf-8"), digest_size=16).digest()
+
+    def _lookup(self, key: bytes):
+        with self._lock:
+            summary = self._cache.get(key)
+            if summary is not None:
+                self._cache.move_to_end(key)
+                self.counts["cache_hits"] += 1
+            return summary
+
+    def _store(self, key: bytes, summary: str):
+        with self._lock:
+            self._cache[key] = summary
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _summarize_all(self, template: str, texts: List[str]) -> List[str]:
+        """Summaries of texts in order: cached ones looked up, the rest in parallel."""
+        prompts = [template.format(text=t) for t in texts]
+        keys = [self._key(p) for p in prompts]
+        done: Dict[bytes, str] = {}
+        todo: Dict[bytes, str] = {}
+        for key, prompt in zip(keys, prompts):
+            if key in done or key in todo:
+                continue
+            summary = self._lookup(key)
+            if summary is None:
+                todo[key] = prompt
+            else:
+                done[key] = summary
+
+        def call(key: bytes) -> str:
+            with metrics.span("summarizer.llm"):
+                summary = self.complete(todo[key]).strip()
+            self._store(key, summary)
+            return summary
+
+        if todo:
+            with self._lock:
+                self.counts["calls"] += len(todo)
+            with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(todo)))) as pool:
+                done.update(zip(todo, pool.map(call, todo)))
+        return [done[k] for k in keys]
+
+    def summarize(self, text: str) -> str:
+        pieces = split_text(text, self.model, self.budget)
+        if not pieces:
+            return ""
+        with self._lock:
+            self.counts["map_pieces"] += len(pieces)
+        summaries = self._summarize_all(MAP_TEMPLATE, pieces)
+        while len(summaries) > 1:
+            with self._lock:
+                self.counts["reduce_rounds"] += 1
+            groups = group_summaries(summaries, self.model, self.budget)
+            summaries = self._summarize_all(REDUCE_TEMPLATE, ["\n\n".join(g) for g in groups])
+        return summaries[0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self.counts, "cached": len(self._cache)}
+
+
+def fake_llm(latency: float = 0.2, words: int = 12) -> Callable[[str], str]:
+    """
+    A deterministic stand-in for the LLM: sleeps latency seconds, then
+    returns the first words of the prompt's text plus a digest of it, so
+    equal prompts give equal summaries and summaries are much shorter than
+    their input. For testing and benchmarking without an API key.
+    """
+    def complete(prompt: str) -> str:
+        time.sleep(latency)
+        text = prompt.split("\n\n", 1)[-1].rsplit("\n\nSummary:", 1)[0]
+        digest = hashlib.blake2b(text.encode("utf-8"), digest_size=4).hexdigest()
+        return f"[{digest}] " + " ".join(text.split()[:words])
+    return complete
+
+
+def openai_llm(model: str = SUMMARY_MODEL) -> Callable[[str], str]:
+    from openai import OpenAI
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+    def complete(prompt: str) -> str:
+        resp = client.chat.completions.create(
+            model=model, messages=[{"role": "user", "content": prompt}], temperature=0.0
+        )
+        return resp.choices[0].message.content
+    return complete
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Summarize a long text (issue thread, log excerpt) with parallel map-reduce LLM calls"
+    )
+    parser.add_argument("path", nargs="+", help="Text files to summarize, one after another ('-' for stdin)")
+    parser.add_argument("--budget", type=int, default=PIECE_TOKENS,
+                        help=f"Input tokens per LLM call (default: {PIECE_TOKENS})")
+    parser.add_argument("--concurrency", "-c", type=int, default=SUMMARY_CONCURRENCY,
+                        help=f"Parallel LLM calls (default: {SUMMARY_CONCURRENCY})")
+    parser.add_argument("--fake-latency", type=float, default=None,
+                        help="Use the deterministic fake LLM with this many seconds per call instead of OpenAI")
+    args = parser.parse_args()
+
+    complete = fake_llm(args.fake_latency) if args.fake_latency is not None else openai_llm()
+    summarizer = MapReduceSummarizer(complete, budget=args.budget, concurrency=args.concurrency)
+    for path in args.path:
+        text = sys.stdin.read() if path == "-" else open(path, encoding="utf-8", errors="replace").read()
+        start = time.perf_counter()
+        summary = summarizer.summarize(text)
+        print(f"== {path} ({time.perf_counter() - start:.2f}s)\n{summary}\n")
+    print(summarizer.stats())
+
+
+"""
+python summarize.py ../data/thread.txt
+python summarize.py solr.log.excerpt1 solr.log.excerpt2 --fake-latency 0.2 --budget 500
+"""
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# scripts/synth_issues.py
+
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Tuple
+
+from issue_store import IssueStore
+
+# ——— CONFIGURATION ———
+OUTPUT_DIR = "../data/synthetic_issues"
+REPOS      = ("apache/solr", "apache/lucene-solr")
+START_DATE = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+COMPONENTS = ["filterCache", "queryResultCache", "documentCache", "SolrCloud", "ZooKeeper", "DataImportHandler",
+              "faceting", "highlighting", "spellcheck", "suggester", "MoreLikeThis", "streaming expressions",
+              "the JSON Facet API", "atomic updates", "TLOG replicas", "PULL replicas", "the Overseer",
+              "CDCR", "the Admin UI", "autoscaling", "schema API", "managed resources", "LTR reranking",
+              "dense vector search", "the collapsing query parser", "join queries", "block join", "grouping"]
+CONFIG_KEYS = ["autowarmCount", "maxWarmingSearchers", "ramBufferSizeMB", "mergePolicyFactory",
+               "autoCommit maxTime", "autoSoftCommit maxTime", "zkClientTimeout", "maxBooleanClauses",
+               "useColdSearcher", "hl.maxAnalyzedChars", "facet.limit", "rows", "timeAllowed", "shards.tolerant"]
+EXCEPTIONS = ["java.lang.OutOfMemoryError: Java heap space", "org.apache.solr.common.SolrException: undefined field",
+              "java.lang.IllegalStateException: Too many warming searchers",
+              "org.apache.zookeeper.KeeperException$SessionExpiredException", "java.lang.NullPointerException",
+              "org.apache.lucene.index.CorruptIndexException", "java.net.SocketTimeoutException",
+              "org.apache.solr.common.SolrException: Could not load conf for core"]
+CLASSES = ["SolrCore", "SolrIndexSearcher", "UpdateHandler", "DirectUpdateHandler2", "ZkController",
+           "HttpSolrCall", "FacetComponent", "QueryComponent", "DistributedUpdateProcessor", "RecoveryStrategy"]
+VERBS = ["fails", "hangs", "leaks memory", "returns wrong results", "is slow", "throws an exception",
+         "ignores its configuration", "breaks after upgrade", "deadlocks", "loses updates"]
+VERSIONS = ["6.6.6", "7.7.3", "8.4.1", "8.11.2", "9.0.0", "9.4.1", "9.6.0"]
+LABELS = ["bug", "improvement", "new feature", "documentation", "performance", "test", "cloud", "search"]
+AUTHORS = [f"user{i}" for i in range(300)]
+QUESTION_TEMPLATES = ["Why does {c} {v}?", "How do I tune {k} for {c}?", "What causes {e}?",
+                      "Is {c} supported in SolrCloud {ver}?", "How can I fix {e} in {cls}?",
+                      "What is a good value for {k}?", "{c} {v} after upgrading to {ver}, what changed?"]
+
+
+def _paragraph(rng: random.Random) -> str:
+    """A few sentences of issue-like prose: components, config keys, versions, sometimes a stack trace."""
+    c, k, cls = rng.choice(COMPONENTS), rng.choice(CONFIG_KEYS), rng.choice(CLASSES)
+    v1, v2 = sorted(rng.sample(VERSIONS, 2))
+    sentences = [
+        f"When {c} is enabled, {cls} {rng.choice(VERBS)} under load.",
+        f"Setting {k} to {rng.choice([0, 1, 2, 16, 128, 512, 1024, 4096])} did not help.",
+        f"We see this in production with about {rng.randint(1, 900)} million documents across "
+        f"{rng.randint(1, 64)} shards and {rng.randint(1, 3)} replicas.",
+        f"The problem started after we upgraded from {v1} to {v2}.",
+        f"See SOLR-{rng.randint(1000, 17000)} for a related discussion of {rng.choice(COMPONENTS)}.",
+        f"The logs show the query taking QTime={rng.randint(50, 60000)} with {k} at its default.",
+    ]
+    text = " ".join(rng.sample(sentences, rng.randint(3, len(sentences))))
+    if rng.random() < 0.3:
+        frames = "\n".join(f"\tat org.apache.solr.{rng.choice(['core', 'search', 'update', 'cloud'])}."
+                           f"{rng.choice(CLASSES)}.{rng.choice(['execute', 'handle', 'process', 'open'])}"
+                           f"({rng.choice(CLASSES)}.java:{rng.randint(10, 3000)})" for _ in range(rng.randint(3, 12)))
+        text += f"\n\n{rng.choice(EXCEPTIONS)}\n{frames}"
+    return text
+
+
+def _text(rng: random.Random, mean_paragraphs: float) -> str:
+    return "\n\n".join(_paragraph(rng) for _ in range(max(1, int(rng.expovariate(1 / mean_paragraphs)) + 1)))
+
+
+def synth_issue(number: int, rng: random.Random) -> Dict:
+    """One issue in the shape fetch_github_issues.py stores; body and comment lengths are long-tailed."""
+    created = START_DATE + timedelta(minutes=rng.randint(0, 10 * 365 * 24 * 60))
+    updated = created + timedelta(minutes=rng.randint(0, 365 * 24 * 60))
+    comments = [{"id": number * 1000 + i, "author": rng.choice(AUTHORS), "body": _text(rng, 1.5),
+                 "created_at": (created + timedelta(hours=i + 1)).isoformat()}
+                for i in range(int(rng.expovariate(1 / 3)))]
+    return {
+        "number": number,
+        "title": f"{rng.choice(COMPONENTS)} {rng.choice(VERBS)} with {rng.choice(CONFIG_KEYS)}",
+        "body": _text(rng, 3),
+        "state": rng.choice(["open", "closed", "closed"]),
+        "labels": rng.sample(LABELS, rng.randint(0, 3)),
+        "author": rng.choice(AUTHORS),
+        "created_at": created.isoformat().replace("+00:00", "Z"),
+        "updated_at": updated.isoformat().replace("+00:00", "Z"),
+        "comments": comments,
+    }
+
+
+def synth_issues(n: int, seed: int = 0) -> Iterator[Tuple[str, Dict]]:
+    """(repo, issue) for n synthetic issues; the same seed always gives the same corpus."""
+    rng = random.Random(seed)
+    for number in range(1, n + 1):
+        yield rng.choice(REPOS), synth_issue(number, rng)
+
+
+def synth_questions(n: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed + 1)
+    return [rng.choice(QUESTION_TEMPLATES).format(
+        c=rng.choice(COMPONENTS), v=rng.choice(VERBS), k=rng.choice(CONFIG_KEYS), e=rng.choice(EXCEPTIONS),
+        cls=rng.choice(CLASSES), ver=rng.choice(VERSIONS)) for _ in range(n)]
+
+
+def write_store(output_dir: str, n: int, seed: int = 0) -> int:
+    """Write n synthetic issues into an issue store at output_dir, which chunk_issues.py reads like the real one."""
+    with IssueStore(output_dir) as store:
+        for repo, issue in synth_issues(n, seed):
+            store.put(repo, issue)
+    return n
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate a reproducible synthetic Solr-issue corpus for benchmarks"
+    )
+    parser.add_argument("--output-dir", "-o", default=OUTPUT_DIR, help=f"Issue store to write (default: {OUTPUT_DIR})")
+    parser.add_argument("--issues", "-n", type=int, default=1000, help="Issues to generate (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed; the same seed gives the same corpus (default: 0)")
+    args = parser.parse_args()
+    write_store(args.output_dir, args.issues, args.seed)
+    print(f"Wrote {args.issues} synthetic issues to {args.output_dir}")
+
+
+"""
+python synth_issues.py --issues 5000 --seed 0 --output-dir ../data/synthetic_issues
+python chunk_issues.py --input-dir ../data/synthetic_issues --output-dir ../data/synthetic_chunks
+"""
+if __name__ == "__main__":
+    main()
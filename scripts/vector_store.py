@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+# scripts/vector_store.py
+
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from tqdm import tqdm
+
+# ——— CONFIGURATION ———
+PERSIST_DIR     = "../vector_store"
+COLLECTION_NAME = "solr_support"
+EMBED_MODEL     = "all-mpnet-base-v2"
+STORES          = ("chroma", "mmap")
+VECTOR_STORE    = os.getenv("VECTOR_STORE", "chroma")   # which store the retrievers open
+MMAP_SUBDIR     = "mmap"           # <persist_dir>/mmap/<collection>/ holds the memory-mapped store
+DTYPES          = ("float16", "int8")
+BLOCK_ROWS      = 16384            # rows widened to float32 at a time while scanning
+NPROBE          = 8                # IVF lists scanned per query
+RESCORE_FACTOR  = 4                # top_k × this candidates are re-scored in float32
+EXPORT_BATCH    = 1000             # chunks read from Chroma per page
+KMEANS_ITERS    = 10
+KMEANS_SAMPLE   = 64               # training vectors per IVF list
+EXACT_ROWS      = 50000            # a filter leaving at most this many rows skips IVF and scans them all
+LABEL_PREFIX    = "label:"         # per-label metadata flag, e.g. {"label:bug": True}
+FILTER_FIELDS   = {                # metadata the mmap store keeps as columns: categorical or numeric
+    "repo": "cat", "state": "cat", "source": "cat", "author": "cat",
+    "issue_number": "num", "created_at": "num", "updated_at": "num",
+}
+
+# Files of an mmap store
+STORE_FILE   = "store.json"        # dtype, dim, count, nlist, whether full.npy exists
+VECTORS      = "vectors.npy"       # float16, or int8 scaled per row by scales.npy
+SCALES       = "scales.npy"
+FULL         = "full.npy"          # float32 copies for re-scoring (optional)
+DOCS         = "docs.jsonl"        # {"id", "text", "metadata"} per row
+DOC_OFFSETS  = "docs_offsets.npy"  # byte offset of row i in docs.jsonl; count + 1 entries
+CENTROIDS    = "centroids.npy"     # IVF only
+LISTS        = "lists.npy"         # row numbers grouped by IVF list
+LIST_OFFSETS = "list_offsets.npy"  # start of list l in lists.npy; nlist + 1 entries
+COLUMN       = "col_{}.npy"        # per filter field: int32 codes into store.json's vocab, or float64
+LABEL_ROWS   = "label_rows.npy"    # rows carrying each label in store.json's label list, concatenated
+LABEL_OFFSETS = "label_offsets.npy"
+IDS          = "ids.npy"           # chunk ids, sorted, for lookups by id
+ID_ROWS      = "id_rows.npy"       # row of each id in ids.npy
+
+_lock   = threading.Lock()
+_stores: Dict[Tuple[str, str, str], Tuple[Optional[int], "VectorStore"]] = {}
+
+
+def _normalize(vectors) -> np.ndarray:
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    best = np.argpartition(-scores, k - 1)[:k]
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+def to_timestamp(value) -> int:
+    """Epoch seconds for an ISO 8601 date or datetime (naive means UTC), or a number."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+
+def where_clause(filters: Dict = None) -> Optional[Dict]:
+    """
+    Turn retriever filters into a Chroma-style where clause, which both
+    stores evaluate before ranking:
+        repo, state, source, author, issue_number: a value or a list of values
+        labels: labels a chunk must all carry
+        created_after, created_before, updated_after, updated_before: ISO dates
+    e.g. {"repo": "apache/solr", "state": "open", "updated_after": "2023-06-01"}
+    """
+    if not filters:
+        return None
+    ranges = {"created_after": ("created_at", "$gte"), "created_before": ("created_at", "$lt"),
+              "updated_after": ("updated_at", "$gte"), "updated_before": ("updated_at", "$lt")}
+    unknown = set(filters) - set(FILTER_FIELDS) - set(ranges) - {"labels"}
+    if unknown:
+        raise ValueError(f"Unknown filter(s) {sorted(unknown)}")
+    clauses = []
+    for key in ("repo", "state", "source", "author", "issue_number"):
+        value = filters.get(key)
+        if isinstance(value, (list, tuple, set)):
+            clauses.append({key: {"$in": list(value)}})
+        elif value is not None:
+            clauses.append({key: {"$eq": value}})
+    for label in filters.get("labels") or []:
+        clauses.append({LABEL_PREFIX + label: {"$eq": True}})
+    for key, (field, op) in ranges.items():
+        if filters.get(key) is not None:
+            clauses.append({field: {op: to_timestamp(filters[key])}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class VectorStore:
+    """
+    What the retrievers search. query() takes a (queries × dim) array and,
+    like Chroma's query, returns one list of hits per query; each hit is
+    {"id", "text", "metadata", "score"}, score being cosine similarity.
+    `where` (see where_clause) restricts the search to matching chunks.
+    """
+
+    def query(self, embeddings, top_k: int, where: Dict = None) -> List[List[Dict]]:
+        raise NotImplementedError
+
+    def get(self, ids: List[str], where: Dict = None) -> Dict[str, Dict]:
+        """{id: hit without score} for the given ids that exist and match where."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+
+class ChromaStore(VectorStore):
+    def __init__(self, persist_dir: str, collection_name: str, embed_model: str, backend: str = None):
+        # Imported here: the registry pulls in torch and chromadb, which MmapStore never needs
+        from model_registry import get_collection
+        self.collection = get_collection(persist_dir, collection_name, embed_model, backend=backend)
+
+    def query(self, embeddings, top_k, where=None):
+        res = self.collection.query(
+            query_embeddings=_normalize(embeddings).tolist(),
+            n_results=top_k,
+            where=where or None,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [{"id": i, "text": d, "metadata": m, "score": 1.0 - dist}
+             for i, d, m, dist in zip(ids, docs, metas, dists)]
+            for ids, docs, metas, dists in zip(res["ids"], res["documents"], res["metadatas"], res["distances"])
+        ]
+
+    def get(self, ids, where=None):
+        if not ids:
+            return {}
+        res = self.collection.get(ids=list(ids), where=where or None, include=["documents", "metadatas"])
+        return {i: {"id": i, "text": d, "metadata": m}
+                for i, d, m in zip(res["ids"], res["documents"], res["metadatas"])}
+
+    def count(self):
+        return self.collection.count()
+
+
+class MmapStore(VectorStore):
+    """
+    Read-only store over numpy files opened with mmap_mode="r". The OS page
+    cache holds the vectors once however many worker processes open the
+    store, and opening reads only headers, so cold start takes milliseconds.
+
+    Rows are scanned block by block in float16 or int8 and widened to
+    float32 only per block. With IVF the rows are grouped by nearest
+    centroid and a query scans only the nprobe closest lists (more when a
+    filter leaves them short of candidates). If the store kept float32
+    copies, the best top_k × RESCORE_FACTOR candidates are re-scored at
+    full precision. Texts and metadata are read by byte offset for the
+    returned rows only.
+
+    Filter fields are kept as columns (codes or numbers) and label flags as
+    row lists, so a where clause becomes a row mask and only the matching
+    rows are scored.
+    """
+
+    def __init__(self, root: str, nprobe: int = NPROBE, rescore: bool = True):
+        with open(os.path.join(root, STORE_FILE), "r") as f:
+            self.info = json.load(f)
+        load = lambda name: np.load(os.path.join(root, name), mmap_mode="r")
+        self.vectors = load(VECTORS)
+        self.scales = load(SCALES) if self.info["dtype"] == "int8" else None
+        self.full = load(FULL) if rescore and self.info["full"] else None
+        self.offsets = load(DOC_OFFSETS)
+        self.centroids = np.load(os.path.join(root, CENTROIDS)) if self.info["nlist"] else None
+        if self.centroids is not None:
+            self.lists = load(LISTS)
+            self.list_offsets = np.load(os.path.join(root, LIST_OFFSETS))
+        self.columns = {f: load(COLUMN.format(f)) for f in FILTER_FIELDS
+                        if os.path.exists(os.path.join(root, COLUMN.format(f)))}
+        self.vocab = {f: {v: i for i, v in enumerate(values)}
+                      for f, values in self.info.get("vocab", {}).items()}
+        self.labels = {name: i for i, name in enumerate(self.info.get("labels", []))}
+        if self.labels:
+            self.label_rows = load(LABEL_ROWS)
+            self.label_offsets = np.load(os.path.join(root, LABEL_OFFSETS))
+        self._ids_path = os.path.join(root, IDS)
+        self.nprobe = nprobe
+        # A file object plus a lock rather than os.pread, which Windows lacks
+        self._docs = open(os.path.join(root, DOCS), "rb")
+        self._docs_lock = threading.Lock()
+
+    def count(self):
+        return self.info["count"]
+
+    def _score(self, q: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """Cosine scores of q (m × dim) against rows (sorted; default all), block by block."""
+        n = self.count() if rows is None else len(rows)
+        out = np.empty((len(q), n), dtype=np.float32)
+        for start in range(0, n, BLOCK_ROWS):
+            sel = slice(start, start + BLOCK_ROWS) if rows is None else rows[start:start + BLOCK_ROWS]
+            block = q @ np.asarray(self.vectors[sel], dtype=np.float32).T
+            if self.scales is not None:
+                block *= self.scales[sel]
+            out[:, start:start + block.shape[1]] = block
+        return out
+
+    def _candidates(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        probe = _top(self.centroids @ q, nprobe)
+        return np.sort(np.concatenate(
+            [self.lists[self.list_offsets[l]:self.list_offsets[l + 1]] for l in probe]
+        ))
+
+    def _mask(self, where: Dict) -> np.ndarray:
+        """Rows matching a Chroma-style where clause ($and/$or, $eq/$ne/$in/$nin, $gt/$gte/$lt/$lte)."""
+        if "$and" in where:
+            return np.logical_and.reduce([self._mask(w) for w in where["$and"]])
+        if "$or" in where:
+            return np.logical_or.reduce([self._mask(w) for w in where["$or"]])
+        mask = np.ones(self.count(), dtype=bool)
+        for key, cond in where.items():
+            for op, value in (cond.items() if isinstance(cond, dict) else [("$eq", cond)]):
+                mask &= self._compare(key, op, value)
+        return mask
+
+    def _compare(self, key: str, op: str, value) -> np.ndarray:
+        if key.startswith(LABEL_PREFIX):
+            has = np.zeros(self.count(), dtype=bool)
+            label = self.labels.get(key[len(LABEL_PREFIX):])
+            if label is not None:
+                has[self.label_rows[self.label_offsets[label]:self.label_offsets[label + 1]]] = True
+            if op not in ("$eq", "$ne"):
+                raise ValueError(f"Label flags only support $eq/$ne, not {op}")
+            return has if (op == "$eq") == bool(value) else ~has
+        if key not in self.columns:
+            raise ValueError(f"Can't filter on {key!r}; the mmap store keeps {sorted(self.columns)} "
+                             f"and labels (re-export it if a field is missing)")
+        column = self.columns[key]
+        if key in self.vocab:
+            # Compare codes; a value never seen at export gets -2, which matches nothing
+            code = lambda v: self.vocab[key].get(v, -2)
+            value = [code(v) for v in value] if op in ("$in", "$nin") else code(value)
+            if op not in ("$eq", "$ne", "$in", "$nin"):
+                raise ValueError(f"{op} isn't supported on {key!r}")
+        if op == "$in":
+            return np.isin(column, value)
+        if op == "$nin":
+            return ~np.isin(column, value)
+        compare = {"$eq": np.equal, "$ne": np.not_equal, "$gt": np.greater,
+                   "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+        if op not in compare:
+            raise ValueError(f"Unsupported operator {op}")
+        return compare[op](column, value)
+
+    def _hit(self, row: int, score: float = None) -> Dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        with self._docs_lock:
+            self._docs.seek(start)
+            raw = self._docs.read(end - start)
+        hit = json.loads(raw)
+        if score is not None:
+            hit["score"] = float(score)
+        return hit
+
+    def get(self, ids, where=None):
+        if not ids:
+            return {}
+        if not os.path.exists(self._ids_path):
+            raise RuntimeError("This mmap store predates id lookups; re-export it with vector_store.py")
+        sorted_ids = np.load(self._ids_path, mmap_mode="r")
+        keys = np.array([i.encode("utf-8") for i in ids])
+        pos = np.minimum(np.searchsorted(sorted_ids, keys), len(sorted_ids) - 1)
+        found = sorted_ids[pos] == keys
+        rows = np.load(os.path.join(os.path.dirname(self._ids_path), ID_ROWS), mmap_mode="r")[pos[found]]
+        if where:
+            rows = rows[self._mask(where)[rows]]
+        return {hit["id"]: hit for hit in (self._hit(int(r)) for r in rows)}
+
+    def query(self, embeddings, top_k, where=None):
+        q = _normalize(embeddings)
+        keep = top_k * RESCORE_FACTOR if self.full is not None else top_k
+        mask = self._mask(where) if where else None
+        allowed = np.flatnonzero(mask) if mask is not None else None
+        # Exact search (or a filter selective enough to scan what it leaves)
+        # scores every query in one pass over the rows
+        exact = self.centroids is None or (allowed is not None and len(allowed) <= EXACT_ROWS)
+        scores_all = self._score(q, allowed) if exact else None
+        results = []
+        for i, qi in enumerate(q):
+            if exact:
+                rows, scores = allowed, scores_all[i]
+            else:
+                # A filter can leave the nearest lists short of keep rows, so
+                # probe twice as many lists until enough survive (or all do)
+                nprobe = self.nprobe
+                while True:
+                    rows = self._candidates(qi, nprobe)
+                    if mask is not None:
+                        rows = rows[mask[rows]]
+                    if mask is None or len(rows) >= keep or nprobe >= len(self.centroids):
+                        break
+                    nprobe *= 2
+                scores = self._score(qi[None, :], rows)[0]
+            pos = _top(scores, keep)
+            best, best_scores = (pos if rows is None else rows[pos]), scores[pos]
+            if self.full is not None:
+                best = np.sort(best)
+                best_scores = np.asarray(self.full[best], dtype=np.float32) @ qi
+                pos = _top(best_scores, top_k)
+                best, best_scores = best[pos], best_scores[pos]
+            results.append([self._hit(int(r), s) for r, s in zip(best, best_scores)])
+        return results
+
+
+def mmap_root(persist_dir: str, collection_name: str) -> str:
+    return os.path.join(persist_dir, MMAP_SUBDIR, collection_name)
+
+
+def get_store(persist_dir: str, collection_name: str, embed_model: str,
+              kind: str = None, backend: str = None) -> VectorStore:
+    """
+    One store per (kind, location) per process; kind defaults to $VECTOR_STORE.
+    An mmap store is reopened once store.json changes, so a long-running
+    process picks up a re-export; callers should fetch the store per query.
+    """
+    kind = kind or VECTOR_STORE
+    key = (kind, os.path.realpath(persist_dir), collection_name)
+    version = None
+    if kind == "mmap":
+        path = os.path.join(mmap_root(persist_dir, collection_name), STORE_FILE)
+        version = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+    with _lock:
+        if key not in _stores or _stores[key][0] != version:
+            if kind == "chroma":
+                _stores[key] = (version, ChromaStore(persist_dir, collection_name, embed_model, backend))
+            elif kind == "mmap":
+                _stores[key] = (version, MmapStore(mmap_root(persist_dir, collection_name)))
+            else:
+                raise ValueError(f"Unknown vector store {kind!r}; expected one of {STORES}")
+        return _stores[key][1]
+
+
+def _train_ivf(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the rows; returns unit-length centroids."""
+    rng = np.random.RandomState(seed)
+    sample = np.sort(rng.choice(len(vectors), min(len(vectors), nlist * KMEANS_SAMPLE), replace=False))
+    data = np.asarray(vectors[sample], dtype=np.float32)
+    nlist = min(nlist, len(data))
+    centroids = data[rng.choice(len(data), nlist, replace=False)]
+    for _ in range(KMEANS_ITERS):
+        labels = np.argmax(data @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, data)
+        empty = np.bincount(labels, minlength=nlist) == 0
+        sums[empty] = data[rng.choice(len(data), int(empty.sum()))]   # re-seed empty lists
+        centroids = _normalize(sums)
+    return centroids
+
+
+def build_store(root: str, batches: Iterable[Tuple[List, List, List, List]], count: int,
+                dtype: str = "float16", nlist: int = 0, keep_full: bool = True):
+    """
+    Write an MmapStore at root from (ids, texts, embeddings, metadatas)
+    batches holding `count` rows. It is built in a sibling temp directory
+    that replaces root at the end; processes that still have the old store
+    mapped keep reading the old files until they reopen.
+    """
+    tmp, old = root + ".tmp", root + ".old"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    full, n = None, 0
+    offsets = np.zeros(count + 1, dtype=np.int64)
+    columns = {f: np.full(count, -1, dtype=np.int32) if kind == "cat" else np.full(count, np.nan)
+               for f, kind in FILTER_FIELDS.items()}
+    vocab = {f: {} for f, kind in FILTER_FIELDS.items() if kind == "cat"}
+    label_rows: Dict[str, List[int]] = {}
+    all_ids = []
+    with open(os.path.join(tmp, DOCS), "wb") as docs:
+        for ids, texts, embeddings, metadatas in batches:
+            if n + len(ids) > count:
+                raise RuntimeError("Collection grew while it was being exported; re-run the export")
+            if full is None:
+                dim = len(embeddings[0])
+                full = np.lib.format.open_memmap(os.path.join(tmp, FULL), mode="w+",
+                                                 dtype=np.float32, shape=(count, dim))
+            full[n:n + len(ids)] = _normalize(embeddings)
+            for cid, text, meta in zip(ids, texts, metadatas):
+                docs.write(json.dumps({"id": cid, "text": text, "metadata": meta},
+                                      ensure_ascii=False).encode("utf-8") + b"\n")
+                for key, value in (meta or {}).items():
+                    if key.startswith(LABEL_PREFIX):
+                        if value:
+                            label_rows.setdefault(key[len(LABEL_PREFIX):], []).append(n)
+                    elif key in vocab:
+                        columns[key][n] = vocab[key].setdefault(value, len(vocab[key]))
+                    elif key in columns and isinstance(value, (int, float)):
+                        columns[key][n] = value
+                all_ids.append(cid.encode("utf-8"))
+                n += 1
+                offsets[n] = docs.tell()
+    if full is None or n != count:
+        shutil.rmtree(tmp)
+        raise RuntimeError(f"Expected {count} rows to export, got {n}")
+    all_ids = np.array(all_ids)
+
+    vectors = np.lib.format.open_memmap(os.path.join(tmp, VECTORS), mode="w+",
+                                        dtype=np.dtype(dtype), shape=full.shape)
+    scales = np.empty(count, dtype=np.float32)
+    for start in range(0, count, BLOCK_ROWS):
+        block = full[start:start + BLOCK_ROWS]
+        if dtype == "int8":
+            # Symmetric per-row scale: row ≈ int8 values × scale
+            scale = np.abs(block).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            vectors[start:start + len(block)] = np.round(block / scale[:, None]).astype(np.int8)
+            scales[start:start + len(block)] = scale
+        else:
+            vectors[start:start + len(block)] = block
+    vectors.flush()
+    if dtype == "int8":
+        np.save(os.path.join(tmp, SCALES), scales)
+    np.save(os.path.join(tmp, DOC_OFFSETS), offsets)
+    id_order = np.argsort(all_ids, kind="stable")
+    np.save(os.path.join(tmp, IDS), all_ids[id_order])
+    np.save(os.path.join(tmp, ID_ROWS), id_order.astype(np.int64))
+    for field, column in columns.items():
+        np.save(os.path.join(tmp, COLUMN.format(field)), column)
+    label_names = sorted(label_rows)
+    if label_names:
+        np.save(os.path.join(tmp, LABEL_ROWS),
+                np.concatenate([label_rows[l] for l in label_names]).astype(np.int64))
+        np.save(os.path.join(tmp, LABEL_OFFSETS), np.cumsum([0] + [len(label_rows[l]) for l in label_names]))
+
+    if nlist:
+        centroids = _train_ivf(full, nlist)
+        nlist = len(centroids)
+        labels = np.concatenate([np.argmax(full[s:s + BLOCK_ROWS] @ centroids.T, axis=1)
+                                 for s in range(0, count, BLOCK_ROWS)])
+        rows = np.argsort(labels, kind="stable")
+        np.save(os.path.join(tmp, CENTROIDS), centroids)
+        np.save(os.path.join(tmp, LISTS), rows.astype(np.int64))
+        np.save(os.path.join(tmp, LIST_OFFSETS), np.searchsorted(labels[rows], np.arange(nlist + 1)))
+    full.flush()
+    del full, vectors
+    if not keep_full:
+        os.remove(os.path.join(tmp, FULL))
+
+    with open(os.path.join(tmp, STORE_FILE), "w") as f:
+        json.dump({"dtype": dtype, "dim": int(dim), "count": count, "nlist": nlist,
+                   "full": keep_full, "built_at": time.time(),
+                   "vocab": {f: list(v) for f, v in vocab.items()}, "labels": label_names}, f)
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.exists(root):
+        os.replace(root, old)
+    os.replace(tmp, root)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def export_collection(collection, root: str, dtype: str = "float16", nlist: int = 0, keep_full: bool = True):
+    """Build the mmap store at root from everything in a Chroma collection, page by page."""
+    count = collection.count()
+    if not count:
+        raise RuntimeError("Collection is empty; run index_chunks.py first")
+
+    def pages():
+        with tqdm(total=count, desc="Exporting vectors", unit="chunk") as progress:
+            for offset in range(0, count, EXPORT_BATCH):
+                page = collection.get(include=["embeddings", "documents", "metadatas"],
+                                      limit=EXPORT_BATCH, offset=offset)
+                progress.update(len(page["ids"]))
+                yield page["ids"], page["documents"], page["embeddings"], page["metadatas"]
+
+    build_store(root, pages(), count, dtype=dtype, nlist=nlist, keep_full=keep_full)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the Chroma collection to a memory-mapped numpy store for read-heavy serving"
+    )
+    parser.add_argument(
+        "--dtype", "-t", choices=DTYPES, default="float16",
+        help="Storage type of the scanned vectors (default: float16)"
+    )
+    parser.add_argument(
+        "--nlist", "-l", type=int, default=0,
+        help="IVF lists; 0 searches exactly (default: 0)"
+    )
+    parser.add_argument(
+        "--no-full", action="store_true",
+        help="Don't keep float32 copies, so top candidates can't be re-scored at full precision"
+    )
+    args = parser.parse_args()
+
+    from model_registry import get_collection
+    root = mmap_root(PERSIST_DIR, COLLECTION_NAME)
+    collection = get_collection(PERSIST_DIR, COLLECTION_NAME, EMBED_MODEL)
+    export_collection(collection, root, args.dtype, args.nlist, keep_full=not args.no_full)
+
+    start = time.perf_counter()
+    store = MmapStore(root)
+    print(f"✅ Wrote {store.count()} vectors ({args.dtype}, "
+          f"{'IVF ' + str(store.info['nlist']) + ' lists' if store.info['nlist'] else 'exact'}) to {root}; "
+          f"opened in {1000 * (time.perf_counter() - start):.1f} ms.")
+    print("Set VECTOR_STORE=mmap for rag_pipeline.py and the agent to search it.")
+
+
+"""
+python vector_store.py --dtype int8 --nlist 256
+"""
+if __name__ == "__main__":
+    main()